@@ -73,7 +73,7 @@
         if (videos.length > 0) {
             console.log(`✅ 找到 ${videos.length} 个视频`);
 
-            result.data.videos = videos.slice(0, 10).map((video, idx) => {
+            result.data.videos = videos.map((video, idx) => {
                 const v = video.aweme || video;
                 return {
                     index: idx + 1,
@@ -92,6 +92,16 @@
             });
 
             console.log('✅ 视频列表:', result.data.videos);
+
+            // 分页游标：后续页由 douyin_videos.py 从这里继续抓取
+            const postMeta = window._SSR_HYDRATED_DATA?.data?.aweme;
+            const maxCursor = postMeta?.cursor ?? postMeta?.maxCursor ?? postMeta?.max_cursor;
+            if (maxCursor !== undefined) {
+                result.data.video_cursor = {
+                    max_cursor: maxCursor,
+                    has_more: Boolean(postMeta?.hasMore ?? postMeta?.has_more)
+                };
+            }
         } else {
             console.log('⚠️ 未找到视频列表');
             console.log('💡 尝试滚动页面加载更多视频...');
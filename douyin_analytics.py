@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+多账号作品统计分析（NumPy 向量化）
+把所有账号的作品统计载入为列（douyin_columnar.VideoColumns），按账号分组一次性计算：
+  - 各指标总计 / 平均 / 中位数 / 分位数
+  - 互动率（点赞+评论+分享+收藏）/ 播放，以及单项比率和粉丝互动比
+  - 每个账号和全部账号的 Top-N 作品
+分组计算只做几次排序和 reduceat，不按账号或作品循环，整个关注列表一次跑完
+
+用法见 parse_douyin_console_data.py --analyze
+"""
+
+import json
+import sqlite3
+
+import numpy as np
+
+from douyin_columnar import VideoColumns, iter_store_chunks, read_columns
+from douyin_store import VIDEO_COUNTERS
+
+PERCENTILES = (25, 50, 75, 90, 99)
+INTERACTIONS = ('digg_count', 'comment_count', 'share_count', 'collect_count')
+RATIOS = {
+    'engagement_rate': None,  # 全部互动 / 播放
+    'like_rate': 'digg_count',
+    'comment_rate': 'comment_count',
+    'share_rate': 'share_count',
+}
+
+
+def _groups(codes):
+    """按编码分组：返回 (出现的编码, 各组起点, 各组大小)，起点对应按编码稳定排序后的位置"""
+    groups, starts, counts = np.unique(np.sort(codes, kind='stable'), return_index=True, return_counts=True)
+    return groups, starts, counts
+
+
+def _divide(a, b):
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    return np.divide(a, b, out=np.full(a.shape, np.nan), where=b > 0)
+
+
+def _group_keys(values, codes, descending=False):
+    """
+    把 (编码, 值) 合成一个 int64 排序键，排序键即可得到组内有序的值，比 lexsort 快一个数量级
+    :return: (键, 值的位数, 最小值, 最大值)；位数放不下时键为 None
+    """
+    low, high = int(values.min()), int(values.max())
+    bits = (high - low).bit_length()
+    if bits + int(codes.max()).bit_length() > 62:
+        return None, bits, low, high
+    offset = (high - values) if descending else (values - low)
+    return (codes.astype(np.int64) << bits) | offset, bits, low, high
+
+
+def grouped_percentiles(values, codes, starts, counts, qs):
+    """
+    各组的分位数（线性插值，与 np.percentile 默认方式一致）
+    :return: 形状 (组数, len(qs)) 的 float64 数组
+    """
+    keys, bits, low, _ = _group_keys(values, codes)
+    if keys is None:
+        ordered = values[np.lexsort((values, codes))].astype(np.float64)
+    else:
+        ordered = ((np.sort(keys) & ((1 << bits) - 1)) + low).astype(np.float64)
+    pos = starts[:, None] + (counts[:, None] - 1) * (np.asarray(qs, dtype=np.float64) / 100)[None, :]
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def grouped_top(values, codes, starts, counts, n):
+    """
+    各组按 values 降序的前 n 行
+    :return: (行号数组, 各组入选数)，行号按组连续排列、组内降序
+    """
+    keys, _, _, _ = _group_keys(values, codes, descending=True)
+    order = np.lexsort((-values, codes)) if keys is None else np.argsort(keys)
+    rank = np.arange(len(values)) - np.repeat(starts, counts)
+    return order[rank < n], np.minimum(counts, n)
+
+
+def summarize(columns, codes, top=10, top_metric='digg_count', percentiles=PERCENTILES):
+    """
+    按 codes 分组统计
+    :return: (出现的编码, {统计名: 数组}, Top-N 行号按组切分后的列表)
+    """
+    groups, starts, counts = _groups(codes)
+    order = np.argsort(codes, kind='stable')
+    result = {'videos': counts}
+
+    for name in VIDEO_COUNTERS:
+        values = columns[name]
+        totals = np.add.reduceat(values[order], starts)
+        result[f'{name}.total'] = totals
+        result[f'{name}.mean'] = totals / counts
+        result[f'{name}.percentiles'] = grouped_percentiles(values, codes, starts, counts, percentiles)
+
+    interactions = sum(columns[name] for name in INTERACTIONS)
+    result['interactions.total'] = np.add.reduceat(interactions[order], starts)
+    plays = result['play_count.total']
+    for ratio, metric in RATIOS.items():
+        result[ratio] = _divide(result[f'{metric}.total'] if metric else result['interactions.total'], plays)
+
+    rows, taken = grouped_top(columns[top_metric], codes, starts, counts, top)
+    tops = np.split(rows, np.cumsum(taken)[:-1])
+    return groups, result, tops
+
+
+def _video(columns, row):
+    video = {'aweme_id': str(columns.aweme_id[row]), 'sec_uid': str(columns.sec_uid_dict[columns.sec_uid_codes[row]])}
+    for name in ('create_time',) + VIDEO_COUNTERS:
+        video[name] = int(columns[name][row])
+    return video
+
+
+def _report(result, i, tops, columns, percentiles):
+    report = {'videos': int(result['videos'][i]), 'metrics': {}}
+    for name in VIDEO_COUNTERS:
+        values = result[f'{name}.percentiles'][i]
+        report['metrics'][name] = {
+            'total': int(result[f'{name}.total'][i]),
+            'mean': float(result[f'{name}.mean'][i]),
+            'median': float(values[percentiles.index(50)]),
+            'percentiles': {f'p{q}': float(v) for q, v in zip(percentiles, values)},
+        }
+    report['interactions'] = int(result['interactions.total'][i])
+    for ratio in RATIOS:
+        value = result[ratio][i]
+        report[ratio] = None if np.isnan(value) else float(value)
+    report['top'] = [_video(columns, row) for row in tops[i]]
+    return report
+
+
+def analyze(columns, top=10, top_metric='digg_count', percentiles=PERCENTILES, followers=None):
+    """
+    :param followers: {sec_uid: 粉丝数}，提供时计算平均每个作品的互动 / 粉丝数
+    :return: dict(accounts=[按总点赞降序的账号报告], overall=全部作品的报告)
+    """
+    percentiles = tuple(sorted(set(percentiles) | {50}))  # 中位数即 P50
+    if not len(columns):
+        return {'accounts': [], 'overall': None}
+
+    groups, result, tops = summarize(columns, columns.sec_uid_codes, top, top_metric, percentiles)
+    accounts = []
+    for i, code in enumerate(groups):
+        sec_uid = str(columns.sec_uid_dict[code])
+        report = {'sec_uid': sec_uid, **_report(result, i, tops, columns, percentiles)}
+        follower_count = (followers or {}).get(sec_uid)
+        report['follower_count'] = follower_count
+        report['interactions_per_follower'] = (
+            report['interactions'] / report['videos'] / follower_count if follower_count else None
+        )
+        accounts.append(report)
+    accounts.sort(key=lambda r: r['metrics']['digg_count']['total'], reverse=True)
+
+    _, result, tops = summarize(columns, np.zeros(len(columns), dtype=np.int32), top, top_metric, percentiles)
+    return {'accounts': accounts, 'overall': {'accounts': len(groups), **_report(result, 0, tops, columns, percentiles)}}
+
+
+def tracked_sec_uids(store):
+    """调度器关注的账号（douyin_scheduler track）"""
+    try:
+        return [row[0] for row in store.conn.execute("SELECT sec_uid FROM tracked_accounts")]
+    except sqlite3.OperationalError:
+        return []
+
+
+def load_columns(store=None, path=None, sec_uids=None):
+    """从列式文件或数据库载入作品统计"""
+    if path:
+        columns = read_columns(path)
+        if sec_uids:
+            keep = np.isin(columns.sec_uid, list(sec_uids))
+            columns = VideoColumns(
+                columns.aweme_id[keep], columns.sec_uid_codes[keep], columns.sec_uid_dict,
+                **{name: values[keep] for name, values in columns.columns.items()},
+            )
+        return columns
+    return VideoColumns.concat(iter_store_chunks(store, sec_uids))
+
+
+def account_info(store, sec_uids):
+    """{sec_uid: (昵称, 粉丝数)}"""
+    info = {}
+    sec_uids = list(sec_uids)
+    for i in range(0, len(sec_uids), 500):
+        batch = sec_uids[i:i + 500]
+        for row in store.conn.execute(
+            f"SELECT sec_uid, nickname, follower_count FROM users WHERE sec_uid IN ({','.join('?' * len(batch))})",
+            batch,
+        ):
+            info[row['sec_uid']] = (row['nickname'], row['follower_count'])
+    return info
+
+
+def _fmt_ratio(value):
+    return '-' if value is None else f"{value * 100:.2f}%"
+
+
+def print_report(report, nicknames=None, limit=None):
+    """打印分析结果"""
+    nicknames = nicknames or {}
+    overall = report['overall']
+    if not overall:
+        print("\n⚠️ 没有作品数据")
+        return
+
+    print("\n" + "=" * 60)
+    print(f"📊 多账号作品分析: {overall['accounts']} 个账号, {overall['videos']:,} 个作品")
+    print("=" * 60)
+
+    accounts = report['accounts'][:limit] if limit else report['accounts']
+    for account in accounts:
+        digg = account['metrics']['digg_count']
+        name = nicknames.get(account['sec_uid']) or account['sec_uid'][:24]
+        print(f"\n👤 {name}  ({account['videos']} 个作品)")
+        print(f"  总点赞: {digg['total']:,}  平均: {digg['mean']:,.0f}  中位数: {digg['median']:,.0f}  "
+              f"P90: {digg['percentiles'].get('p90', float('nan')):,.0f}")
+        print(f"  互动率: {_fmt_ratio(account['engagement_rate'])}  "
+              f"评论率: {_fmt_ratio(account['comment_rate'])}  分享率: {_fmt_ratio(account['share_rate'])}")
+        if account.get('interactions_per_follower') is not None:
+            print(f"  每作品互动/粉丝: {_fmt_ratio(account['interactions_per_follower'])}")
+        for video in account['top'][:3]:
+            print(f"    🔝 {video['aweme_id']}  👍 {video['digg_count']:,}  💬 {video['comment_count']:,}")
+    if limit and len(report['accounts']) > limit:
+        print(f"\n  ... 另有 {len(report['accounts']) - limit} 个账号（--json 导出完整结果）")
+
+    print(f"\n{'─' * 60}")
+    print("📈 全部账号")
+    print(f"{'─' * 60}")
+    for name, label in (('digg_count', '点赞'), ('play_count', '播放'), ('comment_count', '评论'),
+                        ('share_count', '分享')):
+        metric = overall['metrics'][name]
+        print(f"  {label}: 总计 {metric['total']:,}  平均 {metric['mean']:,.0f}  中位数 {metric['median']:,.0f}  "
+              + '  '.join(f"{q.upper()} {v:,.0f}" for q, v in metric['percentiles'].items() if q != 'p50'))
+    print(f"  互动率: {_fmt_ratio(overall['engagement_rate'])}")
+    print(f"\n🔝 全部账号 Top {len(overall['top'])}:")
+    for video in overall['top']:
+        name = nicknames.get(video['sec_uid']) or video['sec_uid'][:16]
+        print(f"  {video['aweme_id']}  {name}  👍 {video['digg_count']:,}")
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
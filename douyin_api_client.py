@@ -4,16 +4,45 @@
 尝试调用抖音的内部 API 获取用户数据
 """
 
+import asyncio
 import requests
 import json
 import time
 import random
-from datetime import datetime
 from urllib.parse import quote
+from douyin_archive import shared_archive
+from douyin_config import DOUYIN_BASE_URL
+from douyin_http import AsyncHTTPClient
+from douyin_http_cache import shared_cache
+from douyin_resolve_cache import shared_resolution_cache
+from douyin_singleflight import SingleFlight, SyncSingleFlight, normalize_key
+from douyin_store import shared_store
+
+SEARCH_CACHE_TTL = 1800  # 搜索结果缓存 30 分钟
+
+def _is_search_payload(response):
+    """只缓存正常的搜索结果，验证页（search_nil_type=verify_check）等不缓存"""
+    try:
+        data = response.json()
+    except ValueError:
+        return False
+    return data.get('status_code') == 0 and not data.get('search_nil_info')
 
 class DouyinAPIClient:
-    def __init__(self):
+    # 进程内共享：多个会话同时搜索同一关键词时只请求一次
+    _search_flights = SyncSingleFlight()
+    _async_search_flights = SingleFlight()
+    
+    def __init__(self, resolve_cache=None, http_cache=None, store=None, archive=None, traffic=None,
+                 base_url=None):
+        self.base_url = (base_url or DOUYIN_BASE_URL).rstrip('/')
         self.session = requests.Session()
+        if traffic is not None:  # 录制 / 回放（douyin_replay.TrafficRecording）
+            traffic.mount(self.session)
+        self._resolve_cache = resolve_cache  # 关键词 / 抖音号 -> sec_uid
+        self.http_cache = http_cache or shared_cache()  # 搜索响应磁盘缓存
+        self._store = store  # 用户 / 作品数据库
+        self.archive = archive or shared_archive()  # 原始响应归档
         self.device_id = self._generate_device_id()
         
         # 移动端 headers
@@ -29,6 +58,20 @@ class DouyinAPIClient:
             'Cookie': f'device_web_cpu_core=8;device_web_memory_size=8;webid={self.device_id};'
         }
     
+    @property
+    def resolve_cache(self):
+        """sec_uid 解析缓存，首次使用时打开（默认为进程内共享实例）"""
+        if self._resolve_cache is None:
+            self._resolve_cache = shared_resolution_cache()
+        return self._resolve_cache
+
+    @property
+    def store(self):
+        """用户 / 作品数据库，首次使用时打开（默认为进程内共享实例）"""
+        if self._store is None:
+            self._store = shared_store()
+        return self._store
+    
     def _generate_device_id(self):
         """生成设备 ID"""
         return ''.join([str(random.randint(0, 9)) for _ in range(19)])
@@ -42,13 +85,86 @@ class DouyinAPIClient:
         return ''.join([str(random.randint(0, 9)) for _ in range(16)])
     
     def search_user_web(self, keyword):
-        """使用网页版 API 搜索用户"""
+        """使用网页版 API 搜索用户（相同关键词的并发调用共享一次请求）"""
+        return self._search_flights.do((self.base_url, normalize_key(keyword)), self._search_user_web, keyword)
+    
+    def _search_user_web(self, keyword):
+        """使用网页版 API 搜索用户（实际执行）"""
         print(f"\n{'='*60}")
         print(f"🔍 搜索用户: {keyword}")
         print(f"{'='*60}\n")
         
+        api_url, params, headers = self._build_search_request(keyword)
+        
+        try:
+            print(f"📍 请求 API: {api_url}")
+            print(f"📋 参数: keyword={keyword}")
+            
+            response = self.http_cache.request(
+                self.session, 'GET', api_url,
+                params=params,
+                headers=headers,
+                timeout=10,
+                ttl=SEARCH_CACHE_TTL,
+                should_cache=_is_search_payload
+            )
+            
+            return self._handle_search_response(keyword, response.status_code, response.text,
+                                                from_cache=response.from_cache, url=response.url)
+                
+        except Exception as e:
+            print(f"❌ 请求异常: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        return None
+    
+    async def search_user_web_async(self, keyword, http):
+        """
+        异步版本的 search_user_web，使用共享连接池
+        :param http: AsyncHTTPClient 实例
+        """
+        return await self._async_search_flights.do(
+            (self.base_url, normalize_key(keyword)), self._search_user_web_async, keyword, http
+        )
+    
+    async def _search_user_web_async(self, keyword, http):
+        api_url, params, headers = self._build_search_request(keyword)
+        print(f"📍 请求 API: {api_url} (keyword={keyword})")
+        try:
+            response = await self.http_cache.request_async(
+                http, 'GET', api_url, params=params, headers=headers, timeout=10,
+                ttl=SEARCH_CACHE_TTL, should_cache=_is_search_payload
+            )
+        except Exception as e:
+            print(f"❌ 请求异常 ({keyword}): {e}")
+            return None
+        # 解析、归档和写库都是同步 SQLite / 文件操作，放到线程中执行，不阻塞事件循环
+        return await asyncio.to_thread(
+            self._handle_search_response, keyword, response.status_code, response.text,
+            from_cache=response.from_cache, url=response.url,
+        )
+    
+    async def search_users(self, keywords, http=None):
+        """
+        并发搜索多个关键词
+        :return: {keyword: 搜索结果或 None}
+        """
+        own_client = http is None
+        http = http or AsyncHTTPClient()
+        try:
+            results = await asyncio.gather(
+                *(self.search_user_web_async(keyword, http) for keyword in keywords)
+            )
+        finally:
+            if own_client:
+                await http.aclose()
+        return dict(zip(keywords, results))
+    
+    def _build_search_request(self, keyword):
+        """构造网页版搜索 API 请求：(url, params, headers)"""
         # 网页版搜索 API
-        api_url = "https://www.douyin.com/aweme/v1/web/general/search/single/"
+        api_url = f"{self.base_url}/aweme/v1/web/general/search/single/"
         params = {
             'device_platform': 'webapp',
             'aid': '6383',
@@ -90,7 +206,7 @@ class DouyinAPIClient:
         
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-            'Referer': 'https://www.douyin.com/',
+            'Referer': f'{self.base_url}/',
             'Accept': 'application/json, text/plain, */*',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
             'Accept-Encoding': 'gzip, deflate, br',
@@ -103,50 +219,38 @@ class DouyinAPIClient:
             'sec-fetch-site': 'same-origin'
         }
         
-        try:
-            print(f"📍 请求 API: {api_url}")
-            print(f"📋 参数: keyword={keyword}")
-            
-            response = self.session.get(
-                api_url,
-                params=params,
-                headers=headers,
-                timeout=10
-            )
-            
-            print(f"\n✅ 状态码: {response.status_code}")
-            print(f"📄 响应长度: {len(response.text)}")
-            
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    
-                    # 保存响应
-                    filename = f"douyin_api_{keyword}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
-                    print(f"💾 响应已保存: {filename}")
-                    
-                    # 提取用户信息
-                    self._parse_search_result(data)
-                    
-                    return data
-                except json.JSONDecodeError:
-                    print("❌ 响应不是有效的 JSON")
-                    print(f"响应内容: {response.text[:500]}")
-            else:
-                print(f"❌ 请求失败: {response.status_code}")
-                print(f"响应: {response.text[:500]}")
+        return api_url, params, headers
+    
+    def _handle_search_response(self, keyword, status_code, text, from_cache=False, url=None):
+        """处理搜索 API 响应，成功时返回解析后的 JSON"""
+        print(f"\n✅ 状态码: {status_code}{' (缓存)' if from_cache else ''}")
+        print(f"📄 响应长度: {len(text)}")
+        
+        if status_code == 200:
+            try:
+                data = json.loads(text)
                 
-        except Exception as e:
-            print(f"❌ 请求异常: {e}")
-            import traceback
-            traceback.print_exc()
+                # 归档原始响应（缓存命中时内容与上次相同，不再重复归档）
+                if not from_cache:
+                    saved = self.archive.put(text, 'json', keyword=keyword, url=str(url) if url else None,
+                                             source='api_search')
+                    print(f"💾 响应已归档: {saved['sha256'][:12]}{'' if saved['new'] else ' (内容未变)'}")
+                
+                # 提取用户信息
+                self._parse_search_result(data, keyword)
+                
+                return data
+            except json.JSONDecodeError:
+                print("❌ 响应不是有效的 JSON")
+                print(f"响应内容: {text[:500]}")
+        else:
+            print(f"❌ 请求失败: {status_code}")
+            print(f"响应: {text[:500]}")
         
         return None
     
-    def _parse_search_result(self, data):
-        """解析搜索结果"""
+    def _parse_search_result(self, data, keyword=None):
+        """解析搜索结果，并把 sec_uid 写入解析缓存"""
         print("\n" + "="*60)
         print("📊 解析搜索结果")
         print("="*60)
@@ -170,10 +274,14 @@ class DouyinAPIClient:
             
             if user_list:
                 print(f"\n✅ 找到 {len(user_list)} 个用户:\n")
+                n_users, _ = self.store.ingest(user_list, source='web_api')
+                print(f"💾 已写入数据库: {n_users} 个用户")
                 
-                for idx, user_data in enumerate(user_list[:5]):  # 只显示前5个
+                for idx, user_data in enumerate(user_list):
                     user = user_data.get('user', user_data)
-                    self._print_user_info(user, idx + 1)
+                    self.resolve_cache.remember_user(user, keyword=keyword, source='web_api', rank=idx)
+                    if idx < 5:  # 只显示前5个
+                        self._print_user_info(user, idx + 1)
             else:
                 print("❌ 未找到用户列表")
                 print("📋 数据结构:")
@@ -215,7 +323,7 @@ class DouyinAPIClient:
         # 保存 sec_uid 供后续使用
         if 'sec_uid' in user:
             print(f"\n  ✅ SEC_UID: {user['sec_uid']}")
-            print(f"  💡 可以用这个 UID 获取用户详情和作品列表")
+            print(f"  💡 已写入解析缓存，下次可直接访问 /user/{user['sec_uid']}")
         
         print(f"{'─'*60}")
 
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+原始页面 / 响应快照归档（按内容寻址）
+正文按 SHA-256 存为 objects/ab/<sha256>.zst（安装了 zstandard 时）或 .gz，
+内容相同的快照只存一份；manifest.sqlite3 记录每次抓取的关键词、URL、来源和时间，
+按哈希直接定位文件，重新解析时可随机读取任意一份
+
+安装（可选，压缩率和速度优于 gzip）: pip install zstandard
+
+用法：
+  python3 douyin_archive.py stats
+  python3 douyin_archive.py list [--keyword 贾乃亮] [--kind html] [--limit 20]
+  python3 douyin_archive.py cat <sha256 前缀>
+  python3 douyin_archive.py import douyin_search_*.html douyin_api_*.json
+  python3 douyin_archive.py verify
+"""
+
+import argparse
+import gzip
+import hashlib
+import importlib.util
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_DIRECTORY = os.environ.get('DOUYIN_ARCHIVE_DIR', '.douyin_archive')
+
+CODEC_ZSTD = 'zstd'
+CODEC_GZIP = 'gzip'
+_SUFFIXES = {CODEC_ZSTD: '.zst', CODEC_GZIP: '.gz'}
+
+# 旧的时间戳命名：douyin_search_贾乃亮_20260205_154717.html / douyin_data_贾乃亮_1_20260205_154717.json
+_LEGACY_NAME_RE = re.compile(r'^douyin_(search|api|data)_(.+?)(?:_\d+)?_(\d{8}_\d{6})\.(html|json)$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256 TEXT NOT NULL REFERENCES blobs(sha256),
+    kind TEXT NOT NULL,
+    keyword TEXT,
+    url TEXT,
+    source TEXT,
+    captured_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_keyword ON snapshots(keyword, captured_at);
+CREATE INDEX IF NOT EXISTS snapshots_captured ON snapshots(captured_at);
+CREATE INDEX IF NOT EXISTS snapshots_sha256 ON snapshots(sha256);
+"""
+
+
+def zstd_available():
+    """是否安装了 zstandard"""
+    return importlib.util.find_spec('zstandard') is not None
+
+
+def compress(data, codec):
+    if codec == CODEC_ZSTD:
+        import zstandard
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data, codec):
+    if codec == CODEC_ZSTD:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def blob_path(directory, sha256, codec):
+    """正文文件路径（不经过 manifest，供只读的工作进程直接读取）"""
+    return Path(directory) / 'objects' / sha256[:2] / f"{sha256}{_SUFFIXES[codec]}"
+
+
+def read_blob(directory, sha256, codec):
+    return decompress(blob_path(directory, sha256, codec).read_bytes(), codec)
+
+
+class SnapshotArchive:
+    """按内容寻址的压缩快照归档"""
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, codec=None):
+        """
+        :param codec: 新写入正文的压缩方式，默认有 zstandard 时用 zstd，否则 gzip；
+                      读取时按 manifest 中记录的方式解压，两种可以混存
+        """
+        self.directory = Path(directory)
+        (self.directory / 'objects').mkdir(parents=True, exist_ok=True)
+        self.codec = codec or (CODEC_ZSTD if zstd_available() else CODEC_GZIP)
+        self._lock = threading.Lock()  # ArtifactWriter 等会在后台线程中写入
+        self.conn = sqlite3.connect(self.directory / 'manifest.sqlite3', timeout=30,
+                                    isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _blob_path(self, sha256, codec):
+        return blob_path(self.directory, sha256, codec)
+
+    def put(self, content, kind='html', keyword=None, url=None, source=None, captured_at=None):
+        """
+        归档一份快照
+        :param content: str（按 UTF-8 编码）或 bytes
+        :param kind: 内容类型，如 html / json
+        :return: dict(sha256, id, new)，new 表示正文是第一次出现
+        """
+        data = content.encode('utf-8') if isinstance(content, str) else bytes(content)
+        sha256 = hashlib.sha256(data).hexdigest()
+        captured_at = captured_at or time.time()
+
+        with self._lock:
+            exists = self.conn.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        stored = None
+        if not exists:
+            # 先写文件再登记，登记失败时只会留下一个无引用的文件
+            stored = compress(data, self.codec)
+            path = self._blob_path(sha256, self.codec)
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_name(path.name + '.part')
+            tmp_path.write_bytes(stored)
+            tmp_path.replace(path)
+
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                if stored is not None:
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO blobs (sha256, codec, size, stored_size, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (sha256, self.codec, len(data), len(stored), time.time()),
+                    )
+                snapshot_id = self.conn.execute(
+                    "INSERT INTO snapshots (sha256, kind, keyword, url, source, captured_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (sha256, kind, keyword, url, source, captured_at),
+                ).lastrowid
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        return {'sha256': sha256, 'id': snapshot_id, 'new': not exists}
+
+    def resolve(self, prefix):
+        """哈希前缀 -> 完整哈希（不唯一或不存在时返回 None）"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT sha256 FROM blobs WHERE sha256 >= ? AND sha256 < ? LIMIT 2", (prefix, prefix + 'g')
+            ).fetchall()
+        return rows[0]['sha256'] if len(rows) == 1 else None
+
+    def get(self, sha256):
+        """按哈希读取正文（bytes），不存在时返回 None"""
+        with self._lock:
+            row = self.conn.execute("SELECT codec FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return read_blob(self.directory, sha256, row['codec'])
+        except FileNotFoundError:
+            return None
+
+    def get_text(self, sha256):
+        data = self.get(sha256)
+        return None if data is None else data.decode('utf-8', 'replace')
+
+    def snapshots(self, keyword=None, kind=None, source=None, since=None, until=None, limit=None,
+                  after_id=None, latest_first=True):
+        """
+        按条件列出快照
+        :param after_id: 只返回 id 大于该值的快照（按 id 递增，供增量处理）
+        :return: [dict(id, sha256, kind, keyword, url, source, captured_at, size, stored_size), ...]
+        """
+        where, params = _filters(keyword, kind, source, since, until, after_id)
+        query = ("SELECT s.*, b.size, b.stored_size, b.codec FROM snapshots s "
+                 f"JOIN blobs b ON b.sha256 = s.sha256 WHERE {where}")
+        if after_id is not None:
+            query += " ORDER BY s.id"
+        else:
+            query += f" ORDER BY s.captured_at {'DESC' if latest_first else 'ASC'}"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(query, params)]
+
+    def count(self, keyword=None, kind=None, source=None, since=None, until=None, after_id=None):
+        """:return: (快照数, 原始总字节数)"""
+        where, params = _filters(keyword, kind, source, since, until, after_id)
+        with self._lock:
+            return tuple(self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM snapshots s "
+                f"JOIN blobs b ON b.sha256 = s.sha256 WHERE {where}", params
+            ).fetchone())
+
+    def latest(self, keyword, kind=None):
+        """某关键词最近一次的快照，没有时返回 None"""
+        rows = self.snapshots(keyword=keyword, kind=kind, limit=1)
+        return rows[0] if rows else None
+
+    def stats(self):
+        """:return: dict(snapshots, blobs, raw_bytes, unique_bytes, stored_bytes)"""
+        with self._lock:
+            snapshots, raw_bytes = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM snapshots s JOIN blobs b ON b.sha256 = s.sha256"
+            ).fetchone()
+            blobs, unique_bytes, stored_bytes = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs"
+            ).fetchone()
+        return {
+            'snapshots': snapshots,
+            'blobs': blobs,
+            'raw_bytes': raw_bytes,        # 不去重、不压缩时的总大小
+            'unique_bytes': unique_bytes,  # 去重后
+            'stored_bytes': stored_bytes,  # 去重并压缩后（实际占用）
+        }
+
+    def verify(self):
+        """重新计算所有正文的哈希，返回损坏或缺失的哈希列表"""
+        with self._lock:
+            rows = self.conn.execute("SELECT sha256 FROM blobs").fetchall()
+        bad = []
+        for row in rows:
+            try:
+                data = self.get(row['sha256'])
+            except (OSError, EOFError, ValueError):
+                data = None
+            if data is None or hashlib.sha256(data).hexdigest() != row['sha256']:
+                bad.append(row['sha256'])
+        return bad
+
+    def import_file(self, path):
+        """
+        归档旧的时间戳命名文件（关键词和时间从文件名解析，解析不出时用文件修改时间）
+        :return: put 的结果
+        """
+        path = Path(path)
+        m = _LEGACY_NAME_RE.match(path.name)
+        if m:
+            prefix, keyword, stamp, ext = m.groups()
+            captured_at = datetime.strptime(stamp, '%Y%m%d_%H%M%S').timestamp()
+            source = {'search': 'search_page', 'api': 'api_search', 'data': 'render_data'}[prefix]
+        else:
+            keyword, source, ext = None, 'import', path.suffix.lstrip('.') or 'bin'
+            captured_at = path.stat().st_mtime
+        return self.put(path.read_bytes(), kind=ext, keyword=keyword, source=source, captured_at=captured_at)
+
+
+def _filters(keyword, kind, source, since, until, after_id):
+    clauses, params = ['1 = 1'], []
+    for column, op, value in (('s.keyword', '=', keyword), ('s.kind', '=', kind), ('s.source', '=', source),
+                              ('s.captured_at', '>=', since), ('s.captured_at', '<', until),
+                              ('s.id', '>', after_id)):
+        if value is not None:
+            clauses.append(f"{column} {op} ?")
+            params.append(value)
+    return ' AND '.join(clauses), params
+
+
+_shared_archive = None
+
+
+def shared_archive():
+    """进程内共享的默认归档（首次使用时创建目录）"""
+    global _shared_archive
+    if _shared_archive is None:
+        _shared_archive = SnapshotArchive()
+    return _shared_archive
+
+
+def _format_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB':
+            return f"{n:.1f}{unit}" if unit != 'B' else f"{n}B"
+        n /= 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='抖音快照归档')
+    parser.add_argument('--dir', default=DEFAULT_DIRECTORY)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('stats', help='归档统计')
+
+    listing = sub.add_parser('list', help='列出快照')
+    listing.add_argument('--keyword')
+    listing.add_argument('--kind')
+    listing.add_argument('--source')
+    listing.add_argument('--limit', type=int, default=20)
+
+    cat = sub.add_parser('cat', help='输出快照正文')
+    cat.add_argument('sha256', help='哈希或唯一前缀')
+
+    imports = sub.add_parser('import', help='归档已有文件')
+    imports.add_argument('paths', nargs='+')
+    imports.add_argument('--remove', action='store_true', help='归档成功后删除原文件')
+
+    sub.add_parser('verify', help='校验所有正文的哈希')
+
+    args = parser.parse_args()
+    archive = SnapshotArchive(args.dir)
+
+    if args.command == 'stats':
+        stats = archive.stats()
+        print(f"📦 {stats['snapshots']:,} 个快照, {stats['blobs']:,} 份不同正文 ({archive.codec})")
+        print(f"  原始大小: {_format_bytes(stats['raw_bytes'])}")
+        print(f"  去重后:   {_format_bytes(stats['unique_bytes'])}")
+        print(f"  实际占用: {_format_bytes(stats['stored_bytes'])}"
+              f"  ({stats['raw_bytes'] / max(stats['stored_bytes'], 1):.1f}x)")
+    elif args.command == 'list':
+        for row in archive.snapshots(args.keyword, args.kind, args.source, limit=args.limit):
+            stamp = datetime.fromtimestamp(row['captured_at']).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"  {stamp}  {row['sha256'][:12]}  {row['kind']:<5} {_format_bytes(row['size']):>9}  "
+                  f"{row['source'] or '-'}  {row['keyword'] or row['url'] or ''}")
+    elif args.command == 'cat':
+        sha256 = archive.resolve(args.sha256)
+        if not sha256:
+            sys.exit(f"❌ 找不到唯一匹配的快照: {args.sha256}")
+        sys.stdout.buffer.write(archive.get(sha256))
+    elif args.command == 'import':
+        new = 0
+        for path in args.paths:
+            result = archive.import_file(path)
+            new += result['new']
+            if args.remove:
+                os.remove(path)
+        print(f"✅ 已归档 {len(args.paths)} 个文件（{new} 份新正文）")
+    else:
+        bad = archive.verify()
+        print("✅ 全部正文校验通过" if not bad else f"❌ {len(bad)} 份正文损坏或缺失: {', '.join(b[:12] for b in bad)}")
+
+
+if __name__ == "__main__":
+    main()
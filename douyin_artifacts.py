@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+抖音抓取产物（截图 / HTML）保留策略
+控制何时落盘、单个产物大小上限、目录轮转，并在后台线程异步写盘
+
+策略（环境变量 DOUYIN_ARTIFACT_POLICY）：
+  never       从不保存
+  on-failure  仅在抓取失败时保存（默认）
+  sampled     失败必存，成功按 DOUYIN_ARTIFACT_SAMPLE_RATE 抽样保存
+  always      总是保存
+"""
+
+import asyncio
+import os
+import random
+import re
+from datetime import datetime
+from pathlib import Path
+
+POLICY_NEVER = 'never'
+POLICY_ON_FAILURE = 'on-failure'
+POLICY_SAMPLED = 'sampled'
+POLICY_ALWAYS = 'always'
+POLICIES = (POLICY_NEVER, POLICY_ON_FAILURE, POLICY_SAMPLED, POLICY_ALWAYS)
+
+DEFAULT_DIRECTORY = '/tmp/douyin_artifacts'
+
+# ArtifactWriter 写出的文件名：<name>_<YYYYmmdd_HHMMSS_微秒>.png|html，轮转只处理这类文件
+ARTIFACT_NAME_RE = re.compile(r'_\d{8}_\d{6}_\d{6}\.(?:png|html)$')
+
+
+class ArtifactPolicy:
+    """产物保留策略"""
+
+    def __init__(self, mode=POLICY_ON_FAILURE, sample_rate=0.1, directory=DEFAULT_DIRECTORY,
+                 max_artifact_bytes=5 * 1024 * 1024, max_total_bytes=200 * 1024 * 1024,
+                 max_files=200, full_page=False):
+        if mode not in POLICIES:
+            raise ValueError(f"未知的产物策略: {mode}，可选: {', '.join(POLICIES)}")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.directory = Path(directory)
+        self.max_artifact_bytes = max_artifact_bytes  # 单个产物上限
+        self.max_total_bytes = max_total_bytes        # 目录总大小上限，超出后删除最旧文件
+        self.max_files = max_files                    # 目录文件数上限
+        self.full_page = full_page                    # 是否允许整页截图
+
+    @classmethod
+    def from_env(cls):
+        """从环境变量读取策略"""
+        return cls(
+            mode=os.environ.get('DOUYIN_ARTIFACT_POLICY', POLICY_ON_FAILURE),
+            sample_rate=float(os.environ.get('DOUYIN_ARTIFACT_SAMPLE_RATE', '0.1')),
+            directory=os.environ.get('DOUYIN_ARTIFACT_DIR', DEFAULT_DIRECTORY),
+            max_artifact_bytes=int(os.environ.get('DOUYIN_ARTIFACT_MAX_BYTES', 5 * 1024 * 1024)),
+            max_total_bytes=int(os.environ.get('DOUYIN_ARTIFACT_MAX_TOTAL_BYTES', 200 * 1024 * 1024)),
+            max_files=int(os.environ.get('DOUYIN_ARTIFACT_MAX_FILES', 200)),
+            full_page=os.environ.get('DOUYIN_ARTIFACT_FULL_PAGE', '0') == '1',
+        )
+
+    def should_capture(self, failed=False):
+        """判断本次是否需要保存产物"""
+        if self.mode == POLICY_ALWAYS:
+            return True
+        if self.mode == POLICY_NEVER:
+            return False
+        if failed:
+            return True
+        if self.mode == POLICY_SAMPLED:
+            return random.random() < self.sample_rate
+        return False
+
+
+class ArtifactWriter:
+    """按策略保存截图和 HTML，写盘在后台线程完成"""
+
+    def __init__(self, policy=None):
+        self.policy = policy or ArtifactPolicy.from_env()
+        self._tasks = set()
+        if self.policy.mode != POLICY_NEVER:
+            self.policy.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, name, ext):
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        return self.policy.directory / f"{name}_{stamp}.{ext}"
+
+    async def screenshot(self, page, name, failed=False, full_page=None):
+        """
+        按策略截图
+        :return: 截图路径，未保存时返回 None
+        """
+        if not self.policy.should_capture(failed):
+            return None
+
+        if full_page is None:
+            full_page = self.policy.full_page
+
+        data = await page.screenshot(full_page=full_page)
+        # 整页截图过大时退回到视口截图
+        if full_page and len(data) > self.policy.max_artifact_bytes:
+            data = await page.screenshot(full_page=False)
+        if len(data) > self.policy.max_artifact_bytes:
+            print(f"⚠️  截图超过大小上限，已跳过: {name} ({len(data)} 字节)")
+            return None
+
+        return self._submit(self._path(name, 'png'), data)
+
+    async def html(self, page, name, failed=False):
+        """按策略保存页面 HTML"""
+        if not self.policy.should_capture(failed):
+            return None
+        return self._save_text(await page.content(), name, 'html')
+
+    def text(self, content, name, failed=False, ext='html'):
+        """按策略保存文本内容"""
+        if not self.policy.should_capture(failed):
+            return None
+        return self._save_text(content, name, ext)
+
+    def _save_text(self, content, name, ext):
+        """保存文本，超过上限时截断"""
+        data = content.encode('utf-8')
+        if len(data) > self.policy.max_artifact_bytes:
+            data = data[:self.policy.max_artifact_bytes]
+        return self._submit(self._path(name, ext), data)
+
+    def _submit(self, path, data):
+        """提交后台写盘任务"""
+        task = asyncio.get_running_loop().create_task(asyncio.to_thread(self._write, path, data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return str(path)
+
+    def _write(self, path, data):
+        tmp_path = path.with_name(path.name + '.part')
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+        self._rotate()
+
+    def _rotate(self):
+        """
+        删除最旧的产物，直到满足文件数和总大小上限
+        只统计和删除本类写出的文件（目录可能与其他文件共用，如 DOUYIN_ARTIFACT_DIR=.）
+        """
+        entries = []
+        for entry in self.policy.directory.iterdir():
+            if not ARTIFACT_NAME_RE.search(entry.name):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.policy.max_files or total > self.policy.max_total_bytes):
+            _, size, entry = entries.pop(0)
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    async def flush(self):
+        """等待所有后台写盘任务完成"""
+        if self._tasks:
+            results = await asyncio.gather(*list(self._tasks), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"⚠️  产物写盘失败: {result}")
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+离线重新提取：对归档中的所有页面 / API 响应重新运行提取流程并写入数据库，不访问网络
+提取器改进后，用它把历史快照按抓取时的时间重新入库（快照和计数序列的时间点不变）
+
+  - 快照按 id 分批，同一批中相同正文（且同一用户）只解析一次
+  - 解析在进程池中进行，主进程写入上一批的同时下一批已在解析
+  - 每批的写入和检查点在同一个事务中提交，中断后从检查点继续，不会重复或遗漏
+
+用法：
+  python3 douyin_backfill.py run [--workers 8] [--kind html] [--keyword 贾乃亮] [--since 2026-01-01]
+  python3 douyin_backfill.py run --name v2-extractor --restart
+  python3 douyin_backfill.py status
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+from douyin_archive import DEFAULT_DIRECTORY as DEFAULT_ARCHIVE_DIR, SnapshotArchive, read_blob
+from douyin_extract import extract_page_subtrees
+from douyin_resolve_cache import sec_uid_from_url
+from douyin_store import DEFAULT_DB_PATH, ProfileStore, collect_entities
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL,
+    snapshots INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    filters TEXT  -- 该检查点运行时的过滤条件（JSON），status 按同样条件统计剩余
+);
+"""
+
+
+def extract_entities(text, kind, owner_sec_uid=None):
+    """
+    归档正文 -> (users, videos)，与抓取时同一套提取：
+    页面取 RENDER_DATA / SSR 中的用户和作品子树，JSON 响应直接遍历
+    """
+    tree = json.loads(text) if kind == 'json' else extract_page_subtrees(text)
+    return collect_entities(tree, owner_sec_uid)
+
+
+def _extract_task(task):
+    """进程池 worker：直接读取正文文件（不打开 manifest），返回提取结果"""
+    directory, sha256, codec, kind, owner = task
+    try:
+        data = read_blob(directory, sha256, codec)
+        users, videos = extract_entities(data.decode('utf-8', 'replace'), kind, owner)
+        return (sha256, owner), users, videos, None
+    except Exception as e:
+        return (sha256, owner), None, None, f"{type(e).__name__}: {e}"
+
+
+def _owner(row):
+    return sec_uid_from_url(row['url']) if row['url'] else None
+
+
+class ArchiveBackfill:
+    """按检查点分批重新提取归档快照"""
+
+    def __init__(self, archive=None, store=None, name='default', workers=None, batch_size=200,
+                 keyword=None, kind=None, source=None, since=None, until=None):
+        """
+        :param name: 检查点名称，不同提取器版本或不同过滤条件用不同名称分别记录进度
+        """
+        self.archive = archive or SnapshotArchive()
+        self.store = store or ProfileStore()
+        self.name = name
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.filters = {'keyword': keyword, 'kind': kind, 'source': source, 'since': since, 'until': until}
+        self.store.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.store.conn.execute("PRAGMA table_info(backfill_checkpoints)")}
+        if 'filters' not in columns:  # 旧数据库升级
+            self.store.conn.execute("ALTER TABLE backfill_checkpoints ADD COLUMN filters TEXT")
+
+    def checkpoint(self):
+        """:return: dict(last_id, snapshots, updated_at, filters)，没有记录时返回 None"""
+        row = self.store.conn.execute(
+            "SELECT last_id, snapshots, updated_at, filters FROM backfill_checkpoints WHERE name = ?",
+            (self.name,),
+        ).fetchone()
+        if not row:
+            return None
+        state = dict(row)
+        state['filters'] = json.loads(state['filters']) if state['filters'] else {}
+        return state
+
+    def remaining(self):
+        """
+        按检查点记录的过滤条件统计尚未处理的快照
+        :return: (快照数, 原始总字节数)，没有检查点时返回 None
+        """
+        state = self.checkpoint()
+        if not state:
+            return None
+        return self.archive.count(after_id=state['last_id'], **state['filters'])
+
+    def reset(self):
+        self.store.conn.execute("DELETE FROM backfill_checkpoints WHERE name = ?", (self.name,))
+
+    def _save_checkpoint(self, last_id, processed):
+        self.store.conn.execute(
+            """INSERT INTO backfill_checkpoints (name, last_id, snapshots, updated_at, filters)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(name) DO UPDATE SET
+                   last_id = excluded.last_id, snapshots = snapshots + excluded.snapshots,
+                   updated_at = excluded.updated_at, filters = excluded.filters""",
+            (self.name, last_id, processed, time.time(),
+             json.dumps({k: v for k, v in self.filters.items() if v is not None}, ensure_ascii=False)),
+        )
+
+    def _batches(self, after_id):
+        while True:
+            rows = self.archive.snapshots(after_id=after_id, limit=self.batch_size, **self.filters)
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1]['id']
+
+    def _tasks(self, rows):
+        tasks = {}
+        for row in rows:
+            owner = _owner(row)
+            tasks.setdefault((row['sha256'], owner),
+                             (str(self.archive.directory), row['sha256'], row['codec'], row['kind'], owner))
+        return list(tasks.values())
+
+    def _write(self, rows, results, totals):
+        """写入一批结果并推进检查点（同一事务）"""
+        results = {key: (users, videos, error) for key, users, videos, error in results}
+        with self.store.transaction():
+            # 按抓取时间写入，计数序列按时间顺序追加
+            for row in sorted(rows, key=lambda r: r['captured_at']):
+                users, videos, error = results[(row['sha256'], _owner(row))]
+                totals['bytes'] += row['size']
+                if error:
+                    totals['failed'] += 1
+                    continue
+                n_users, n_videos = self.store.save(users, videos, source='backfill',
+                                                    captured_at=row['captured_at'])
+                totals['users'] += n_users
+                totals['videos'] += n_videos
+            totals['snapshots'] += len(rows)
+            self._save_checkpoint(rows[-1]['id'], len(rows))
+
+    def run(self, restart=False, progress=True):
+        """
+        :return: dict(snapshots, failed, users, videos, bytes, elapsed)
+        """
+        if restart:
+            self.reset()
+        state = self.checkpoint()
+        after_id = state['last_id'] if state else 0
+        total, total_bytes = self.archive.count(after_id=after_id, **self.filters)
+        if state and progress:
+            print(f"↩️  从检查点继续: 已处理 {state['snapshots']:,} 个快照 (id > {after_id})")
+        if progress:
+            print(f"📦 待处理 {total:,} 个快照 ({total_bytes / 1e6:.1f} MB), {self.workers} 个进程")
+
+        totals = {'snapshots': 0, 'failed': 0, 'users': 0, 'videos': 0, 'bytes': 0}
+        started = time.perf_counter()
+        with multiprocessing.Pool(self.workers) as pool:
+            pending = None
+            batches = self._batches(after_id)
+            while True:
+                rows = next(batches, None)
+                submitted = None
+                if rows:
+                    tasks = self._tasks(rows)
+                    submitted = rows, pool.map_async(
+                        _extract_task, tasks, chunksize=max(1, len(tasks) // (self.workers * 4))
+                    )
+                if pending is not None:
+                    self._write(pending[0], pending[1].get(), totals)
+                    if progress:
+                        elapsed = time.perf_counter() - started
+                        print(f"\r🔁 {totals['snapshots']:,}/{total:,} 个快照  "
+                              f"{totals['bytes'] / elapsed / 1e6:.1f} MB/s  "
+                              f"{totals['snapshots'] / elapsed:,.0f} 个/s  失败 {totals['failed']}",
+                              end='', flush=True)
+                if submitted is None:
+                    break
+                pending = submitted
+        if progress and totals['snapshots']:
+            print()
+        totals['elapsed'] = time.perf_counter() - started
+        return totals
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').timestamp() if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='归档快照离线重新提取')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    parser.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR)
+    parser.add_argument('--name', default='default', help='检查点名称')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='开始或继续重新提取')
+    run.add_argument('--workers', type=int, help='解析进程数（默认 CPU 核数）')
+    run.add_argument('--batch', type=int, default=200, help='每批快照数（每批一个事务和检查点）')
+    run.add_argument('--keyword')
+    run.add_argument('--kind', help='html / json')
+    run.add_argument('--source', help='如 search_page / api_search')
+    run.add_argument('--since', help='YYYY-MM-DD，只处理此后抓取的快照')
+    run.add_argument('--until', help='YYYY-MM-DD，只处理此前抓取的快照')
+    run.add_argument('--restart', action='store_true', help='忽略检查点，从头开始')
+
+    sub.add_parser('status', help='查看检查点')
+
+    args = parser.parse_args()
+    archive = SnapshotArchive(args.archive_dir)
+    store = ProfileStore(args.db)
+
+    if args.command == 'status':
+        backfill = ArchiveBackfill(archive, store, args.name)
+        state = backfill.checkpoint()
+        if not state:
+            print(f"📭 检查点 {args.name} 不存在")
+            return
+        remaining, remaining_bytes = backfill.remaining()
+        conditions = ', '.join(f"{k}={v}" for k, v in state['filters'].items())
+        print(f"📍 {args.name}{f' ({conditions})' if conditions else ''}: "
+              f"已处理 {state['snapshots']:,} 个快照 (id <= {state['last_id']}), "
+              f"剩余 {remaining:,} 个 ({remaining_bytes / 1e6:.1f} MB), "
+              f"更新于 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(state['updated_at']))}")
+        return
+
+    backfill = ArchiveBackfill(archive, store, args.name, args.workers, args.batch,
+                               args.keyword, args.kind, args.source,
+                               _parse_date(args.since), _parse_date(args.until))
+    totals = backfill.run(restart=args.restart)
+    print(f"✅ {totals['snapshots']:,} 个快照 ({totals['failed']} 失败), "
+          f"写入 {totals['users']:,} 个用户 / {totals['videos']:,} 个作品, "
+          f"{totals['bytes'] / 1e6:.1f} MB 用时 {totals['elapsed']:.1f}s "
+          f"({totals['bytes'] / max(totals['elapsed'], 1e-9) / 1e6:.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+提取吞吐量基准：对仓库中保存的页面 / API 响应样例和合成的大页面运行每一条提取路径，
+报告每个提取器的 MB/s、分配（tracemalloc 峰值 / 调用后仍占用的内存）并把结果保存为 JSON，
+两个版本的结果可以直接对比，吞吐量下降或内存上升超过阈值时视为回归
+
+提取路径（都只计时不依赖浏览器 / 网络的部分）：
+  v1       douyin_scraper       _extract_data_from_page：window 数据脚本 -> 子树 -> collect_entities
+                                （浏览器中按标记筛选 script 的一步在计时之外模拟）
+  v2       douyin_scraper_v2    _extract_all_data：渲染数据子树 + scan_stats(limit=5)
+  v3       douyin_scraper_v3    _extract_user_data：渲染数据 / SSR 子树 + scan_stats(limit=3)
+  search   fetch_douyin_data    process_search_page：iter_render_data -> extract_user_stats -> collect_entities
+  api      douyin_api_client    json.loads -> DouyinAPIClient._parse_search_result（写入临时数据库）
+  full     douyin_extract       extract_render_data 完整解析整棵渲染数据树，作为对照
+
+用法：
+  python3 douyin_bench.py run [--only v2,v3] [--sizes 128,1024,4096] [--baseline latest]
+  python3 douyin_bench.py run --no-synthetic --min-time 0.5 --output bench.json
+  python3 douyin_bench.py compare .douyin_bench/old.json .douyin_bench/new.json [--threshold 0.1]
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+FIXTURE_DIR = Path(__file__).resolve().parent
+FIXTURE_PATTERNS = ('douyin_*.html', 'douyin_*.json')
+DEFAULT_DIRECTORY = os.environ.get('DOUYIN_BENCH_DIR', '.douyin_bench')
+DEFAULT_SIZES = (128, 1024, 4096)  # 合成用户主页的填充数据大小（KB）
+SEARCH_RESPONSE_USERS = 50
+FORMAT_VERSION = 1
+
+KIND_HTML = 'html'
+KIND_JSON = 'json'
+
+
+# ---- 提取器 ----
+# 每个提取器是 setup(workspace) -> (prepare, run)：
+# prepare(sample) 在计时之外执行一次（如模拟浏览器中的筛选），run(prepared) 是被计时的部分；
+# 没有 prepare 时 run 直接接收样例正文
+
+def _setup_v1(ws):
+    from douyin_extract import WINDOW_DATA_MARKERS, extract_window_subtrees, iter_scripts
+    from douyin_resolve_cache import sec_uid_from_url
+    from douyin_store import collect_entities
+
+    def prepare(sample):
+        # 对应页面内 evaluate：返回内容包含 SSR_HYDRATED_DATA / __RENDER_DATA__ 的 script
+        scripts = {}
+        for marker in WINDOW_DATA_MARKERS.values():
+            for body, offset in iter_scripts(sample['text'], marker=marker):
+                scripts[offset] = body
+        sec_uid = sec_uid_from_url(sample['url']) if sample['url'] else None
+        return [scripts[offset] for offset in sorted(scripts)], sec_uid
+
+    def run(prepared):
+        script_contents, sec_uid = prepared
+        _, subtrees = extract_window_subtrees(script_contents)
+        return collect_entities(subtrees, owner_sec_uid=sec_uid) if subtrees else None
+
+    return prepare, run
+
+
+def _setup_v2(ws):
+    from douyin_extract import extract_page_fields
+    return None, lambda text: extract_page_fields(text, stats_limit=5)
+
+
+def _setup_v3(ws):
+    from douyin_extract import extract_page_fields
+    return None, lambda text: extract_page_fields(text, stats_limit=3)
+
+
+def _setup_search(ws):
+    from douyin_extract import iter_render_data
+    from douyin_store import collect_entities
+    from fetch_douyin_data import extract_user_stats
+
+    def run(text):
+        # 与 process_search_page 相同的解析，写库部分只做 ingest 中的实体整理
+        entities = []
+        for data in iter_render_data(text):
+            extract_user_stats(data)
+            entities.append(collect_entities(data))
+        return entities
+
+    return None, run
+
+
+def _setup_api(ws):
+    from douyin_api_client import DouyinAPIClient
+    client = DouyinAPIClient(resolve_cache=ws.resolve_cache, http_cache=ws.http_cache, store=ws.store,
+                             archive=ws.archive)
+
+    def run(text):
+        data = json.loads(text)
+        client._parse_search_result(data, keyword='bench')
+        return data
+
+    return None, run
+
+
+def _setup_full(ws):
+    from douyin_extract import extract_render_data
+    return None, extract_render_data
+
+
+EXTRACTORS = {
+    'v1': (KIND_HTML, _setup_v1),
+    'v2': (KIND_HTML, _setup_v2),
+    'v3': (KIND_HTML, _setup_v3),
+    'search': (KIND_HTML, _setup_search),
+    'api': (KIND_JSON, _setup_api),
+    'full': (KIND_HTML, _setup_full),
+}
+
+
+class _Workspace:
+    """api 提取器写入的临时数据库 / 缓存 / 归档，不影响默认位置的数据"""
+
+    def __init__(self, directory):
+        from douyin_archive import SnapshotArchive
+        from douyin_http_cache import ResponseCache
+        from douyin_resolve_cache import ResolutionCache
+        from douyin_store import ProfileStore
+
+        directory = Path(directory)
+        self.store = ProfileStore(str(directory / 'store.sqlite3'))
+        self.resolve_cache = ResolutionCache(str(directory / 'resolve.sqlite3'))
+        self.http_cache = ResponseCache(directory / 'http_cache')
+        self.archive = SnapshotArchive(directory / 'archive')
+
+    def close(self):
+        for resource in (self.store, self.resolve_cache, self.http_cache, self.archive):
+            resource.close()
+
+
+# ---- 样例 ----
+
+def _sample(name, kind, text, url=None):
+    return {'name': name, 'kind': kind, 'text': text, 'url': url, 'bytes': len(text.encode('utf-8'))}
+
+
+def fixture_samples(directory=FIXTURE_DIR):
+    """仓库中保存的搜索页 HTML / API 响应"""
+    samples = []
+    for pattern in FIXTURE_PATTERNS:
+        for path in sorted(Path(directory).glob(pattern)):
+            kind = KIND_JSON if path.suffix == '.json' else KIND_HTML
+            samples.append(_sample(f"fixture/{path.name}", kind, path.read_text(encoding='utf-8', errors='replace')))
+    return samples
+
+
+def synthetic_samples(sizes=DEFAULT_SIZES, seed=42):
+    """
+    douyin_mock_server 生成的确定性页面：各填充大小的用户主页、搜索页、搜索 API 响应
+    同一 seed / 大小在不同版本之间生成的内容相同，结果可以直接对比
+    """
+    from douyin_config import DOUYIN_BASE_URL
+    from douyin_mock_server import SyntheticDouyin
+
+    samples = []
+    for kb in sizes:
+        data = SyntheticDouyin(users=1000, seed=seed, padding_kb=kb)
+        sec_uid = data.sec_uid(7)
+        samples.append(_sample(f"synthetic/user_page_{kb}kb", KIND_HTML, data.user_page(sec_uid),
+                               url=f"{DOUYIN_BASE_URL}/user/{sec_uid}"))
+    data = SyntheticDouyin(users=1000, seed=seed)
+    samples.append(_sample("synthetic/search_page", KIND_HTML, data.search_page('bench')))
+    samples.append(_sample(f"synthetic/search_response_{SEARCH_RESPONSE_USERS}", KIND_JSON,
+                           json.dumps(data.search_response('bench', count=SEARCH_RESPONSE_USERS), ensure_ascii=False)))
+    return samples
+
+
+# ---- 测量 ----
+
+def _time(run, prepared, min_time, repeat):
+    """
+    先调用一次估算每轮的调用次数（每轮至少 min_time 秒），再计时 repeat 轮
+    :return: (每次调用的最短耗时, 中位耗时, 每轮调用次数)
+    """
+    started = time.perf_counter()
+    run(prepared)
+    once = time.perf_counter() - started
+    number = max(1, int(min_time / max(once, 1e-9)))
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            run(prepared)
+        rounds.append((time.perf_counter() - started) / number)
+    return min(rounds), statistics.median(rounds), number
+
+
+def _memory(run, prepared):
+    """
+    单次调用的内存：peak 为调用期间比调用前多占用的峰值，
+    retained 为调用返回后仍占用的内存（主要是返回的结果）
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = run(prepared)
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        blocks = sum(stat.count_diff for stat in after.filter_traces(ignore).compare_to(
+            before.filter_traces(ignore), 'filename'))
+        del result
+    finally:
+        tracemalloc.stop()
+    return {'peak_bytes': peak - base, 'retained_bytes': current - base, 'retained_blocks': blocks}
+
+
+def measure(extractor, sample, ws, min_time=0.2, repeat=5, memory=True):
+    kind, setup = EXTRACTORS[extractor]
+    result = {'extractor': extractor, 'sample': sample['name'], 'bytes': sample['bytes']}
+    try:
+        prepare, run = setup(ws)
+        prepared = prepare(sample) if prepare else sample['text']
+        # 提取器的打印输出不计入（也不显示）
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            best, median, number = _time(run, prepared, min_time, repeat)
+            if memory:
+                result.update(_memory(run, prepared))
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        return result
+    result.update({
+        'calls': number * repeat,
+        'best': best,
+        'median': median,
+        'mb_s': sample['bytes'] / best / 1e6,
+    })
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=FIXTURE_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_suite(samples, extractors=None, min_time=0.2, repeat=5, memory=True, progress=True):
+    """
+    对每个 (提取器, 同类型样例) 计时
+    :return: 报告 dict(format, created_at, revision, python, machine, settings, results)
+    """
+    extractors = extractors or list(EXTRACTORS)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='douyin_bench_') as directory:
+        ws = _Workspace(directory)
+        try:
+            for name in extractors:
+                kind = EXTRACTORS[name][0]
+                for sample in samples:
+                    if sample['kind'] != kind:
+                        continue
+                    result = measure(name, sample, ws, min_time, repeat, memory)
+                    results.append(result)
+                    if progress:
+                        print(_format_result(result))
+        finally:
+            ws.close()
+    return {
+        'format': FORMAT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()}",
+        'settings': {'min_time': min_time, 'repeat': repeat, 'memory': memory},
+        'results': results,
+    }
+
+
+def _format_result(result):
+    label = f"  {result['extractor']:<7} {result['sample']:<48} {result['bytes'] / 1e3:>9,.1f} KB"
+    if 'error' in result:
+        return f"{label}  ❌ {result['error']}"
+    line = f"{label}  {result['mb_s']:>9.1f} MB/s  {result['best'] * 1e3:>9.3f} ms"
+    if 'peak_bytes' in result:
+        line += (f"  峰值 {result['peak_bytes'] / 1e3:>9,.1f} KB"
+                 f"  保留 {result['retained_bytes'] / 1e3:>8,.1f} KB / {result['retained_blocks']:,} 块")
+    return line
+
+
+# ---- 结果保存和对比 ----
+
+def save_report(report, path=None, directory=DEFAULT_DIRECTORY):
+    if path is None:
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        path = Path(directory) / f"extract_{stamp}_{report['revision'] or 'unknown'}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    return path
+
+
+def load_report(path):
+    return json.loads(Path(path).read_text(encoding='utf-8'))
+
+
+def latest_report(directory=DEFAULT_DIRECTORY):
+    """目录中最新的结果文件，没有时返回 None"""
+    paths = sorted(Path(directory).glob('extract_*.json'))
+    return paths[-1] if paths else None
+
+
+def compare(old, new, threshold=0.1):
+    """
+    按 (提取器, 样例) 对比两份报告
+    吞吐量低于旧值的 (1 - threshold) 或内存峰值高于旧值的 (1 + threshold) 时标记为回归
+    :return: [dict(extractor, sample, old_mb_s, new_mb_s, speedup, old_peak, new_peak, regressions)]
+    """
+    previous = {(r['extractor'], r['sample']): r for r in old['results'] if 'error' not in r}
+    rows = []
+    for result in new['results']:
+        before = previous.get((result['extractor'], result['sample']))
+        if before is None or 'error' in result:
+            continue
+        regressions = []
+        if result['mb_s'] < before['mb_s'] * (1 - threshold):
+            regressions.append('throughput')
+        if before.get('peak_bytes') and result.get('peak_bytes', 0) > before['peak_bytes'] * (1 + threshold):
+            regressions.append('peak_memory')
+        rows.append({
+            'extractor': result['extractor'],
+            'sample': result['sample'],
+            'old_mb_s': before['mb_s'],
+            'new_mb_s': result['mb_s'],
+            'speedup': result['mb_s'] / before['mb_s'],
+            'old_peak': before.get('peak_bytes'),
+            'new_peak': result.get('peak_bytes'),
+            'regressions': regressions,
+        })
+    return rows
+
+
+def print_comparison(old, new, rows):
+    print(f"\n📊 {old.get('revision') or '?'} ({old['created_at']}) -> {new.get('revision') or '?'} ({new['created_at']})")
+    for row in rows:
+        peak = ''
+        if row['old_peak'] is not None and row['new_peak'] is not None:
+            peak = f"  峰值 {row['old_peak'] / 1e3:,.1f} -> {row['new_peak'] / 1e3:,.1f} KB"
+        mark = f"  ⚠️ {', '.join(row['regressions'])}" if row['regressions'] else ''
+        print(f"  {row['extractor']:<7} {row['sample']:<48} {row['old_mb_s']:>8.1f} -> {row['new_mb_s']:>8.1f} MB/s "
+              f"(×{row['speedup']:.2f}){peak}{mark}")
+    regressed = [row for row in rows if row['regressions']]
+    if regressed:
+        print(f"❌ {len(regressed)} 项回归")
+    else:
+        print(f"✅ {len(rows)} 项无回归")
+    return regressed
+
+
+def _csv(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='提取吞吐量基准')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='运行基准并保存结果')
+    run.add_argument('--only', type=_csv, help=f"只运行这些提取器（逗号分隔）: {', '.join(EXTRACTORS)}")
+    run.add_argument('--fixtures', default=str(FIXTURE_DIR), help='样例目录（douyin_*.html / douyin_*.json）')
+    run.add_argument('--no-synthetic', action='store_true', help='不生成合成页面')
+    run.add_argument('--sizes', type=_csv, default=[str(kb) for kb in DEFAULT_SIZES],
+                     help='合成用户主页的填充大小（KB，逗号分隔）')
+    run.add_argument('--min-time', type=float, default=0.2, help='每轮最少计时秒数')
+    run.add_argument('--repeat', type=int, default=5, help='计时轮数（取最短）')
+    run.add_argument('--no-memory', action='store_true', help='不测量内存（tracemalloc）')
+    run.add_argument('--output', help=f'结果 JSON 路径（默认 {DEFAULT_DIRECTORY}/extract_<时间>_<版本>.json）')
+    run.add_argument('--baseline', help="与之对比的结果 JSON，'latest' 为结果目录中最新的一份")
+    run.add_argument('--threshold', type=float, default=0.1, help='回归阈值（比例）')
+
+    cmp = sub.add_parser('compare', help='对比两份结果')
+    cmp.add_argument('old')
+    cmp.add_argument('new')
+    cmp.add_argument('--threshold', type=float, default=0.1)
+
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        old, new = load_report(args.old), load_report(args.new)
+        if print_comparison(old, new, compare(old, new, args.threshold)):
+            sys.exit(1)
+        return
+
+    unknown = set(args.only or ()) - set(EXTRACTORS)
+    if unknown:
+        parser.error(f"未知的提取器: {', '.join(sorted(unknown))}")
+    baseline = args.baseline
+    if baseline == 'latest':
+        baseline = latest_report()
+        if baseline is None:
+            print(f"📭 {DEFAULT_DIRECTORY} 中没有之前的结果，不做对比")
+
+    samples = fixture_samples(args.fixtures)
+    if not args.no_synthetic:
+        samples += synthetic_samples([int(kb) for kb in args.sizes])
+    print(f"⏱️  {len(samples)} 个样例 ({sum(s['bytes'] for s in samples) / 1e6:.1f} MB), "
+          f"提取器: {', '.join(args.only or EXTRACTORS)}")
+
+    report = run_suite(samples, args.only, args.min_time, args.repeat, memory=not args.no_memory)
+    path = save_report(report, args.output)
+    print(f"💾 结果已保存: {path}")
+
+    if baseline:
+        old = load_report(baseline)
+        if print_comparison(old, report, compare(old, report, args.threshold)):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+作品统计列式导出
+安装了 pyarrow 时写 Parquet，否则写 NumPy .npz：
+  - 计数列为 int64（缺失按 0 计），create_time 为 int64 秒级时间戳
+  - aweme_id 为字符串（每行唯一，不做字典编码；不假设 ID 是纯数字或在 int64 范围内），
+    sec_uid 用字典编码：sec_uid_codes(int32) + sec_uid_dict(字符串)
+下游聚合直接在数组上做向量化计算，不必逐个字典循环
+
+安装: pip install numpy  (Parquet: pip install pyarrow)
+
+用法：
+  python3 douyin_columnar.py export video_stats.parquet [--sec-uid MS4w...]
+  python3 douyin_columnar.py export video_stats.npz
+  python3 douyin_columnar.py summary video_stats.parquet
+"""
+
+import argparse
+import importlib.util
+
+import numpy as np
+
+from douyin_store import DEFAULT_DB_PATH, VIDEO_COUNTERS, ProfileStore
+
+INT_COLUMNS = ('create_time',) + VIDEO_COUNTERS
+CHUNK_ROWS = 100_000
+
+
+def arrow_available():
+    """是否安装了 pyarrow"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+class VideoColumns:
+    """一批作品统计的列式表示（各列为等长 NumPy 数组）"""
+
+    def __init__(self, aweme_id, sec_uid_codes, sec_uid_dict, **counters):
+        self.aweme_id = aweme_id
+        self.sec_uid_codes = sec_uid_codes
+        self.sec_uid_dict = sec_uid_dict
+        self.columns = counters  # create_time + VIDEO_COUNTERS
+
+    def __len__(self):
+        return len(self.aweme_id)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def sec_uid(self):
+        """解码后的 sec_uid 列（字符串数组）"""
+        return self.sec_uid_dict[self.sec_uid_codes]
+
+    @classmethod
+    def from_rows(cls, rows, sec_uid_index=None):
+        """
+        :param rows: normalize_video 结果（或 videos 表的行）
+        :param sec_uid_index: 跨批次共享的 {sec_uid: 编码}，分块导出时保证编码一致
+        """
+        rows = list(rows)
+        index = {} if sec_uid_index is None else sec_uid_index
+        codes = np.fromiter(
+            (index.setdefault(row['sec_uid'] or '', len(index)) for row in rows), dtype=np.int32, count=len(rows)
+        )
+        counters = {
+            name: np.fromiter((row[name] or 0 for row in rows), dtype=np.int64, count=len(rows))
+            for name in INT_COLUMNS
+        }
+        aweme_id = np.array([str(row['aweme_id']) for row in rows], dtype=str)
+        return cls(aweme_id, codes, _dictionary(index), **counters)
+
+    @classmethod
+    def concat(cls, parts):
+        parts = list(parts)
+        if not parts:
+            return cls.from_rows([])
+        return cls(
+            np.concatenate([p.aweme_id for p in parts]),
+            np.concatenate([p.sec_uid_codes for p in parts]),
+            parts[-1].sec_uid_dict,  # 共享编码表，最后一块的字典最完整
+            **{name: np.concatenate([p[name] for p in parts]) for name in INT_COLUMNS},
+        )
+
+
+def _dictionary(index):
+    values = np.empty(len(index), dtype=object)
+    for value, code in index.items():
+        values[code] = value
+    return values.astype(str) if len(values) else np.array([], dtype=str)
+
+
+def iter_store_chunks(store, sec_uids=None, chunk_rows=CHUNK_ROWS):
+    """分块读取 videos 表，每块一个 VideoColumns（sec_uid 编码跨块一致）"""
+    query = f"SELECT aweme_id, sec_uid, {', '.join(INT_COLUMNS)} FROM videos"
+    if sec_uids:
+        # 账号列表可能超过 SQLite 参数个数上限，放进临时表再过滤
+        store.conn.execute("CREATE TEMP TABLE IF NOT EXISTS export_sec_uids (sec_uid TEXT PRIMARY KEY)")
+        store.conn.execute("DELETE FROM export_sec_uids")
+        store.conn.executemany("INSERT OR IGNORE INTO export_sec_uids VALUES (?)", ((s,) for s in sec_uids))
+        query += " WHERE sec_uid IN (SELECT sec_uid FROM export_sec_uids)"
+    cursor = store.conn.execute(query + " ORDER BY sec_uid, create_time")
+    index = {}
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            return
+        yield VideoColumns.from_rows(rows, index)
+
+
+def write_parquet(chunks, path):
+    """逐块写入 Parquet（每块一个 row group），sec_uid 以 Arrow 字典类型存储"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            table = pa.table({
+                'aweme_id': pa.array(chunk.aweme_id.tolist(), pa.string()),
+                'sec_uid': pa.DictionaryArray.from_arrays(
+                    pa.array(chunk.sec_uid_codes, pa.int32()), pa.array(chunk.sec_uid_dict, pa.string())
+                ),
+                **{name: pa.array(chunk[name], pa.int64()) for name in INT_COLUMNS},
+            })
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_npz(columns, path):
+    """写入压缩 .npz"""
+    np.savez_compressed(
+        path,
+        aweme_id=columns.aweme_id,
+        sec_uid_codes=columns.sec_uid_codes,
+        sec_uid_dict=columns.sec_uid_dict,
+        **{name: columns[name] for name in INT_COLUMNS},
+    )
+    return len(columns)
+
+
+def export_columns(chunks, path):
+    """
+    按扩展名和可用依赖选择格式：.parquet 需要 pyarrow；其他情况写 .npz
+    :return: (实际写入的路径, 行数)
+    """
+    if path.endswith('.parquet') and not arrow_available():
+        path = path[:-len('.parquet')] + '.npz'
+        print(f"⚠️  未安装 pyarrow，改为写入 {path}")
+    if path.endswith('.parquet'):
+        return path, write_parquet(chunks, path)
+    if not path.endswith('.npz'):
+        path += '.npz'
+    return path, write_npz(VideoColumns.concat(chunks), path)
+
+
+def export_store(store, path, sec_uids=None):
+    """导出数据库中的作品统计"""
+    return export_columns(iter_store_chunks(store, sec_uids), path)
+
+
+def read_columns(path):
+    """读取 export_columns 写出的文件，返回 VideoColumns"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        sec_uid = table.column('sec_uid').combine_chunks()
+        if not hasattr(sec_uid, 'indices'):
+            sec_uid = sec_uid.dictionary_encode()
+        return VideoColumns(
+            # 旧版本导出的 aweme_id 为 int64，统一转为字符串
+            np.asarray(table.column('aweme_id').to_pylist(), dtype=str),
+            sec_uid.indices.to_numpy(zero_copy_only=False).astype(np.int32),
+            np.asarray(sec_uid.dictionary.to_pylist(), dtype=str),
+            **{name: table.column(name).to_numpy() for name in INT_COLUMNS},
+        )
+    with np.load(path) as data:
+        return VideoColumns(
+            data['aweme_id'].astype(str), data['sec_uid_codes'], data['sec_uid_dict'],
+            **{name: data[name] for name in INT_COLUMNS},
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='作品统计列式导出')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export = sub.add_parser('export', help='从数据库导出')
+    export.add_argument('path', help='.parquet 或 .npz')
+    export.add_argument('--sec-uid', action='append', help='只导出指定用户（可多次指定）')
+
+    summary = sub.add_parser('summary', help='查看导出文件的汇总')
+    summary.add_argument('path')
+
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        path, rows = export_store(ProfileStore(args.db), args.path, args.sec_uid)
+        print(f"💾 已导出 {rows:,} 个作品: {path}")
+    else:
+        columns = read_columns(args.path)
+        print(f"📊 {len(columns):,} 个作品, {len(columns.sec_uid_dict):,} 个用户")
+        for name in VIDEO_COUNTERS:
+            print(f"  {name}: {int(columns[name].sum()):,}")
+
+
+if __name__ == "__main__":
+    main()
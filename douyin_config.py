@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+站点地址等环境变量配置（无第三方依赖，浏览器抓取器和 requests 客户端都可以直接导入）
+
+  DOUYIN_BASE_URL          主站地址，压测时指向本地模拟服务（douyin_mock_server.py）
+  DOUYIN_SEARCH_BASE_URL   搜索页地址
+"""
+
+import os
+
+DOUYIN_BASE_URL = os.environ.get('DOUYIN_BASE_URL', 'https://www.douyin.com').rstrip('/')
+DOUYIN_SEARCH_BASE_URL = os.environ.get('DOUYIN_SEARCH_BASE_URL', 'https://so.douyin.com').rstrip('/')
@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+抖音页面数据提取 - 各抓取脚本共用
+定位 RENDER_DATA / SSR 数据脚本，正确解码，并线性扫描出完整的 JSON 对象边界
+
+非贪婪正则（如 ({.*?});）会在第一个 "};" 处截断 JSON，
+这里改为按括号配对扫描（跳过字符串内容），多 MB 页面也能一次定位完整对象
+"""
+
+import binascii
+import json
+import re
+from urllib.parse import unquote
+
+# 结构字符：括号和字符串起始引号
+_STRUCT_RE = re.compile(r'[{}\[\]"]')
+# 字符串剩余部分（起始引号之后，到结束引号为止，正确处理转义）
+_STRING_TAIL_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_SCRIPT_CLOSE = '</script>'
+_UNDEFINED_RE = re.compile(r'\bundefined\b')
+_decoder = json.JSONDecoder()
+
+# window 上常见的数据变量，键为结果中的字段名
+WINDOW_DATA_MARKERS = {
+    'render_data': '__RENDER_DATA__',
+    'ssr_data': '_SSR_HYDRATED_DATA',
+}
+
+# 渲染数据中需要的子树：用户信息、作品列表、搜索结果中的用户 / 作品
+SUBTREE_KEYS = (
+    'user', 'userInfo', 'user_info', 'user_list',
+    'post', 'aweme_list', 'awemeList', 'aweme_info', 'awemeInfo',
+)
+
+# 页面统计标签 -> 结果字段名
+STAT_LABELS = {
+    '粉丝': 'followers',
+    '关注': 'following',
+    '获赞': 'likes',
+    '作品': 'works',
+}
+_COUNT_UNITS = {'': 1, '千': 1000, '万': 10000, 'w': 10000, 'W': 10000, '亿': 100000000}
+# 所有标签合成一个正则，一次扫描完成
+_STATS_RE = re.compile(
+    r'(%s)[：:\s]*(\d[\d,]*(?:\.\d+)?)\s*([千万亿wW]?)' % '|'.join(STAT_LABELS)
+)
+_COUNT_RE = re.compile(r'^\s*(\d[\d,]*(?:\.\d+)?)\s*([千万亿wW]?)\s*$')
+
+
+def find_json_end(text, start):
+    """
+    从 text[start]（必须是 '{' 或 '['）开始扫描，返回配对结束位置（不含）
+    找不到完整对象时返回 -1
+    """
+    if start >= len(text) or text[start] not in '{[':
+        return -1
+
+    depth = 0
+    pos = start
+    search = _STRUCT_RE.search
+    match_string = _STRING_TAIL_RE.match
+
+    while True:
+        m = search(text, pos)
+        if not m:
+            return -1
+        ch = m.group()
+        pos = m.end()
+
+        if ch == '"':
+            tail = match_string(text, pos)
+            if not tail:
+                return -1
+            pos = tail.end()
+        elif ch == '{' or ch == '[':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
+
+
+def loads_js_object(json_str):
+    """解析 JSON，失败时把 JS 的 undefined 替换成 null 再试一次"""
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        return json.loads(_UNDEFINED_RE.sub('null', json_str))
+
+
+def parse_object_at(text, begin):
+    """
+    解析 text[begin] 处开始的 JSON 对象，忽略其后的内容
+    优先用 C 实现的 raw_decode（一次完成定界和解析），
+    遇到 undefined 等非 JSON 内容时退回括号扫描 + 宽松解析
+    :return: (对象, 结束位置)，找不到完整对象时返回 (None, -1)
+    """
+    try:
+        return _decoder.raw_decode(text, begin)
+    except json.JSONDecodeError:
+        pass
+    end = find_json_end(text, begin)
+    if end < 0:
+        return None, -1
+    return loads_js_object(text[begin:end]), end
+
+
+def extract_json_at(text, start):
+    """解析 text 中从 start 之后第一个 '{' 开始的完整 JSON 对象"""
+    begin = text.find('{', start)
+    if begin < 0:
+        return None
+    return parse_object_at(text, begin)[0]
+
+
+def extract_assignment(text, name):
+    """
+    提取 `name = {...}` 形式的赋值（如 window.__RENDER_DATA__ = {...};）
+    :return: 解析后的对象，找不到时返回 None
+    """
+    pos = 0
+    while True:
+        idx = text.find(name, pos)
+        if idx < 0:
+            return None
+        pos = idx + len(name)
+        # 跳过空白、引号和赋值符号，确认后面紧跟对象
+        j = pos
+        while j < len(text) and text[j] in ' \t\r\n"\'=:':
+            j += 1
+        if j < len(text) and text[j] == '{':
+            data, end = parse_object_at(text, j)
+            if end > 0:
+                return data
+
+
+def _script_open_re(script_id):
+    return re.compile(
+        r'<script\b[^>]*\bid\s*=\s*["\']?%s["\']?[^>]*>' % re.escape(script_id),
+        re.IGNORECASE,
+    )
+
+
+def iter_scripts(html, script_id=None, marker=None):
+    """
+    按 id 或内容标记查找 script 标签，依次返回 (脚本内容, 内容起始偏移)
+    """
+    if script_id:
+        open_re = _script_open_re(script_id)
+        pos = 0
+        while True:
+            m = open_re.search(html, pos)
+            if not m:
+                return
+            end = html.find(_SCRIPT_CLOSE, m.end())
+            if end < 0:
+                return
+            yield html[m.end():end], m.end()
+            pos = end + len(_SCRIPT_CLOSE)
+    elif marker:
+        pos = 0
+        while True:
+            idx = html.find(marker, pos)
+            if idx < 0:
+                return
+            begin = html.rfind('<script', 0, idx)
+            begin = html.find('>', begin) + 1 if begin >= 0 else 0
+            end = html.find(_SCRIPT_CLOSE, idx)
+            if end < 0:
+                end = len(html)
+            yield html[begin:end], begin
+            pos = end + len(_SCRIPT_CLOSE)
+
+
+def find_script(html, script_id=None, marker=None):
+    """返回第一个匹配的 script 内容，找不到时返回 None"""
+    for body, _ in iter_scripts(html, script_id=script_id, marker=marker):
+        return body
+    return None
+
+
+_BARE_PERCENT_RE = re.compile(r'%(?![0-9A-Fa-f]{2})')
+
+
+def percent_decode(body):
+    """
+    URL 解码（与 urllib.parse.unquote 结果相同）
+    纯 ASCII、不含 '=' 和换行、且每个 '%' 后都是两位十六进制的内容（encodeURIComponent 的输出即如此），
+    改用 quoted-printable 的 C 实现解码，比 unquote 快一个数量级；其余情况交给 unquote
+    """
+    if (body.isascii() and '=' not in body and '\n' not in body and '\r' not in body
+            and not _BARE_PERCENT_RE.search(body)):
+        return binascii.a2b_qp(body.replace('%', '=').encode('ascii')).decode('utf-8', 'replace')
+    return unquote(body)
+
+
+def decode_render_data(body):
+    """RENDER_DATA 脚本内容是 URL 编码的 JSON，解码后返回字符串"""
+    body = body.strip()
+    if body[:3].upper() in ('%7B', '%5B'):
+        return percent_decode(body)
+    return body
+
+
+def iter_render_data(html, script_id='RENDER_DATA'):
+    """依次解析页面中所有 RENDER_DATA 脚本，跳过无法解析的块"""
+    for body, _ in iter_scripts(html, script_id=script_id):
+        decoded = decode_render_data(body)
+        begin = decoded.find('{')
+        if begin < 0:
+            continue
+        try:
+            data, end = parse_object_at(decoded, begin)
+        except json.JSONDecodeError:
+            continue
+        if end > 0:
+            yield data
+
+
+def extract_render_data(html, script_id='RENDER_DATA'):
+    """返回第一个可解析的 RENDER_DATA，找不到时返回 None"""
+    for data in iter_render_data(html, script_id=script_id):
+        return data
+    return None
+
+
+class ScriptStreamScanner:
+    """
+    增量定位 script 标签：分块喂入 HTML，目标脚本闭合后即可停止读取
+    用于流式下载，页面数据通常远早于页面结尾出现
+    """
+
+    _MAX_TAG = 512  # 跨块的开始标签最多回看的字符数
+
+    def __init__(self, script_id='RENDER_DATA'):
+        self._open_re = _script_open_re(script_id)
+        self._parts = []  # 已喂入的文本块，按需拼接，避免每块都复制整个缓冲区
+        self._length = 0
+        self._tail = ''  # 尚需与下一块拼接搜索的末尾文本
+        self._tail_start = 0
+        self._body_start = None
+        self.body = None
+        self.end = None  # 闭合标签之后的字符偏移
+
+    @property
+    def done(self):
+        return self.body is not None
+
+    @property
+    def text(self):
+        """已喂入的全部文本"""
+        if len(self._parts) > 1:
+            self._parts = [''.join(self._parts)]
+        return self._parts[0] if self._parts else ''
+
+    def feed(self, chunk):
+        """喂入一段已解码的文本，返回目标脚本是否已完整"""
+        if self.done:
+            return True
+        self._parts.append(chunk)
+        self._length += len(chunk)
+        # 只在上一块末尾 + 本块中搜索，已扫描过的前缀不再参与
+        window = self._tail + chunk
+        base = self._tail_start
+        if self._body_start is None:
+            m = self._open_re.search(window)
+            if not m:
+                self._keep_tail(window, self._MAX_TAG)
+                return False
+            self._body_start = base + m.end()
+            window = window[m.end():]
+            base = self._body_start
+        close = window.find(_SCRIPT_CLOSE)
+        if close < 0:
+            self._keep_tail(window, len(_SCRIPT_CLOSE))
+            return False
+        self.body = self.text[self._body_start:base + close]
+        self.end = base + close + len(_SCRIPT_CLOSE)
+        self._tail = ''
+        return True
+
+    def _keep_tail(self, window, size):
+        self._tail = window[-size:]
+        self._tail_start = self._length - len(self._tail)
+
+    def byte_offset(self):
+        """目标脚本结束位置在响应正文中的字节偏移（UTF-8）"""
+        if self.end is None:
+            return None
+        return len(self.text[:self.end].encode('utf-8'))
+
+    def render_data(self):
+        """解析已定位的 RENDER_DATA，未完整或无法解析时返回 None"""
+        if not self.done:
+            return None
+        return extract_render_data(self.text[:self.end])
+
+
+def extract_page_data(html):
+    """
+    从页面源码中提取所有已知数据块
+    :return: {'render_data': ..., 'ssr_data': ...}，找不到的字段不出现
+    """
+    result = {}
+
+    render_data = extract_render_data(html)
+    if render_data is not None:
+        result['render_data'] = render_data
+
+    for key, name in WINDOW_DATA_MARKERS.items():
+        if key in result:
+            continue
+        try:
+            data = extract_assignment(html, name)
+        except json.JSONDecodeError:
+            data = None
+        if data is not None:
+            result[key] = data
+
+    return result
+
+
+def _key_re(keys):
+    # 合法 JSON 中，字符串内部的引号都被转义（\"user\":），不会匹配 "user": 形式
+    return re.compile(r'"(%s)"\s*:\s*' % '|'.join(re.escape(k) for k in keys))
+
+
+_SUBTREE_RE = _key_re(SUBTREE_KEYS)
+
+
+def iter_subtrees(text, keys=SUBTREE_KEYS, begin=0, end=None):
+    """
+    按键事件扫描 JSON 文本，只解析 keys 中的键对应的值
+    其余内容由正则跳过，不构建对象；匹配到的值整体解析后不再向内扫描
+    :param end: 扫描范围的结束位置（如 script 闭合处）
+    :return: (键, 值, 值的起始位置) 的生成器
+    """
+    key_re = _SUBTREE_RE if keys is SUBTREE_KEYS else _key_re(keys)
+    end = len(text) if end is None else end
+    pos = begin
+    while True:
+        m = key_re.search(text, pos, end)
+        if not m:
+            return
+        # 前面是奇数个反斜杠时引号是转义的，说明在字符串内部
+        slashes = 0
+        while m.start() > slashes and text[m.start() - 1 - slashes] == '\\':
+            slashes += 1
+        pos = m.end()
+        if slashes % 2:
+            continue
+        try:
+            value, value_end = parse_object_at(text, pos)
+        except json.JSONDecodeError:
+            continue
+        if value_end < 0 or value_end > end:
+            continue
+        yield m.group(1), value, pos
+        pos = value_end
+
+
+def extract_subtrees(text, keys=SUBTREE_KEYS, begin=0, end=None):
+    """:return: {键: [值, ...]}，没有匹配时为空字典"""
+    subtrees = {}
+    for key, value, _ in iter_subtrees(text, keys, begin, end):
+        if value is not None:
+            subtrees.setdefault(key, []).append(value)
+    return subtrees
+
+
+def extract_page_subtrees(html, keys=SUBTREE_KEYS):
+    """
+    extract_page_data 的按需版本：各数据块只取出 keys 对应的子树（用户、作品列表等），
+    不解析、不保留整棵渲染数据树，多 MB 的页面峰值内存也只有源码本身加上子树
+    :return: {'render_data': {键: [值, ...]}, 'ssr_data': {...}}，没有匹配的数据块不出现
+    """
+    result = {}
+
+    for body, _ in iter_scripts(html, script_id='RENDER_DATA'):
+        subtrees = extract_subtrees(decode_render_data(body), keys)
+        if subtrees:
+            result['render_data'] = subtrees
+            break
+
+    for key, name in WINDOW_DATA_MARKERS.items():
+        if key in result:
+            continue
+        idx = html.find(name)
+        while idx >= 0:
+            begin = html.find('{', idx + len(name))
+            close = html.find(_SCRIPT_CLOSE, idx)
+            subtrees = extract_subtrees(html, keys, begin, close if close >= 0 else None) if begin >= 0 else {}
+            if subtrees:
+                result[key] = subtrees
+                break
+            idx = html.find(name, idx + len(name))
+
+    return result
+
+
+def extract_window_subtrees(script_contents):
+    """
+    在含 window 数据赋值的脚本中取出用户 / 作品列表子树
+    :param script_contents: 脚本内容列表（如页面内筛选出的含 WINDOW_DATA_MARKERS 的 script）
+    :return: (标记, 子树)，都没有时返回 (None, None)
+    """
+    for script in script_contents:
+        for marker in WINDOW_DATA_MARKERS.values():
+            pos = script.find(marker)
+            begin = script.find('{', pos + len(marker)) if pos >= 0 else -1
+            if begin < 0:
+                continue
+            subtrees = extract_subtrees(script, begin=begin)
+            if subtrees:
+                return marker, subtrees
+    return None, None
+
+
+def _normalize_count(number, unit):
+    value = float(number.replace(',', '')) * _COUNT_UNITS[unit]
+    return int(round(value))
+
+
+def parse_count(text):
+    """
+    把页面上的计数文本转换成整数，如 '3.5万' -> 35000，'1.2亿' -> 120000000
+    无法识别时返回 None
+    """
+    if isinstance(text, (int, float)):
+        return int(text)
+    m = _COUNT_RE.match(text or '')
+    if not m:
+        return None
+    return _normalize_count(m.group(1), m.group(2))
+
+
+def scan_stats(text, limit=5):
+    """
+    单次扫描页面文本，提取粉丝 / 关注 / 获赞 / 作品计数
+    :param limit: 每个字段最多保留的匹配数，所有字段都满时提前结束
+    :return: {'followers': [35000000, ...], ...}，值为归一化后的整数
+    """
+    stats = {}
+    full = 0
+    for m in _STATS_RE.finditer(text):
+        key = STAT_LABELS[m.group(1)]
+        values = stats.setdefault(key, [])
+        if len(values) >= limit:
+            continue
+        values.append(_normalize_count(m.group(2), m.group(3)))
+        if len(values) == limit:
+            full += 1
+            if full == len(STAT_LABELS):
+                break
+    return stats
+
+
+def extract_page_fields(html, stats_limit=5):
+    """
+    页面源码中不依赖浏览器的部分：渲染数据子树 + 计数扫描
+    :return: {'render_data': ..., 'ssr_data': ..., 'stats': scan_stats 结果}，没有的数据块不出现
+    """
+    fields = extract_page_subtrees(html)
+    fields['stats'] = scan_stats(html, limit=stats_limit)
+    return fields
+
+
+# 用户主页统计的页内提取脚本：先查 data-e2e 定向选择器，
+# 找不到时用有上限的 TreeWalker 遍历文本节点，只回传短文本字段
+PROFILE_STATS_JS = '''(maxNodes) => {
+    const clip = (s) => (s || '').trim().substring(0, 64);
+    const selectors = {
+        followers: ['[data-e2e="user-info-fans"]', '[data-e2e="user-follower-count"]'],
+        following: ['[data-e2e="user-info-follow"]', '[data-e2e="user-following-count"]'],
+        likes: ['[data-e2e="user-info-like"]', '[data-e2e="user-like-count"]'],
+        works: ['[data-e2e="user-tab-count"]', '[data-e2e="user-post-count"]'],
+    };
+    const result = {
+        stats_text: {},
+        nickname: clip(document.querySelector('[data-e2e="user-info"] h1, h1')?.textContent),
+        page_title: clip(document.title),
+        url: window.location.href,
+        scanned_nodes: 0,
+        truncated: false,
+    };
+
+    for (const [key, list] of Object.entries(selectors)) {
+        for (const sel of list) {
+            const el = document.querySelector(sel);
+            if (el) {
+                result.stats_text[key] = clip(el.textContent);
+                break;
+            }
+        }
+    }
+
+    if (Object.keys(result.stats_text).length < Object.keys(selectors).length) {
+        const labels = {'粉丝': 'followers', '关注': 'following', '获赞': 'likes', '作品': 'works'};
+        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        let node;
+        while ((node = walker.nextNode())) {
+            if (++result.scanned_nodes > maxNodes) {
+                result.truncated = true;
+                break;
+            }
+            const text = node.nodeValue.trim();
+            if (!text || text.length > 8) continue;
+            const key = labels[text.substring(0, 2)];
+            if (!key || result.stats_text[key]) continue;
+            const container = node.parentElement?.parentElement;
+            if (container) {
+                result.stats_text[key] = clip(container.textContent);
+            }
+        }
+    }
+
+    return result;
+}'''
+
+
+def parse_profile_stats(raw):
+    """把 PROFILE_STATS_JS 返回的文本统计转换成整数"""
+    stats = {}
+    for key, text in (raw.get('stats_text') or {}).items():
+        value = parse_count(text)
+        if value is None:
+            found = scan_stats(text, limit=1).get(key)
+            value = found[0] if found else None
+        if value is not None:
+            stats[key] = value
+    return stats
+
+
+async def evaluate_sized(page, script, arg=None):
+    """
+    执行页内脚本，同时统计回传负载大小（JSON 序列化后的字节数）
+    :return: (结果, 字节数)
+    """
+    result = await page.evaluate(script, arg)
+    size = len(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+    return result, size
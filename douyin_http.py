@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+异步 HTTP 客户端 - 基于 httpx
+长连接复用（keep-alive 连接池）、可选 HTTP/2（需安装 h2）、按主机限制并发连接数，
+可直接在异步抓取脚本的事件循环里并发调用
+
+安装: pip install httpx  (HTTP/2: pip install 'httpx[http2]')
+"""
+
+import asyncio
+import importlib.util
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
+
+
+def http2_available():
+    """是否安装了 HTTP/2 所需的 h2 包"""
+    return importlib.util.find_spec('h2') is not None
+
+
+class AsyncHTTPClient:
+    """共享连接池的异步 HTTP 客户端"""
+
+    def __init__(self, max_connections=20, max_connections_per_host=6, http2=True,
+                 timeout=15, headers=None, proxy=None):
+        import httpx  # 只有创建客户端时才需要 httpx，导入本模块不需要
+
+        self.http2 = http2 and http2_available()
+        self.max_connections_per_host = max_connections_per_host
+        self._host_slots = defaultdict(lambda: asyncio.Semaphore(self.max_connections_per_host))
+        self._client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=timeout,
+            headers={'User-Agent': DEFAULT_USER_AGENT, **(headers or {})},
+            proxy=proxy,
+            follow_redirects=True,
+        )
+
+    def _slot(self, url):
+        """按主机限制同时进行的请求数"""
+        return self._host_slots[urlsplit(str(url)).netloc]
+
+    async def request(self, method, url, **kwargs):
+        async with self._slot(url):
+            return await self._client.request(method, url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        """流式请求，正文读取期间一直占用该主机的并发名额"""
+        async with self._slot(url):
+            async with self._client.stream(method, url, **kwargs) as response:
+                yield response
+
+    async def get(self, url, params=None, headers=None, **kwargs):
+        return await self.request('GET', url, params=params, headers=headers, **kwargs)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
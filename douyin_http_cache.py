@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+HTTP 响应磁盘缓存
+按 方法 + URL + 规范化参数 生成键，响应体 gzip 压缩存盘，
+支持 TTL、ETag / Last-Modified 条件请求重新验证，以及按总大小的 LRU 淘汰
+
+同步（requests.Session）和异步（AsyncHTTPClient）调用方共用一份缓存
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_DIRECTORY = os.environ.get('DOUYIN_HTTP_CACHE_DIR', '.douyin_http_cache')
+
+# 每次请求都会变化、不影响响应内容的参数，不参与缓存键
+VOLATILE_PARAMS = frozenset({'msToken', '_signature', 'X-Bogus', 'a_bogus', 'webid', 'fp', 'verifyFp'})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    method TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access);
+"""
+
+
+def cache_key(method, url, params=None, ignore_params=VOLATILE_PARAMS):
+    """方法 + URL + 排序后的参数（URL 自带的查询参数一并规范化）"""
+    parts = urlsplit(url)
+    items = parse_qsl(parts.query, keep_blank_values=True)
+    items.extend((k, str(v)) for k, v in (params or {}).items())
+    items = sorted((k, v) for k, v in items if k not in ignore_params)
+    normalized = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(items), ''))
+    return hashlib.sha256(f"{method.upper()} {normalized}".encode('utf-8')).hexdigest()
+
+
+class CachedResponse:
+    """缓存命中或新下载的响应（接口与 requests.Response 的常用部分一致）"""
+
+    def __init__(self, status_code, content, headers, url, from_cache=False, encoding='utf-8'):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.url = url
+        self.from_cache = from_cache
+        self.encoding = encoding
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ResponseCache:
+    """磁盘响应缓存"""
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, default_ttl=3600,
+                 max_bytes=500 * 1024 * 1024, ignore_params=VOLATILE_PARAMS):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.ignore_params = ignore_params
+        self._lock = threading.Lock()  # 同一实例可被多个线程共享（如 SyncSingleFlight）
+        self.conn = sqlite3.connect(self.directory / 'index.sqlite3', timeout=30,
+                                    isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _body_path(self, key):
+        return self.directory / key[:2] / f"{key}.gz"
+
+    def key(self, method, url, params=None):
+        return cache_key(method, url, params, self.ignore_params)
+
+    def lookup(self, key):
+        """
+        :return: (CachedResponse, 是否仍在有效期内, 条目)，未命中返回 (None, False, None)
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, False, None
+        try:
+            content = gzip.decompress(self._body_path(key).read_bytes())
+        except (FileNotFoundError, EOFError, gzip.BadGzipFile):
+            with self._lock:
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None, False, None
+
+        now = time.time()
+        with self._lock:
+            self.conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        response = CachedResponse(row['status'], content, json.loads(row['headers']), row['url'], from_cache=True)
+        return response, row['expires_at'] > now, row
+
+    def store(self, key, method, url, status_code, content, headers, ttl=None):
+        """写入响应（压缩存盘），并在超出总大小时淘汰最久未访问的条目"""
+        path = self._body_path(key)
+        path.parent.mkdir(exist_ok=True)
+        compressed = gzip.compress(content, compresslevel=6)
+        tmp_path = path.with_suffix('.part')
+        tmp_path.write_bytes(compressed)
+        tmp_path.replace(path)
+
+        now = time.time()
+        # 存的是解压后的正文，传输相关的头不再适用
+        headers = {k.lower(): v for k, v in dict(headers).items()
+                   if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')}
+        with self._lock:
+            self.conn.execute(
+                """INSERT OR REPLACE INTO entries
+                   (key, method, url, status, headers, etag, last_modified, stored_at, expires_at, size, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (key, method.upper(), str(url), status_code, json.dumps(headers, ensure_ascii=False),
+                 headers.get('etag'), headers.get('last-modified'), now,
+                 now + (ttl if ttl is not None else self.default_ttl), len(compressed), now),
+            )
+            self._evict()
+
+    def refresh(self, key, ttl=None):
+        """304 重新验证通过后延长有效期"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "UPDATE entries SET expires_at = ?, last_access = ? WHERE key = ?",
+                (now + (ttl if ttl is not None else self.default_ttl), now, key),
+            )
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到总大小不超过 max_bytes（调用方持有锁）"""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in self.conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            try:
+                self._body_path(row['key']).unlink()
+            except FileNotFoundError:
+                pass
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (row['key'],))
+            total -= row['size']
+            if total <= self.max_bytes:
+                break
+
+    def _prepare(self, method, url, params, headers):
+        """查缓存；过期但带校验信息时返回附加了条件请求头的 headers"""
+        key = self.key(method, url, params)
+        cached, fresh, row = self.lookup(key)
+        headers = dict(headers or {})
+        if cached is not None and not fresh:
+            if row['etag']:
+                headers['If-None-Match'] = row['etag']
+            if row['last_modified']:
+                headers['If-Modified-Since'] = row['last_modified']
+        return key, cached, fresh, headers
+
+    def _finish(self, key, method, url, cached, status_code, content, headers, final_url, ttl, should_cache):
+        if status_code == 304 and cached is not None:
+            self.refresh(key, ttl)
+            return cached
+
+        response = CachedResponse(status_code, content, dict(headers), str(final_url))
+        if status_code == 200 and (should_cache is None or should_cache(response)):
+            self.store(key, method, url, status_code, content, headers, ttl)
+        return response
+
+    def request(self, session, method, url, params=None, headers=None, ttl=None, should_cache=None, **kwargs):
+        """
+        经缓存发起同步请求
+        :param session: requests.Session
+        :param should_cache: 可选判断函数，返回 False 的 200 响应不缓存（如验证页）
+        """
+        key, cached, fresh, headers = self._prepare(method, url, params, headers)
+        if fresh:
+            return cached
+        response = session.request(method, url, params=params, headers=headers, **kwargs)
+        return self._finish(key, method, url, cached, response.status_code, response.content,
+                            response.headers, response.url, ttl, should_cache)
+
+    async def request_async(self, http, method, url, params=None, headers=None, ttl=None,
+                            should_cache=None, **kwargs):
+        """
+        经缓存发起异步请求
+        :param http: AsyncHTTPClient
+        """
+        key, cached, fresh, headers = self._prepare(method, url, params, headers)
+        if fresh:
+            return cached
+        response = await http.request(method, url, params=params, headers=headers, **kwargs)
+        return self._finish(key, method, url, cached, response.status_code, response.content,
+                            response.headers, response.url, ttl, should_cache)
+
+
+_shared_cache = None
+
+
+def shared_cache():
+    """进程内共享的默认缓存实例（首次使用时创建目录）"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ResponseCache()
+    return _shared_cache
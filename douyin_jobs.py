@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+抖音抓取任务队列 - SQLite (WAL) 持久化
+支持租约、指数退避重试、死信和相同待处理任务去重，
+由多个 worker 进程各自运行 asyncio 抓取循环
+
+任务类型：
+  profile  {"sec_uid": ...} 或 {"user_id": ...}
+  search   {"keyword": ...}
+  videos   {"sec_uid": ..., "max_pages": 可选}
+
+用法：
+  python3 douyin_jobs.py enqueue search 贾乃亮
+  python3 douyin_jobs.py enqueue profile MS4wLjABAAAA...
+  python3 douyin_jobs.py work -n 4
+  python3 douyin_jobs.py stats
+  python3 douyin_jobs.py requeue-dead
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import time
+
+DEFAULT_DB_PATH = os.environ.get('DOUYIN_JOBS_DB', 'douyin_jobs.sqlite3')
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_DEAD = 'dead'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedupe_key TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    result TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+-- 同一任务在 pending / running 状态下只允许存在一条
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_dedupe
+    ON jobs(dedupe_key) WHERE status IN ('pending', 'running');
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(status, priority DESC, run_after);
+"""
+
+
+def dedupe_key(kind, payload):
+    """任务类型 + 规范化 payload 的哈希"""
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(f"{kind}:{canonical}".encode('utf-8')).hexdigest()
+
+
+class Job:
+    """领取到的任务"""
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.kind = row['kind']
+        self.payload = json.loads(row['payload'])
+        self.attempts = row['attempts']
+        self.max_attempts = row['max_attempts']
+        self.worker = row['worker']
+
+    def __repr__(self):
+        return f"Job(id={self.id}, kind={self.kind}, attempts={self.attempts})"
+
+
+class JobQueue:
+    """SQLite 任务队列，每个进程各自打开一个实例"""
+
+    def __init__(self, path=DEFAULT_DB_PATH, lease_seconds=300, backoff_base=30, backoff_max=3600):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, kind, payload, priority=0, max_attempts=5, delay=0):
+        """
+        加入任务；已有相同的待处理 / 执行中任务时不重复加入
+        :return: (任务ID, 是否新加入)
+        """
+        now = time.time()
+        key = dedupe_key(kind, payload)
+        while True:
+            cursor = self.conn.execute(
+                """INSERT OR IGNORE INTO jobs
+                   (kind, payload, dedupe_key, priority, max_attempts, run_after, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (kind, json.dumps(payload, ensure_ascii=False), key, priority, max_attempts,
+                 now + delay, now, now),
+            )
+            if cursor.rowcount:
+                return cursor.lastrowid, True
+
+            row = self.conn.execute(
+                "SELECT id, priority FROM jobs WHERE dedupe_key = ? AND status IN ('pending', 'running')",
+                (key,),
+            ).fetchone()
+            if row is not None:
+                break
+            # 冲突的任务在两条语句之间已经结束，重新加入
+
+        # 重复加入时提升到较高的优先级
+        if row['priority'] < priority:
+            self.conn.execute(
+                "UPDATE jobs SET priority = ?, updated_at = ? WHERE id = ?", (priority, now, row['id'])
+            )
+        return row['id'], False
+
+    def claim(self, worker):
+        """
+        领取一个可执行任务（待处理且到期，或租约已过期的执行中任务）
+        :return: Job，没有可执行任务时返回 None
+        """
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            while True:
+                row = self.conn.execute(
+                    """SELECT * FROM jobs
+                       WHERE (status = 'pending' AND run_after <= ?)
+                          OR (status = 'running' AND lease_until < ?)
+                       ORDER BY priority DESC, run_after
+                       LIMIT 1""",
+                    (now, now),
+                ).fetchone()
+                if row is None:
+                    self.conn.execute('COMMIT')
+                    return None
+
+                # 租约过期说明 worker 崩溃，重试次数用完的直接进死信
+                if row['status'] == STATUS_RUNNING and row['attempts'] >= row['max_attempts']:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = 'dead', last_error = ?, updated_at = ? WHERE id = ?",
+                        (f"租约过期 (worker={row['worker']})", now, row['id']),
+                    )
+                    continue
+
+                self.conn.execute(
+                    """UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                       lease_until = ?, worker = ?, updated_at = ? WHERE id = ?""",
+                    (now + self.lease_seconds, worker, now, row['id']),
+                )
+                self.conn.execute('COMMIT')
+                job = Job(row)
+                job.attempts += 1
+                job.worker = worker
+                return job
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    # 只有仍持有租约的 worker 能续租 / 完成 / 失败：租约过期后任务可能已被其他 worker（或本 worker 的
+    # 下一次尝试）重新领取，迟到的更新不能覆盖新持有者的状态
+    _OWNED = "id = ? AND status = 'running' AND worker = ? AND attempts = ?"
+
+    def heartbeat(self, job):
+        """续租；:return: 是否仍持有租约"""
+        now = time.time()
+        cursor = self.conn.execute(
+            f"UPDATE jobs SET lease_until = ?, updated_at = ? WHERE {self._OWNED}",
+            (now + self.lease_seconds, now, job.id, job.worker, job.attempts),
+        )
+        return cursor.rowcount > 0
+
+    def complete(self, job, result=None):
+        """:return: 是否仍持有租约（否则结果被丢弃）"""
+        cursor = self.conn.execute(
+            f"""UPDATE jobs SET status = 'done', result = ?, lease_until = NULL, updated_at = ?
+                WHERE {self._OWNED}""",
+            (json.dumps(result, ensure_ascii=False, default=str), time.time(), job.id, job.worker, job.attempts),
+        )
+        return cursor.rowcount > 0
+
+    def fail(self, job, error):
+        """
+        失败：按指数退避重新排队，次数用完进死信
+        :return: STATUS_PENDING / STATUS_DEAD；租约已被接管时返回 None（不修改任务）
+        """
+        now = time.time()
+        if job.attempts >= job.max_attempts:
+            cursor = self.conn.execute(
+                f"""UPDATE jobs SET status = 'dead', last_error = ?, lease_until = NULL, updated_at = ?
+                    WHERE {self._OWNED}""",
+                (str(error), now, job.id, job.worker, job.attempts),
+            )
+            return STATUS_DEAD if cursor.rowcount else None
+
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (job.attempts - 1))
+        delay *= random.uniform(0.8, 1.2)
+        cursor = self.conn.execute(
+            f"""UPDATE jobs SET status = 'pending', last_error = ?, run_after = ?, lease_until = NULL,
+                updated_at = ? WHERE {self._OWNED}""",
+            (str(error), now + delay, now, job.id, job.worker, job.attempts),
+        )
+        return STATUS_PENDING if cursor.rowcount else None
+
+    def requeue_dead(self):
+        """把死信任务重新放回队列（已有相同待处理任务的跳过）"""
+        now = time.time()
+        cursor = self.conn.execute(
+            """UPDATE OR IGNORE jobs SET status = 'pending', attempts = 0, run_after = ?, updated_at = ?
+               WHERE status = 'dead'""",
+            (now, now),
+        )
+        return cursor.rowcount
+
+    def stats(self):
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+async def handle_profile(payload):
+    from douyin_scraper_v2 import DouyinScraperV2
+    return await DouyinScraperV2(headless=True).scrape_by_direct_url(
+        payload.get('user_id'), sec_user_id=payload.get('sec_uid')
+    )
+
+
+async def handle_search(payload):
+    from douyin_scraper_v3 import DouyinUserScraper
+    return await DouyinUserScraper(headless=True, race_search=True).search_user_account(payload['keyword'])
+
+
+async def handle_videos(payload):
+    from douyin_videos import sync_user_videos
+    # 逐页写库并记录游标，失败重试时从上次的位置继续
+    return await sync_user_videos(payload['sec_uid'], max_pages=payload.get('max_pages'))
+
+
+HANDLERS = {
+    'profile': handle_profile,
+    'search': handle_search,
+    'videos': handle_videos,
+}
+
+
+async def _run_job(queue, job):
+    """执行任务并定期续租"""
+    async def keep_alive():
+        while True:
+            await asyncio.sleep(queue.lease_seconds / 3)
+            if not queue.heartbeat(job):
+                print(f"⚠️  {job} 租约已被其他 worker 接管")
+                return
+
+    handler = HANDLERS.get(job.kind)
+    if handler is None:
+        queue.fail(job, f"未知的任务类型: {job.kind}")
+        return
+
+    heartbeat = asyncio.create_task(keep_alive())
+    try:
+        result = await handler(job.payload)
+        if result is None or (isinstance(result, dict) and result.get('error')):
+            raise RuntimeError((result or {}).get('error') or '抓取无结果')
+    except Exception as e:
+        status = queue.fail(job, e)
+        print(f"⚠️  {job} 失败 ({status or '租约已过期，未更新'}): {e}")
+    else:
+        if queue.complete(job, result):
+            print(f"✅ {job} 完成")
+        else:
+            print(f"⚠️  {job} 已完成，但租约已过期，结果未写入")
+    finally:
+        heartbeat.cancel()
+
+
+async def worker_loop(db_path, worker_name, concurrency=1, poll_interval=1.0, stop_when_idle=False):
+    """单个 worker 进程内的 asyncio 抓取循环"""
+    queue = JobQueue(db_path)
+    running = set()
+    try:
+        while True:
+            while len(running) < concurrency:
+                job = queue.claim(worker_name)
+                if job is None:
+                    break
+                task = asyncio.create_task(_run_job(queue, job))
+                running.add(task)
+                task.add_done_callback(running.discard)
+
+            if not running:
+                if stop_when_idle:
+                    return
+                await asyncio.sleep(poll_interval)
+            else:
+                await asyncio.wait(running, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        queue.close()
+
+
+def _worker_main(db_path, index, concurrency, stop_when_idle):
+    worker_name = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    print(f"👷 worker 启动: {worker_name}")
+    try:
+        asyncio.run(worker_loop(db_path, worker_name, concurrency, stop_when_idle=stop_when_idle))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_workers(db_path=DEFAULT_DB_PATH, processes=None, concurrency=1, stop_when_idle=False):
+    """启动 N 个 worker 进程并等待结束"""
+    processes = processes or os.cpu_count() or 1
+    JobQueue(db_path).close()  # 先建好表，避免多个进程同时建表
+    workers = [
+        multiprocessing.Process(target=_worker_main, args=(db_path, i, concurrency, stop_when_idle))
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='抖音抓取任务队列')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = sub.add_parser('enqueue', help='加入任务')
+    enqueue.add_argument('kind', choices=sorted(HANDLERS))
+    enqueue.add_argument('target', help='search 为关键词，profile / videos 为 sec_uid')
+    enqueue.add_argument('--priority', type=int, default=0)
+
+    work = sub.add_parser('work', help='启动 worker 进程')
+    work.add_argument('-n', '--processes', type=int, default=None)
+    work.add_argument('-c', '--concurrency', type=int, default=1, help='每个进程同时执行的任务数')
+    work.add_argument('--stop-when-idle', action='store_true')
+
+    sub.add_parser('stats', help='查看队列状态')
+    sub.add_parser('requeue-dead', help='重新排队死信任务')
+
+    args = parser.parse_args()
+
+    if args.command == 'work':
+        run_workers(args.db, args.processes, args.concurrency, args.stop_when_idle)
+        return
+
+    queue = JobQueue(args.db)
+    if args.command == 'enqueue':
+        payload = {'keyword': args.target} if args.kind == 'search' else {'sec_uid': args.target}
+        job_id, created = queue.enqueue(args.kind, payload, priority=args.priority)
+        print(f"{'✅ 已加入' if created else '♻️  已存在相同任务'}: #{job_id}")
+    elif args.command == 'stats':
+        print(json.dumps(queue.stats(), ensure_ascii=False, indent=2))
+    elif args.command == 'requeue-dead':
+        print(f"♻️  重新排队 {queue.requeue_dead()} 个死信任务")
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
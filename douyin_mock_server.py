@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+本地模拟抖音服务，用于无网络环境下的压测
+按需生成确定性的合成数据（同一 seed 下同一用户 / 作品每次都相同，不占内存，可模拟上百万用户），
+提供抓取器访问的几类地址，并可注入延迟和错误：
+
+  /search/<关键词>、/search?keyword=     搜索页（用户链接 + RENDER_DATA 中的 user_list）
+  /user/<sec_uid>                        用户主页（RENDER_DATA、_SSR_HYDRATED_DATA、data-e2e 统计）
+  /aweme/v1/web/aweme/post/              作品列表（max_cursor 分页）
+  /aweme/v1/web/general/search/single/   搜索 API
+  /aweme/v1/web/user/profile/other/      用户资料 API
+  /__stats                               模拟服务自身的请求 / 错误计数
+
+数据分布：粉丝数、作品数、点赞数为对数正态（长尾），播放 / 评论 / 分享 / 收藏与点赞成比例，
+页面带有与提取无关的填充数据，大小也呈长尾分布
+
+用法：
+  python3 douyin_mock_server.py serve --users 2000000 --latency 80 --error-rate 0.01
+  DOUYIN_BASE_URL=http://127.0.0.1:8080 python3 douyin_jobs.py work -n 4 -c 8
+  python3 douyin_mock_server.py enqueue videos --count 100000
+  python3 douyin_mock_server.py sample --count 5
+"""
+
+import argparse
+import base64
+import bisect
+import hashlib
+import html
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+SEC_UID_PREFIX = 'MS4wLjABAAAA'
+AWEME_ID_BASE = 7_000_000_000_000_000_000
+MAX_VIDEOS = 5000  # 每个用户的作品数上限（aweme_id 按用户分段，不能超过 AWEME_ID_STRIDE）
+AWEME_ID_STRIDE = 100_000
+DEFAULT_EPOCH = 1_767_225_600  # 2026-01-01，作品发布时间以此为基准往前排，与运行时间无关
+
+_SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢'
+_GIVEN = ('小美', '大壮', '阿杰', '欣怡', '子涵', '浩然', '诗琪', '一鸣', '雨桐', '思远', '佳豪', '梦瑶',
+          '晨曦', '俊熙', '可馨', '宇航', '安琪', '嘉怡', '天佑', '若汐')
+_WORDS = ('今天', '分享', '日常', '旅行', '美食', '探店', '穿搭', '健身', 'vlog', '搞笑', '萌宠', '教程',
+          '挑战', '记录', '生活', '好物', '开箱', '变装', '音乐', '舞蹈', '读书', '摄影', '周末', '打卡')
+_TAGS = ('#抖音', '#日常', '#热门', '#生活记录', '#美食', '#旅行', '#搞笑', '#萌宠', '#穿搭', '#健身')
+
+_TRAILING_DIGITS_RE = re.compile(r'(\d+)$')
+
+
+class SyntheticDouyin:
+    """确定性合成数据：用户 i 和其第 j 个作品只由 (seed, i, j) 决定"""
+
+    def __init__(self, users=1_000_000, seed=42, videos_median=60, followers_median=2000,
+                 padding_kb=128, epoch=DEFAULT_EPOCH):
+        """
+        :param padding_kb: 页面中与提取无关的填充数据的中位大小（实际大小为对数正态分布）
+        """
+        self.users = users
+        self.seed = seed
+        self.videos_median = videos_median
+        self.followers_median = followers_median
+        self.padding_kb = padding_kb
+        self.epoch = epoch
+        self._filler, self._filler_ends = self._make_filler()
+
+    # ---- 标识 ----
+
+    def sec_uid(self, i):
+        """76 个字符，前缀后的 10 位十六进制是用户序号，其余为哈希"""
+        digest = hashlib.blake2b(f"{self.seed}:{i}".encode(), digest_size=42).digest()
+        return f"{SEC_UID_PREFIX}{i:010x}{base64.urlsafe_b64encode(digest).decode()[:54]}"
+
+    def index(self, sec_uid):
+        """sec_uid -> 用户序号，不是本数据集的 sec_uid 时返回 None"""
+        if not sec_uid or not sec_uid.startswith(SEC_UID_PREFIX):
+            return None
+        try:
+            i = int(sec_uid[len(SEC_UID_PREFIX):len(SEC_UID_PREFIX) + 10], 16)
+        except ValueError:
+            return None
+        return i if i < self.users and self.sec_uid(i) == sec_uid else None
+
+    def _rng(self, i, j=-1):
+        return random.Random(((self.seed * 1_000_003 + i) * AWEME_ID_STRIDE) + j + 1)
+
+    # ---- 用户 ----
+
+    def _profile(self, i):
+        """用户的计数和作品时间轴：(user dict, 最新作品时间, 作品间隔秒数)"""
+        rng = self._rng(i)
+        followers = min(int(rng.lognormvariate(math.log(self.followers_median), 2.2)), 300_000_000)
+        videos = max(0, min(MAX_VIDEOS, int(rng.lognormvariate(math.log(self.videos_median), 1.1))))
+        nickname = f"{rng.choice(_SURNAMES)}{rng.choice(_GIVEN)}{i}"
+        user = {
+            'uid': str(60_000_000_000 + i * 7919),
+            'sec_uid': self.sec_uid(i),
+            'unique_id': f"dy{i:09d}",
+            'nickname': nickname,
+            'signature': ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(0, 12))),
+            'follower_count': followers,
+            'following_count': int(rng.lognormvariate(math.log(150), 1.0)),
+            'aweme_count': videos,
+            'total_favorited': int(followers * rng.uniform(2, 30)),
+            'avatar_thumb': {'url_list': [f"https://p3-pc.douyinpic.com/aweme/100x100/{self.sec_uid(i)[-20:]}.jpeg"]},
+            'verification_type': rng.choice((0, 0, 0, 1)),
+        }
+        latest = self.epoch - int(rng.expovariate(1 / (3 * 86400)))
+        span = rng.lognormvariate(math.log(400 * 86400), 0.8)  # 账号作品覆盖的时间跨度
+        interval = max(600, int(span / max(videos, 1)))
+        return user, latest, interval
+
+    def user(self, i):
+        return self._profile(i)[0]
+
+    def user_by_sec_uid(self, sec_uid):
+        i = self.index(sec_uid)
+        return None if i is None else self.user(i)
+
+    # ---- 作品 ----
+
+    @staticmethod
+    def _create_time(latest, interval, i, j):
+        # 抖动小于间隔的一半，时间严格递减
+        return latest - j * interval - (j * 2_654_435_761 + i) % max(1, interval // 2)
+
+    def video(self, i, j, profile=None):
+        user, latest, interval = profile or self._profile(i)
+        rng = self._rng(i, j)
+        create_time = self._create_time(latest, interval, i, j)
+        digg = int(rng.lognormvariate(math.log(max(user['follower_count'], 10) * 0.01 + 5), 1.6))
+        desc_words = int(rng.lognormvariate(math.log(6), 0.7))
+        aweme_id = str(AWEME_ID_BASE + i * AWEME_ID_STRIDE + j)
+        return {
+            'aweme_id': aweme_id,
+            'desc': ' '.join(rng.choice(_WORDS) for _ in range(desc_words)) + ' ' + ' '.join(
+                rng.sample(_TAGS, rng.randint(0, 4))),
+            'create_time': create_time,
+            'duration': rng.randint(5_000, 300_000),
+            'author': {'uid': user['uid'], 'sec_uid': user['sec_uid'], 'nickname': user['nickname']},
+            'statistics': {
+                'aweme_id': aweme_id,
+                'digg_count': digg,
+                'play_count': int(digg * rng.uniform(10, 60)),
+                'comment_count': int(digg * rng.uniform(0.01, 0.08)),
+                'share_count': int(digg * rng.uniform(0.005, 0.05)),
+                'collect_count': int(digg * rng.uniform(0.01, 0.1)),
+            },
+            'video': {
+                'play_addr': {'url_list': [f"https://v26-web.douyinvod.com/{aweme_id}/{k}/video.mp4"
+                                           for k in range(3)]},
+                'cover': {'url_list': [f"https://p3-pc-sign.douyinpic.com/tos-cn-p-0015/{aweme_id}~c5_300x400.jpeg"]},
+                'width': 1080, 'height': 1920,
+            },
+        }
+
+    def _first_index(self, i, profile, max_cursor):
+        """max_cursor（毫秒）之后的第一个作品序号"""
+        user, latest, interval = profile
+        if not max_cursor:
+            return 0
+        j = max(0, (latest - max_cursor // 1000) // interval - 1)
+        while j < user['aweme_count'] and self._create_time(latest, interval, i, j) * 1000 >= max_cursor:
+            j += 1
+        return j
+
+    def post_page(self, sec_uid, max_cursor=0, count=18):
+        """/aweme/v1/web/aweme/post/ 的响应，游标为最后一个作品的发布时间（毫秒）"""
+        i = self.index(sec_uid)
+        if i is None:
+            return {'status_code': 0, 'aweme_list': [], 'max_cursor': 0, 'has_more': 0}
+        profile = self._profile(i)
+        total = profile[0]['aweme_count']
+        start = self._first_index(i, profile, max_cursor)
+        videos = [self.video(i, j, profile) for j in range(start, min(start + count, total))]
+        return {
+            'status_code': 0,
+            'aweme_list': videos,
+            'max_cursor': videos[-1]['create_time'] * 1000 if videos else max_cursor,
+            'min_cursor': videos[0]['create_time'] * 1000 if videos else max_cursor,
+            'has_more': int(start + count < total),
+        }
+
+    # ---- 搜索 ----
+
+    def search(self, keyword, offset=0, count=10):
+        """
+        关键词末尾是数字时（如合成昵称 "王小美123"），第一个结果就是该序号的用户；
+        否则按关键词哈希选取，结果同样是确定的
+        """
+        m = _TRAILING_DIGITS_RE.search(keyword or '')
+        if m and int(m.group(1)) < self.users:
+            first = int(m.group(1))
+        else:
+            first = int.from_bytes(hashlib.blake2b(f"{self.seed}:{keyword}".encode(), digest_size=8).digest(),
+                                   'big') % self.users
+        return [(first + k * 7_919) % self.users for k in range(offset, offset + count)]
+
+    def search_response(self, keyword, offset=0, count=10):
+        users = [self.user(i) for i in self.search(keyword, offset, count)]
+        return {
+            'status_code': 0,
+            'user_list': [{'user_info': user} for user in users],
+            'cursor': offset + count,
+            'has_more': 1,
+            'extra': {'now': self.epoch * 1000},
+        }
+
+    # ---- 页面 ----
+
+    def _make_filler(self):
+        """
+        与提取无关的渲染数据（配置、埋点、国际化文本等），预先 URL 编码，按对象边界截取
+        :return: (编码后的 JSON 对象序列, 每个对象结束处的偏移)
+        """
+        rng = random.Random(self.seed)
+        size = max(self.padding_kb, 1) * 1024 * 8
+        chunks, ends, length = [], [], 0
+        while length < size:
+            chunk = {'k': f"{rng.getrandbits(64):016x}",
+                     'v': ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(200))}
+            text = quote(json.dumps(chunk), safe='')
+            length += len(text) + (3 if chunks else 0)  # 逗号编码为 %2C
+            chunks.append(text)
+            ends.append(length)
+        return '%2C'.join(chunks), ends
+
+    def _padding(self, rng):
+        """URL 编码后的填充数据（JSON 数组）"""
+        size = int(rng.lognormvariate(math.log(max(self.padding_kb, 1) * 1024), 0.6))
+        n = bisect.bisect_right(self._filler_ends, size)
+        return '%5B' + (self._filler[:self._filler_ends[n - 1]] if n else '') + '%5D'
+
+    @staticmethod
+    def _render_data_script(data, padding):
+        """
+        data['app']['abTestData'] 为 None 占位，拼入已编码的填充数据（每个页面不必重新编码整段填充）
+        """
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        before, after = text.split('"abTestData":null', 1)
+        return (f'<script id="RENDER_DATA" type="application/json">'
+                f'{quote(before, safe="")}%22abTestData%22%3A{padding}{quote(after, safe="")}</script>')
+
+    def user_page(self, sec_uid):
+        i = self.index(sec_uid)
+        if i is None:
+            return None
+        profile = self._profile(i)
+        user = profile[0]
+        post = self.post_page(sec_uid, 0, 18)
+        rng = self._rng(i, -2)
+        render_data = {
+            'app': {'abTestData': None, 'odin': {'user_id': user['uid']}},
+            '1': {
+                'uid': user['uid'],
+                'user': {'user': user, 'statusCode': 0},
+                'post': {'data': post['aweme_list'], 'cursor': post['max_cursor'], 'hasMore': post['has_more']},
+            },
+        }
+        ssr_data = {'user': {'user': user}, 'post': {'aweme_list': post['aweme_list']}}
+        name = html.escape(user['nickname'])
+        return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>{name}的抖音 - 抖音</title></head>
+<body><div id="root"><div data-e2e="user-info"><h1>{name}</h1>
+<p>抖音号：{user['unique_id']}</p>
+<div><span data-e2e="user-info-follow">{_display_count(user['following_count'])}</span><span>关注</span></div>
+<div><span data-e2e="user-info-fans">{_display_count(user['follower_count'])}</span><span>粉丝</span></div>
+<div><span data-e2e="user-info-like">{_display_count(user['total_favorited'])}</span><span>获赞</span></div>
+<div><span>作品</span><span data-e2e="user-tab-count">{user['aweme_count']}</span></div></div>
+<ul data-e2e="scroll-list">{''.join(
+            f'<li><a href="/video/{v["aweme_id"]}">{html.escape(v["desc"][:30])}</a></li>' for v in post['aweme_list'])}</ul></div>
+{self._render_data_script(render_data, self._padding(rng))}
+<script>window._SSR_HYDRATED_DATA={json.dumps(ssr_data, ensure_ascii=False)}</script>
+</body></html>"""
+
+    def search_page(self, keyword):
+        users = [self.user(i) for i in self.search(keyword)]
+        render_data = {
+            'app': {'abTestData': None},
+            'search': {'user_list': [{'user_info': user} for user in users], 'keyword': keyword},
+        }
+        items = ''.join(
+            f'<li><a href="/user/{u["sec_uid"]}"><span>{html.escape(u["nickname"])}</span></a>'
+            f'<span>抖音号: {u["unique_id"]}</span><span>{_display_count(u["follower_count"])}粉丝</span></li>'
+            for u in users
+        )
+        return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(keyword)} - 抖音搜索</title></head>
+<body><div id="search-result"><ul data-e2e="scroll-list">{items}</ul></div>
+{self._render_data_script(render_data, self._padding(random.Random(keyword)))}
+</body></html>"""
+
+
+def _display_count(n):
+    """页面上的计数写法：12345 -> 1.2万"""
+    if n >= 100_000_000:
+        return f"{n / 100_000_000:.1f}亿"
+    if n >= 10_000:
+        return f"{n / 10_000:.1f}万"
+    return str(n)
+
+
+VERIFY_PAGE = ('<!DOCTYPE html><html><head><meta charset="utf-8"><title>验证码中间页</title></head>'
+               '<body><div id="captcha_container">请完成下列验证后继续</div></body></html>')
+VERIFY_SEARCH = {'status_code': 0, 'data': [], 'search_nil_info': {'search_nil_type': 'verify_check'}}
+
+FAULT_ERROR = 'error'
+FAULT_THROTTLE = 'throttle'
+FAULT_VERIFY = 'verify'
+FAULT_DROP = 'drop'
+
+
+class FaultInjector:
+    """按概率注入延迟和错误"""
+
+    def __init__(self, latency=0.0, jitter=0.5, error_rate=0.0, throttle_rate=0.0, verify_rate=0.0,
+                 drop_rate=0.0, seed=None):
+        """
+        :param latency: 响应延迟中位数（秒），实际延迟为对数正态分布，jitter 为其 sigma
+        :param error_rate: 返回 503 的比例
+        :param throttle_rate: 返回 429 的比例
+        :param verify_rate: 返回验证码页 / verify_check 的比例（HTTP 200）
+        :param drop_rate: 不返回响应直接断开连接的比例
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rates = ((FAULT_ERROR, error_rate), (FAULT_THROTTLE, throttle_rate),
+                      (FAULT_VERIFY, verify_rate), (FAULT_DROP, drop_rate))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if not self.latency:
+            return 0.0
+        with self._lock:
+            return self.latency * self._rng.lognormvariate(0, self.jitter)
+
+    def pick(self):
+        """:return: 本次注入的错误类型，不注入时返回 None"""
+        with self._lock:
+            x = self._rng.random()
+        for fault, rate in self.rates:
+            if x < rate:
+                return fault
+            x -= rate
+        return None
+
+
+class MockDouyinServer(ThreadingHTTPServer):
+    """模拟抖音的 HTTP 服务（每个连接一个线程，支持 keep-alive）"""
+
+    daemon_threads = True
+
+    def __init__(self, address, data=None, faults=None):
+        super().__init__(address, _Handler)
+        self.data = data or SyntheticDouyin()
+        self.faults = faults or FaultInjector()
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, **increments):
+        with self._lock:
+            self.counters.update(increments)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'douyin-mock'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type, headers=None):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(**{f"status_{status}": 1}, bytes_sent=len(data))
+
+    def _html(self, body, status=200):
+        self._send(status, body, 'text/html; charset=utf-8')
+
+    def _json(self, data, status=200):
+        self._send(status, json.dumps(data, ensure_ascii=False), 'application/json; charset=utf-8')
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        route, handler = self._route(path)
+        self.server.count(requests=1, **{f"route_{route}": 1})
+
+        if route == '__stats':
+            self._json(self.server.stats())
+            return
+
+        delay = self.server.faults.delay()
+        if delay:
+            time.sleep(delay)
+        fault = self.server.faults.pick() if handler else None
+        if fault:
+            self.server.count(**{f"fault_{fault}": 1})
+        if fault == FAULT_DROP:
+            self.close_connection = True
+            return
+        if fault == FAULT_ERROR:
+            self._html('<html><body>Service Unavailable</body></html>', 503)
+            return
+        if fault == FAULT_THROTTLE:
+            self._send(429, '{"status_code":2154,"status_msg":"too many requests"}',
+                       'application/json; charset=utf-8', {'Retry-After': '1'})
+            return
+        if handler is None:
+            self._html('<html><body>404</body></html>', 404)
+            return
+        handler(self, path, query, fault == FAULT_VERIFY)
+
+    def _route(self, path):
+        if path == '/__stats':
+            return '__stats', None
+        if path.startswith('/aweme/v1/web/aweme/post'):
+            return 'post', _Handler._post
+        if path.startswith('/aweme/v1/web/general/search') or path.startswith('/aweme/v1/web/discover/search'):
+            return 'search_api', _Handler._search_api
+        if path.startswith('/aweme/v1/web/user/profile/other'):
+            return 'profile_api', _Handler._profile_api
+        if path.startswith('/user/'):
+            return 'user_page', _Handler._user_page
+        if path == '/search' or path.startswith('/search/'):
+            return 'search_page', _Handler._search_page
+        if path == '/':
+            return 'home', _Handler._home
+        return 'not_found', None
+
+    def _post(self, path, query, verify):
+        if verify:
+            # 风控时作品列表返回的不是 JSON
+            self._html(VERIFY_PAGE)
+            return
+        self._json(self.server.data.post_page(
+            query.get('sec_user_id'), int(query.get('max_cursor') or 0), min(int(query.get('count') or 18), 50)
+        ))
+
+    def _search_api(self, path, query, verify):
+        if verify:
+            self._json(VERIFY_SEARCH)
+            return
+        self._json(self.server.data.search_response(
+            query.get('keyword', ''), int(query.get('offset') or 0), min(int(query.get('count') or 10), 50)
+        ))
+
+    def _profile_api(self, path, query, verify):
+        user = self.server.data.user_by_sec_uid(query.get('sec_user_id'))
+        if verify or user is None:
+            self._json({'status_code': 2053 if user is None else 0, 'user': None})
+            return
+        self._json({'status_code': 0, 'user': user})
+
+    def _user_page(self, path, query, verify):
+        page = None if verify else self.server.data.user_page(path[len('/user/'):].split('/')[0])
+        if verify:
+            self._html(VERIFY_PAGE)
+        elif page is None:
+            self._html('<html><head><title>用户不存在 - 抖音</title></head><body>用户不存在</body></html>', 404)
+        else:
+            self._html(page)
+
+    def _search_page(self, path, query, verify):
+        keyword = query.get('keyword') or path[len('/search/'):].split('/')[0]
+        if keyword == 'user':  # /search/user?keyword=...
+            keyword = query.get('keyword', '')
+        self._html(VERIFY_PAGE if verify else self.server.data.search_page(keyword))
+
+    def _home(self, path, query, verify):
+        self._html('<!DOCTYPE html><html><head><title>抖音-记录美好生活</title></head><body></body></html>')
+
+
+def serve(data, faults, host='127.0.0.1', port=8080):
+    """前台运行，Ctrl+C 停止"""
+    server = MockDouyinServer((host, port), data, faults)
+    print(f"🧪 模拟抖音服务: {server.base_url}  ({data.users:,} 个用户, seed={data.seed})")
+    print(f"   export DOUYIN_BASE_URL={server.base_url} DOUYIN_SEARCH_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n👋 已停止: {json.dumps(server.stats(), ensure_ascii=False)}")
+    finally:
+        server.server_close()
+
+
+def start_background(data=None, faults=None, host='127.0.0.1', port=0):
+    """在后台线程启动（port=0 时自动选择端口），返回 server，用完调用 server.shutdown()"""
+    server = MockDouyinServer((host, port), data, faults)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟抖音服务')
+    parser.add_argument('--users', type=int, default=1_000_000, help='合成用户数')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--videos-median', type=int, default=60, help='每个用户作品数的中位数')
+    parser.add_argument('--padding-kb', type=int, default=128, help='页面填充数据的中位大小')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('serve', help='启动服务')
+    run.add_argument('--host', default='127.0.0.1')
+    run.add_argument('--port', type=int, default=8080)
+    run.add_argument('--latency', type=float, default=0, help='响应延迟中位数（毫秒）')
+    run.add_argument('--jitter', type=float, default=0.5, help='延迟的对数正态 sigma')
+    run.add_argument('--error-rate', type=float, default=0, help='503 比例')
+    run.add_argument('--throttle-rate', type=float, default=0, help='429 比例')
+    run.add_argument('--verify-rate', type=float, default=0, help='验证码页比例')
+    run.add_argument('--drop-rate', type=float, default=0, help='直接断开连接的比例')
+    run.add_argument('--fault-seed', type=int, help='错误注入的随机种子（固定后可复现）')
+
+    sample = sub.add_parser('sample', help='打印合成用户（sec_uid、昵称、作品数）')
+    sample.add_argument('--count', type=int, default=10)
+    sample.add_argument('--offset', type=int, default=0)
+
+    enqueue = sub.add_parser('enqueue', help='把合成用户作为任务加入队列')
+    enqueue.add_argument('kind', choices=('profile', 'search', 'videos'))
+    enqueue.add_argument('--count', type=int, default=10_000)
+    enqueue.add_argument('--offset', type=int, default=0)
+    enqueue.add_argument('--max-pages', type=int, help='videos 任务的页数上限')
+    enqueue.add_argument('--db', help='任务队列数据库（默认 DOUYIN_JOBS_DB）')
+
+    args = parser.parse_args()
+    data = SyntheticDouyin(args.users, args.seed, args.videos_median, padding_kb=args.padding_kb)
+
+    if args.command == 'serve':
+        faults = FaultInjector(args.latency / 1000, args.jitter, args.error_rate, args.throttle_rate,
+                               args.verify_rate, args.drop_rate, args.fault_seed)
+        serve(data, faults, args.host, args.port)
+    elif args.command == 'sample':
+        for i in range(args.offset, min(args.offset + args.count, args.users)):
+            user = data.user(i)
+            print(f"{user['sec_uid']}  {user['nickname']}  粉丝 {user['follower_count']:,}  "
+                  f"作品 {user['aweme_count']}")
+    else:
+        from douyin_jobs import DEFAULT_DB_PATH, JobQueue
+        queue = JobQueue(args.db or DEFAULT_DB_PATH)
+        started = time.perf_counter()
+        created = 0
+        for i in range(args.offset, min(args.offset + args.count, args.users)):
+            if args.kind == 'search':
+                payload = {'keyword': data.user(i)['nickname']}
+            else:
+                payload = {'sec_uid': data.sec_uid(i)}
+                if args.kind == 'videos' and args.max_pages:
+                    payload['max_pages'] = args.max_pages
+            created += queue.enqueue(args.kind, payload)[1]
+        queue.close()
+        print(f"✅ 已加入 {created:,} 个 {args.kind} 任务 ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
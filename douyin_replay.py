@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+网络流量录制 / 回放，用于离线、可重复地测试和计时抓取器
+录制：真实抓取时记录每个请求（方法 + URL + 请求体）及响应（状态、头、正文、耗时）
+回放：通过 Playwright 路由（context.route）和 requests 适配器直接返回录制的响应，不访问网络
+
+录制目录：
+  entries.jsonl                 每个请求一行（method, url, key, status, headers, sha256, size, elapsed, resource_type）
+  objects/ab/<sha256>.zst|.gz   响应正文，与快照归档相同的按内容寻址存储
+
+请求按 douyin_http_cache.cache_key 匹配（忽略 msToken / webid / 签名等每次都变的参数），
+同一请求录制了多次时按录制顺序依次返回，之后一直返回最后一次
+
+用法：
+  python3 douyin_replay.py record recordings/贾乃亮 --target v3 --keyword 贾乃亮
+  python3 douyin_replay.py bench recordings/贾乃亮 --target v3 --keyword 贾乃亮 --runs 5 [--latency recorded]
+  python3 douyin_replay.py info recordings/贾乃亮
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.client import responses as HTTP_REASONS
+from pathlib import Path
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from douyin_archive import CODEC_GZIP, CODEC_ZSTD, blob_path, compress, read_blob, zstd_available
+from douyin_http_cache import VOLATILE_PARAMS, cache_key
+
+MODE_RECORD = 'record'
+MODE_REPLAY = 'replay'
+
+# 页面脚本每次生成的参数，也不参与匹配
+REPLAY_VOLATILE_PARAMS = VOLATILE_PARAMS | frozenset({'uifid', 'ts', '_rticket', 'timestamp', 'X-Gnarly'})
+
+# 录制时直接放行、回放时直接中止的资源类型（与提取无关，体积大）
+SKIPPED_RESOURCE_TYPES = frozenset({'image', 'media', 'font'})
+
+# 正文已解压保存，传输相关的头不再适用
+_DROPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+def _body_bytes(body):
+    if body is None:
+        return b''
+    return body.encode('utf-8') if isinstance(body, str) else bytes(body)
+
+
+class TrafficRecording:
+    """一份录制（目录），录制或回放模式"""
+
+    def __init__(self, directory, mode=MODE_REPLAY, latency=None, ignore_params=REPLAY_VOLATILE_PARAMS,
+                 codec=None):
+        """
+        :param latency: 回放时每个响应的延迟：None 不等待，'recorded' 按录制耗时，数字为固定秒数
+        """
+        if mode not in (MODE_RECORD, MODE_REPLAY):
+            raise ValueError(f"未知的模式: {mode}")
+        self.directory = Path(directory)
+        (self.directory / 'objects').mkdir(parents=True, exist_ok=True)
+        self.mode = mode
+        self.latency = latency
+        self.ignore_params = ignore_params
+        self.codec = codec or (CODEC_ZSTD if zstd_available() else CODEC_GZIP)
+        self._lock = threading.Lock()  # requests 可能在多个线程中使用
+        self._entries = {}
+        self._served = {}
+        self.hits = 0
+        self.misses = []
+        self.recorded = 0
+        self._load()
+
+    @property
+    def entries_path(self):
+        return self.directory / 'entries.jsonl'
+
+    def _load(self):
+        if not self.entries_path.exists():
+            return
+        with open(self.entries_path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry['key'], []).append(entry)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def entries(self):
+        """按录制顺序（同一请求的多次录制相邻）列出全部条目"""
+        return [entry for entries in self._entries.values() for entry in entries]
+
+    def key(self, method, url, body=None):
+        key = cache_key(method, url, ignore_params=self.ignore_params)
+        body = _body_bytes(body)
+        return f"{key}:{hashlib.sha256(body).hexdigest()[:16]}" if body else key
+
+    def reset(self):
+        """回放计数归零（每次基准运行前调用，使重复请求再次从第一份录制开始）"""
+        with self._lock:
+            self._served.clear()
+            self.hits = 0
+            self.misses = []
+
+    def record(self, method, url, body, status, headers, content, elapsed, resource_type=None):
+        """保存一次请求的响应（content 为解压后的正文）"""
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = blob_path(self.directory, sha256, self.codec)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix('.part')
+            tmp_path.write_bytes(compress(content, self.codec))
+            tmp_path.replace(path)
+        entry = {
+            'method': method.upper(),
+            'url': str(url),
+            'key': self.key(method, url, body),
+            'status': status,
+            'headers': {k.lower(): v for k, v in dict(headers).items() if k.lower() not in _DROPPED_HEADERS},
+            'sha256': sha256,
+            'codec': self.codec,
+            'size': len(content),
+            'elapsed': elapsed,
+            'resource_type': resource_type,
+        }
+        with self._lock:
+            with open(self.entries_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._entries.setdefault(entry['key'], []).append(entry)
+            self.recorded += 1
+
+    def lookup(self, method, url, body=None):
+        """:return: (录制条目, 正文)，没有录制时返回 None"""
+        key = self.key(method, url, body)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.misses.append(f"{method.upper()} {url}")
+                return None
+            index = self._served.get(key, 0)
+            self._served[key] = index + 1
+            self.hits += 1
+        entry = entries[min(index, len(entries) - 1)]
+        return entry, read_blob(self.directory, entry['sha256'], entry['codec'])
+
+    def delay(self, entry):
+        """回放该响应前应等待的秒数"""
+        if self.latency == 'recorded':
+            return entry['elapsed']
+        return float(self.latency or 0)
+
+    # ---- Playwright ----
+
+    async def attach(self, context):
+        """在浏览器上下文上安装路由（抓取器创建 context 后调用）"""
+        await context.route('**/*', self._route)
+
+    async def _route(self, route):
+        request = route.request
+        if self.mode == MODE_RECORD:
+            if request.resource_type in SKIPPED_RESOURCE_TYPES:
+                await route.continue_()
+                return
+            started = time.perf_counter()
+            # 不跟随重定向：3xx 原样交给浏览器，浏览器再请求 Location 时录制下一跳，
+            # page.url 与真实访问时一致（sec_uid_from_url 依赖重定向后的地址）
+            response = await route.fetch(max_redirects=0)
+            content = await response.body()
+            self.record(request.method, request.url, request.post_data_buffer, response.status,
+                        response.headers, content, time.perf_counter() - started, request.resource_type)
+            await route.fulfill(response=response, body=content)
+            return
+
+        if request.resource_type in SKIPPED_RESOURCE_TYPES:
+            await route.abort()
+            return
+        hit = self.lookup(request.method, request.url, request.post_data_buffer)
+        if hit is None:
+            await route.abort('internetdisconnected')
+            return
+        entry, content = hit
+        delay = self.delay(entry)
+        if delay:
+            await asyncio.sleep(delay)
+        await route.fulfill(status=entry['status'], headers=entry['headers'], body=content)
+
+    # ---- requests ----
+
+    def mount(self, session):
+        """在 requests.Session 上安装录制 / 回放适配器"""
+        adapter = RecordingAdapter(self) if self.mode == MODE_RECORD else ReplayAdapter(self)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+
+class RecordingAdapter(HTTPAdapter):
+    """照常发出请求，同时录制响应"""
+
+    def __init__(self, recording, **kwargs):
+        super().__init__(**kwargs)
+        self.recording = recording
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        content = response.content  # 读取完整正文（已解压）
+        self.recording.record(request.method, request.url, request.body, response.status_code,
+                              response.headers, content, time.perf_counter() - started, 'fetch')
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """从录制返回响应，未录制的请求抛出 requests.ConnectionError"""
+
+    def __init__(self, recording):
+        super().__init__()
+        self.recording = recording
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        hit = self.recording.lookup(request.method, request.url, request.body)
+        if hit is None:
+            raise requests.ConnectionError(f"未录制的请求: {request.method} {request.url}", request=request)
+        entry, content = hit
+        delay = self.recording.delay(entry)
+        if delay:
+            time.sleep(delay)
+
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = content
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=delay)
+        response.reason = HTTP_REASONS.get(entry['status'], '')
+        return response
+
+    def close(self):
+        pass
+
+
+# ---- 基准 ----
+
+class _Workspace:
+    """每次运行独立的数据库 / 缓存 / 归档，避免上一次运行的缓存让抓取器跳过网络请求"""
+
+    def __init__(self, directory):
+        from douyin_archive import SnapshotArchive
+        from douyin_artifacts import ArtifactPolicy, ArtifactWriter, POLICY_NEVER
+        from douyin_http_cache import ResponseCache
+        from douyin_resolve_cache import ResolutionCache
+        from douyin_store import ProfileStore
+
+        directory = Path(directory)
+        self.store = ProfileStore(str(directory / 'store.sqlite3'))
+        self.resolve_cache = ResolutionCache(str(directory / 'resolve.sqlite3'))
+        self.http_cache = ResponseCache(directory / 'http_cache')
+        self.archive = SnapshotArchive(directory / 'archive')
+        self.artifacts = ArtifactWriter(ArtifactPolicy(POLICY_NEVER, directory=directory / 'artifacts'))
+
+    def close(self):
+        for resource in (self.store, self.resolve_cache, self.http_cache, self.archive):
+            resource.close()
+
+    def counts(self):
+        return {table: self.store.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('users', 'videos')}
+
+
+async def _run_v1(keyword, traffic, ws, headless):
+    from douyin_scraper import DouyinScraper
+    scraper = DouyinScraper(headless=headless, artifacts=ws.artifacts, store=ws.store, traffic=traffic)
+    return await scraper.scrape_user_info(keyword)
+
+
+async def _run_v2(keyword, traffic, ws, headless):
+    from douyin_scraper_v2 import DouyinScraperV2
+    scraper = DouyinScraperV2(headless=headless, artifacts=ws.artifacts, resolve_cache=ws.resolve_cache,
+                              store=ws.store, traffic=traffic)
+    return await scraper.scrape_by_keyword(keyword)
+
+
+async def _run_v3(keyword, traffic, ws, headless):
+    from douyin_scraper_v3 import DouyinUserScraper
+    scraper = DouyinUserScraper(headless=headless, artifacts=ws.artifacts, resolve_cache=ws.resolve_cache,
+                                store=ws.store, traffic=traffic)
+    return await scraper.search_user_account(keyword)
+
+
+async def _run_api(keyword, traffic, ws, headless):
+    from douyin_api_client import DouyinAPIClient
+    client = DouyinAPIClient(resolve_cache=ws.resolve_cache, http_cache=ws.http_cache, store=ws.store,
+                             archive=ws.archive, traffic=traffic)
+    # 在事件循环线程中同步调用：工作目录的 SQLite 连接只能在创建它的线程中使用，
+    # 这里也没有其他协程需要并发执行
+    return client.search_user_web(keyword)
+
+
+TARGETS = {
+    'v1': _run_v1,    # DouyinScraper.scrape_user_info
+    'v2': _run_v2,    # DouyinScraperV2.scrape_by_keyword
+    'v3': _run_v3,    # DouyinUserScraper.search_user_account
+    'api': _run_api,  # DouyinAPIClient.search_user_web
+}
+
+
+async def run_once(target, keyword, traffic, headless=True, quiet=True):
+    """
+    在独立工作目录中运行一次抓取
+    :return: dict(elapsed, ok, hits, misses, users, videos)
+    """
+    traffic.reset()
+    with tempfile.TemporaryDirectory(prefix='douyin_replay_') as directory:
+        ws = _Workspace(directory)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            started = time.perf_counter()
+            result = await TARGETS[target](keyword, traffic, ws, headless)
+            elapsed = time.perf_counter() - started
+        counts = ws.counts()
+        ws.close()
+    return {
+        'elapsed': elapsed,
+        'ok': bool(result) and 'error' not in result,
+        'hits': traffic.hits,
+        'misses': len(traffic.misses),
+        **counts,
+    }
+
+
+async def benchmark(target, keyword, traffic, runs=5, headless=True, quiet=True):
+    """
+    回放多次并汇总耗时；各次写入数据库的用户 / 作品数不一致时 deterministic 为 False
+    """
+    results = []
+    for i in range(runs):
+        result = await run_once(target, keyword, traffic, headless, quiet)
+        results.append(result)
+        print(f"  #{i + 1}: {result['elapsed']:.3f}s  命中 {result['hits']}  未录制 {result['misses']}  "
+              f"用户 {result['users']}  作品 {result['videos']}{'' if result['ok'] else '  ❌'}")
+    times = [r['elapsed'] for r in results]
+    return {
+        'target': target,
+        'keyword': keyword,
+        'latency': traffic.latency,
+        'runs': results,
+        'min': min(times),
+        'median': statistics.median(times),
+        'max': max(times),
+        'deterministic': len({(r['ok'], r['users'], r['videos']) for r in results}) == 1,
+    }
+
+
+def _latency(value):
+    return value if value in (None, 'recorded') else float(value) / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='网络流量录制 / 回放')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    record = sub.add_parser('record', help='真实访问并录制')
+    record.add_argument('directory')
+    record.add_argument('--target', choices=TARGETS, required=True)
+    record.add_argument('--keyword', required=True)
+    record.add_argument('--headed', action='store_true', help='显示浏览器窗口')
+
+    bench = sub.add_parser('bench', help='回放录制并计时')
+    bench.add_argument('directory')
+    bench.add_argument('--target', choices=TARGETS, required=True)
+    bench.add_argument('--keyword', required=True)
+    bench.add_argument('--runs', type=int, default=5)
+    bench.add_argument('--latency', help="'recorded' 按录制耗时回放，或固定毫秒数；默认不等待")
+    bench.add_argument('--json', help='结果写入 JSON 文件')
+    bench.add_argument('--verbose', action='store_true', help='显示抓取器输出')
+
+    info = sub.add_parser('info', help='查看录制内容')
+    info.add_argument('directory')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        traffic = TrafficRecording(args.directory, MODE_RECORD)
+        result = asyncio.run(run_once(args.target, args.keyword, traffic, headless=not args.headed, quiet=False))
+        print(f"\n🎙️  已录制 {traffic.recorded} 个请求到 {args.directory} (共 {len(traffic)} 个), "
+              f"用时 {result['elapsed']:.1f}s, 用户 {result['users']} 作品 {result['videos']}")
+    elif args.command == 'bench':
+        traffic = TrafficRecording(args.directory, MODE_REPLAY, latency=_latency(args.latency))
+        if not len(traffic):
+            parser.error(f"{args.directory} 中没有录制")
+        print(f"⏱️  回放 {args.target} × {args.runs} ({len(traffic)} 个录制请求)")
+        report = asyncio.run(benchmark(args.target, args.keyword, traffic, args.runs, quiet=not args.verbose))
+        print(f"📊 最短 {report['min']:.3f}s  中位 {report['median']:.3f}s  最长 {report['max']:.3f}s  "
+              f"{'结果一致' if report['deterministic'] else '⚠️ 各次结果不一致'}")
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"💾 结果已保存: {args.json}")
+    else:
+        traffic = TrafficRecording(args.directory)
+        entries = traffic.entries()
+        print(f"📼 {len(entries)} 个请求, {len({e['key'] for e in entries})} 个不同请求, "
+              f"{sum(e['size'] for e in entries) / 1e6:.1f} MB")
+        for entry in entries:
+            print(f"  {entry['status']}  {entry['elapsed'] * 1000:7.1f}ms  {entry['size']:>9,}  "
+                  f"{entry['resource_type'] or '-':<10} {entry['method']} {entry['url'][:100]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+关键词 / 抖音号 -> sec_uid 解析缓存
+命中后可直接访问 /user/{sec_uid}，跳过搜索页
+
+置信度约定：
+  1.0   API 返回的 unique_id 精确匹配
+  0.9   昵称与关键词完全一致
+  0.6   搜索结果第一个用户链接（未经主页核实）
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from douyin_singleflight import normalize_key
+
+DEFAULT_DB_PATH = os.environ.get('DOUYIN_RESOLVE_DB', 'douyin_resolve.sqlite3')
+DEFAULT_TTL = 7 * 24 * 3600
+
+_SEC_UID_RE = re.compile(r'/user/([A-Za-z0-9_\-.]+)')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resolutions (
+    key TEXT PRIMARY KEY,
+    sec_uid TEXT NOT NULL,
+    unique_id TEXT,
+    nickname TEXT,
+    confidence REAL NOT NULL,
+    source TEXT,
+    resolved_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resolutions_sec_uid ON resolutions(sec_uid);
+"""
+
+
+def sec_uid_from_url(url):
+    """从用户主页链接中取出 sec_uid，如 https://www.douyin.com/user/MS4wLjABAAAA..."""
+    m = _SEC_UID_RE.search(url or '')
+    return m.group(1) if m else None
+
+
+class ResolutionCache:
+    """持久化的 sec_uid 解析缓存（SQLite）"""
+
+    def __init__(self, path=DEFAULT_DB_PATH, default_ttl=DEFAULT_TTL):
+        self.path = path
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()  # 同一实例可被多个线程共享（如 SyncSingleFlight 下的 DouyinAPIClient）
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, keyword, min_confidence=0.5):
+        """
+        查询未过期且置信度足够的解析结果
+        :return: dict(sec_uid, unique_id, nickname, confidence, source, resolved_at)，未命中返回 None
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM resolutions WHERE key = ? AND expires_at > ? AND confidence >= ?",
+                (normalize_key(keyword), time.time(), min_confidence),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def put(self, keyword, sec_uid, confidence, source, ttl=None, unique_id=None, nickname=None):
+        """
+        写入解析结果；已有未过期且置信度更高的不同结果时保留原结果
+        :return: 是否写入
+        """
+        now = time.time()
+        key = normalize_key(keyword)
+        with self._lock:
+            existing = self.conn.execute(
+                "SELECT sec_uid, confidence FROM resolutions WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if existing and existing['sec_uid'] != sec_uid and existing['confidence'] > confidence:
+                return False
+
+            self.conn.execute(
+                """INSERT OR REPLACE INTO resolutions
+                   (key, sec_uid, unique_id, nickname, confidence, source, resolved_at, expires_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (key, sec_uid, unique_id, nickname, confidence, source, now,
+                 now + (ttl if ttl is not None else self.default_ttl)),
+            )
+        return True
+
+    def invalidate(self, keyword):
+        with self._lock:
+            self.conn.execute("DELETE FROM resolutions WHERE key = ?", (normalize_key(keyword),))
+
+    def remember_user(self, user, keyword=None, source='api', rank=0):
+        """
+        记录 API 返回的用户对象
+        :param rank: 该用户在搜索结果中的位置，第一个结果才作为关键词的低置信度解析
+        """
+        sec_uid = user.get('sec_uid')
+        if not sec_uid:
+            return
+        unique_id = user.get('unique_id') or None
+        nickname = user.get('nickname') or None
+
+        if unique_id:
+            self.put(unique_id, sec_uid, 1.0, source, unique_id=unique_id, nickname=nickname)
+        if keyword:
+            key = normalize_key(keyword)
+            if unique_id and normalize_key(unique_id) == key:
+                confidence = 1.0
+            elif nickname and normalize_key(nickname) == key:
+                confidence = 0.9
+            elif rank == 0:
+                confidence = 0.6
+            else:
+                return
+            self.put(keyword, sec_uid, confidence, source, unique_id=unique_id, nickname=nickname)
+
+
+_shared_cache = None
+
+
+def shared_resolution_cache():
+    """进程内共享的默认解析缓存实例"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ResolutionCache()
+    return _shared_cache
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+增量刷新调度器
+根据每个关注账号的最后观测时间和近期变化速度决定是否需要重新抓取，
+按紧迫程度排序后在全局请求预算内加入 douyin_jobs 任务队列
+
+刷新间隔：变化越快间隔越短
+  期望间隔 = 目标漂移比例 / 每日相对变化率，限制在 [min_interval, max_interval] 内
+  紧迫度   = 距上次观测的时间 / 期望间隔，>= 1 即到期；从未抓取过的账号最优先
+
+全局预算：滚动窗口内（默认 1 小时）队列中新建的所有任务数不超过上限，
+手动加入的任务同样占用预算
+
+用法：
+  python3 douyin_scheduler.py track MS4wLjABAAAA... [--min-interval 3600]
+  python3 douyin_scheduler.py plan
+  python3 douyin_scheduler.py --budget 60 run
+  python3 douyin_scheduler.py loop --every 600
+"""
+
+import argparse
+import math
+import time
+from bisect import bisect_right
+
+from douyin_jobs import DEFAULT_DB_PATH as DEFAULT_JOBS_DB, JobQueue
+from douyin_store import DEFAULT_DB_PATH as DEFAULT_STORE_DB, ProfileStore
+from douyin_timeseries import DAY, decode_series
+
+HOUR = 3600
+MAX_PRIORITY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracked_accounts (
+    sec_uid TEXT PRIMARY KEY,
+    min_interval REAL,
+    max_interval REAL,
+    added_at REAL NOT NULL
+);
+"""
+
+
+class RefreshScheduler:
+    """按过期程度和变化速度排期的刷新调度器"""
+
+    def __init__(self, store=None, queue=None, budget=60, budget_window=HOUR,
+                 min_interval=2 * HOUR, max_interval=7 * DAY, target_drift=0.002,
+                 rate_window=7 * DAY, metrics=('follower_count', 'total_favorited')):
+        """
+        :param budget: 每个预算窗口内最多新建的任务数（全局，含非调度器加入的任务）
+        :param target_drift: 期望两次抓取之间计数的相对变化不超过该比例
+        :param rate_window: 估算变化速度时回看的时长
+        """
+        self.store = store or ProfileStore(DEFAULT_STORE_DB)
+        self.queue = queue or JobQueue(DEFAULT_JOBS_DB)
+        self.budget = budget
+        self.budget_window = budget_window
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_drift = target_drift
+        self.rate_window = rate_window
+        self.metrics = metrics
+        self.store.conn.executescript(SCHEMA)
+
+    def track(self, sec_uid, min_interval=None, max_interval=None):
+        self.store.conn.execute(
+            """INSERT INTO tracked_accounts (sec_uid, min_interval, max_interval, added_at)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(sec_uid) DO UPDATE SET
+                   min_interval = excluded.min_interval, max_interval = excluded.max_interval""",
+            (sec_uid, min_interval, max_interval, time.time()),
+        )
+
+    def untrack(self, sec_uid):
+        self.store.conn.execute("DELETE FROM tracked_accounts WHERE sec_uid = ?", (sec_uid,))
+
+    def _change_rate(self, sec_uid, now):
+        """
+        近期每日相对变化率（各指标之和）和最后观测时间
+        :return: (变化率, 最后观测时间或 None)
+        """
+        rows = self.store.conn.execute(
+            "SELECT metric, last_seen, times, deltas FROM series "
+            f"WHERE kind = 'user' AND entity_id = ? AND metric IN ({','.join('?' * len(self.metrics))})",
+            (sec_uid, *self.metrics),
+        ).fetchall()
+        rate, last_seen = 0.0, None
+        for row in rows:
+            last_seen = max(last_seen or 0, row['last_seen'])
+            ts, vs = decode_series(row['times'], row['deltas'])
+            # 回看窗口起点之前的最后一个点作为基准
+            begin = max(bisect_right(ts, now - self.rate_window) - 1, 0)
+            span = row['last_seen'] - ts[begin]
+            if span <= 0:
+                continue
+            change = abs(vs[-1] - vs[begin]) / max(abs(vs[begin]), 1)
+            rate += change / (span / DAY)
+        return rate, last_seen
+
+    def _interval(self, rate, account):
+        lower = account['min_interval'] or self.min_interval
+        upper = account['max_interval'] or self.max_interval
+        if rate <= 0:
+            return upper
+        return min(upper, max(lower, self.target_drift / rate * DAY))
+
+    def plan(self, now=None):
+        """
+        计算所有关注账号的紧迫度
+        :return: [dict(sec_uid, staleness, interval, age, rate, priority), ...]，按紧迫度降序
+        """
+        now = now or time.time()
+        accounts = self.store.conn.execute(
+            """SELECT t.sec_uid, t.min_interval, t.max_interval, u.updated_at
+               FROM tracked_accounts t LEFT JOIN users u ON u.sec_uid = t.sec_uid"""
+        ).fetchall()
+
+        plan = []
+        for account in accounts:
+            rate, last_seen = self._change_rate(account['sec_uid'], now)
+            last_seen = last_seen or account['updated_at']
+            interval = self._interval(rate, account)
+            if last_seen is None:
+                age, staleness = None, math.inf
+            else:
+                age = now - last_seen
+                staleness = age / interval
+            plan.append({
+                'sec_uid': account['sec_uid'],
+                'staleness': staleness,
+                'interval': interval,
+                'age': age,
+                'rate': rate,
+                'priority': MAX_PRIORITY if math.isinf(staleness) else min(MAX_PRIORITY, int(staleness * 100)),
+            })
+        plan.sort(key=lambda item: item['staleness'], reverse=True)
+        return plan
+
+    def remaining_budget(self, now=None):
+        """预算窗口内还能新建的任务数"""
+        now = now or time.time()
+        used = self.queue.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE created_at >= ?", (now - self.budget_window,)
+        ).fetchone()[0]
+        return max(0, self.budget - used)
+
+    def run(self, kind='profile', now=None):
+        """
+        把到期账号按紧迫度加入任务队列，直到用完预算
+        :return: (新加入数, 到期数, 预算剩余)
+        """
+        now = now or time.time()
+        due = [item for item in self.plan(now) if item['staleness'] >= 1]
+        remaining = self.remaining_budget(now)
+        created = 0
+        for item in due:
+            if remaining <= 0:
+                break
+            _, new = self.queue.enqueue(kind, {'sec_uid': item['sec_uid']}, priority=item['priority'])
+            if new:
+                created += 1
+                remaining -= 1
+        return created, len(due), remaining
+
+
+def _format_duration(seconds):
+    if seconds is None:
+        return '从未'
+    if seconds >= DAY:
+        return f"{seconds / DAY:.1f}天"
+    return f"{seconds / HOUR:.1f}小时"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='抖音增量刷新调度器')
+    parser.add_argument('--store-db', default=DEFAULT_STORE_DB)
+    parser.add_argument('--jobs-db', default=DEFAULT_JOBS_DB)
+    parser.add_argument('--budget', type=int, default=60, help='每小时最多新建的任务数')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    track = sub.add_parser('track', help='关注账号')
+    track.add_argument('sec_uid', nargs='+')
+    track.add_argument('--min-interval', type=float, help='最短刷新间隔（秒）')
+    track.add_argument('--max-interval', type=float, help='最长刷新间隔（秒）')
+
+    untrack = sub.add_parser('untrack', help='取消关注')
+    untrack.add_argument('sec_uid', nargs='+')
+
+    sub.add_parser('plan', help='查看排期（不加入任务）')
+
+    run = sub.add_parser('run', help='加入到期任务')
+    run.add_argument('--kind', default='profile', choices=['profile', 'videos'])
+
+    loop = sub.add_parser('loop', help='定时执行 run')
+    loop.add_argument('--kind', default='profile', choices=['profile', 'videos'])
+    loop.add_argument('--every', type=float, default=600, help='间隔秒数')
+
+    args = parser.parse_args()
+    scheduler = RefreshScheduler(ProfileStore(args.store_db), JobQueue(args.jobs_db), budget=args.budget)
+
+    if args.command == 'track':
+        for sec_uid in args.sec_uid:
+            scheduler.track(sec_uid, args.min_interval, args.max_interval)
+        print(f"✅ 已关注 {len(args.sec_uid)} 个账号")
+    elif args.command == 'untrack':
+        for sec_uid in args.sec_uid:
+            scheduler.untrack(sec_uid)
+        print(f"✅ 已取消 {len(args.sec_uid)} 个账号")
+    elif args.command == 'plan':
+        plan = scheduler.plan()
+        print(f"📋 {len(plan)} 个关注账号，预算剩余 {scheduler.remaining_budget()}")
+        for item in plan:
+            mark = '🔴' if item['staleness'] >= 1 else '🟢'
+            print(f"  {mark} {item['sec_uid'][:24]}  紧迫度 {item['staleness']:.2f}  "
+                  f"上次 {_format_duration(item['age'])}前  间隔 {_format_duration(item['interval'])}  "
+                  f"日变化 {item['rate'] * 100:.3f}%")
+    else:
+        while True:
+            created, due, remaining = scheduler.run(args.kind)
+            print(f"⏱️  {time.strftime('%H:%M:%S')} 到期 {due} 个，加入 {created} 个任务，预算剩余 {remaining}")
+            if args.command == 'run':
+                break
+            time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
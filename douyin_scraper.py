@@ -6,15 +6,29 @@
 
 import asyncio
 import json
-import re
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
 from datetime import datetime
+from douyin_artifacts import ArtifactWriter
+from douyin_extract import extract_window_subtrees
+from douyin_config import DOUYIN_BASE_URL
+from douyin_resolve_cache import sec_uid_from_url
+from douyin_store import collect_entities, shared_store
 
 
 class DouyinScraper:
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, artifacts=None, store=None, traffic=None, base_url=None):
         self.headless = headless
-        self.base_url = "https://www.douyin.com"
+        self.base_url = (base_url or DOUYIN_BASE_URL).rstrip('/')
+        self.artifacts = artifacts or ArtifactWriter()
+        self._store = store  # 用户 / 作品数据库
+        self.traffic = traffic  # 可选 douyin_replay.TrafficRecording
+
+    @property
+    def store(self):
+        """用户 / 作品数据库，首次使用时打开（默认为进程内共享实例）"""
+        if self._store is None:
+            self._store = shared_store()
+        return self._store
         
     async def scrape_user_info(self, username):
         """
@@ -38,6 +52,8 @@ class DouyinScraper:
                 user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                 viewport={'width': 1920, 'height': 1080}
             )
+            if self.traffic is not None:  # 录制 / 回放（douyin_replay）
+                await self.traffic.attach(context)
             
             page = await context.new_page()
             
@@ -53,10 +69,6 @@ class DouyinScraper:
                 # 等待页面加载
                 await asyncio.sleep(5)
                 
-                # 截图调试
-                await page.screenshot(path="/tmp/douyin_search.png")
-                print("📸 搜索页面已截图到 /tmp/douyin_search.png")
-                
                 # 尝试找到用户链接
                 print("📄 正在查找用户主页...")
                 
@@ -93,6 +105,13 @@ class DouyinScraper:
                     import traceback
                     traceback.print_exc()
                 
+                # 截图调试（按产物策略）
+                search_screenshot = await self.artifacts.screenshot(
+                    page, "douyin_search", failed=not user_page_url
+                )
+                if search_screenshot:
+                    print(f"📸 搜索页面已截图到 {search_screenshot}")
+                
                 if not user_page_url:
                     print("❌ 未找到用户页面，请检查搜索结果")
                     return None
@@ -104,22 +123,27 @@ class DouyinScraper:
                 await page.goto(user_page_url, wait_until='domcontentloaded', timeout=30000)
                 await asyncio.sleep(5)
                 
-                # 截图用户主页
-                await page.screenshot(path="/tmp/douyin_user_page.png", full_page=True)
-                print("📸 用户主页已截图到 /tmp/douyin_user_page.png")
-                
-                # 获取页面内容（尝试从页面数据中提取）
-                page_content = await page.content()
-                
                 # 尝试从页面数据中提取
                 user_data = await self._extract_data_from_page(page)
                 
+                # 截图用户主页（按产物策略，未提取到结构化数据时视为失败）
+                failed = not user_data or 'subtrees' not in user_data
+                user_screenshot = await self.artifacts.screenshot(page, "douyin_user_page", failed=failed)
+                if user_screenshot:
+                    print(f"📸 用户主页已截图到 {user_screenshot}")
+                
                 if user_data:
+                    if 'subtrees' in user_data:
+                        n_users, n_videos = await asyncio.to_thread(
+                            self.store.ingest, user_data['subtrees'], source='scraper_v1',
+                            owner_sec_uid=sec_uid_from_url(user_page_url),
+                        )
+                        print(f"💾 已写入数据库: {n_users} 个用户, {n_videos} 个作品")
                     return user_data
                 else:
                     return {
                         "error": "无法自动提取数据",
-                        "screenshots": ["/tmp/douyin_search.png", "/tmp/douyin_user_page.png"],
+                        "screenshots": [path for path in (search_screenshot, user_screenshot) if path],
                         "url": user_page_url,
                         "note": "请查看截图或手动检查页面"
                     }
@@ -131,6 +155,7 @@ class DouyinScraper:
                 return None
                 
             finally:
+                await self.artifacts.flush()
                 await browser.close()
     
     async def _extract_data_from_page(self, page):
@@ -156,36 +181,16 @@ class DouyinScraper:
             if script_contents and len(script_contents) > 0:
                 print(f"✅ 找到 {len(script_contents)} 个数据脚本")
                 
-                # 解析 JSON 数据
-                for idx, script in enumerate(script_contents):
-                    # 尝试多种模式匹配
-                    patterns = [
-                        r'window\.__RENDER_DATA__\s*=\s*({.*?});',
-                        r'window\._SSR_HYDRATED_DATA\s*=\s*({.*?});',
-                        r'SSR_HYDRATED_DATA"\s*:\s*({.*?})',
-                        r'__RENDER_DATA__\s*=\s*({.*?});'
-                    ]
+                # 只取出用户 / 作品列表子树，不解析整棵渲染数据树
+                marker, subtrees = extract_window_subtrees(script_contents)
+                if subtrees:
+                    print(f"✅ 成功提取数据 ({marker}): {', '.join(subtrees)}")
+                    data["subtrees"] = subtrees
+                    
+                    # 尝试解析具体数据
+                    await self._parse_user_data(subtrees, data, sec_uid_from_url(page.url))
                     
-                    for pattern in patterns:
-                        match = re.search(pattern, script, re.DOTALL)
-                        if match:
-                            try:
-                                json_str = match.group(1)
-                                # 清理JSON字符串
-                                json_str = json_str.replace('undefined', 'null')
-                                parsed_data = json.loads(json_str)
-                                
-                                print(f"✅ 成功提取数据 (模式 {pattern[:30]}...)!")
-                                data["raw_data"] = parsed_data
-                                
-                                # 尝试解析具体数据
-                                await self._parse_user_data(parsed_data, data)
-                                
-                                return data
-                                
-                            except (json.JSONDecodeError, Exception) as e:
-                                print(f"⚠️  JSON 解析失败: {e}")
-                                continue
+                    return data
             
             # 方法2: 使用页面选择器提取可见数据
             print("🔍 尝试从可见元素提取数据...")
@@ -228,24 +233,19 @@ class DouyinScraper:
             data["error"] = str(e)
             return data
     
-    async def _parse_user_data(self, raw_data, data):
+    async def _parse_user_data(self, subtrees, data, sec_uid=None):
         """
-        解析用户数据
-        注意：抖音的数据结构可能会经常变化，需要根据实际情况调整
+        从用户 / 作品子树整理出 user_info 和 recent_videos
+        注意：抖音的数据结构可能会经常变化，需要根据实际情况调整 SUBTREE_KEYS
         """
         try:
-            # 这里需要根据实际的数据结构来解析
-            # 打印数据结构以便调试
             print("🔍 解析用户数据...")
-            
-            # 保存完整的数据结构供分析
-            data_structure = json.dumps(raw_data, indent=2, ensure_ascii=False)
-            
-            # 保存到文件供分析
-            structure_file = f"/tmp/douyin_data_structure_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(structure_file, 'w', encoding='utf-8') as f:
-                f.write(data_structure[:100000])  # 限制大小
-            print(f"💾 数据结构已保存到: {structure_file}")
+            users, videos = collect_entities(subtrees, owner_sec_uid=sec_uid)
+            owner = [u for u in users if u['sec_uid'] == sec_uid]
+            if owner or users:
+                data["user_info"] = (owner or users)[0]
+            data["recent_videos"] = videos
+            print(f"✅ 解析到 {len(users)} 个用户, {len(videos)} 个作品")
             
         except Exception as e:
             print(f"⚠️  解析失败: {e}")
@@ -277,15 +277,14 @@ async def main():
     print("=" * 60)
     
     if result:
-        print(json.dumps(result, indent=2, ensure_ascii=False)[:2000])
-        if len(json.dumps(result)) > 2000:
+        # 原始子树已写入数据库，这里只打印整理后的字段
+        output = json.dumps({k: v for k, v in result.items() if k != 'subtrees'}, indent=2, ensure_ascii=False)
+        print(output[:2000])
+        if len(output) > 2000:
             print("\n... (结果过长，已截断)")
         
-        # 保存结果到文件
-        output_file = f"/tmp/douyin_{username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
-        print(f"\n💾 完整结果已保存到: {output_file}")
+        # 用户和作品数据已在抓取时写入数据库
+        print(f"\n💾 数据库: {scraper.store.path} (python3 douyin_store.py user {username})")
     else:
         print("❌ 抓取失败")
 
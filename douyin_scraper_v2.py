@@ -6,15 +6,71 @@
 
 import asyncio
 import json
-import re
 from playwright.async_api import async_playwright
 from datetime import datetime
+from douyin_artifacts import ArtifactWriter
+from douyin_extract import extract_page_fields
+from douyin_config import DOUYIN_BASE_URL
+from douyin_resolve_cache import sec_uid_from_url, shared_resolution_cache
+from douyin_singleflight import SingleFlight
+from douyin_store import shared_store
 
 
 class DouyinScraperV2:
-    def __init__(self, headless=False):
+    # 进程内共享：并发抓取同一用户主页时只访问一次
+    _direct_flights = SingleFlight()
+    
+    def __init__(self, headless=False, artifacts=None, resolve_cache=None, store=None, traffic=None,
+                 base_url=None):
         self.headless = headless
-        self.base_url = "https://www.douyin.com"
+        self.base_url = (base_url or DOUYIN_BASE_URL).rstrip('/')
+        self.artifacts = artifacts or ArtifactWriter()
+        self._resolve_cache = resolve_cache  # 关键词 -> sec_uid
+        self._store = store  # 用户 / 作品数据库
+        self.traffic = traffic  # 可选 douyin_replay.TrafficRecording
+
+    @property
+    def resolve_cache(self):
+        """sec_uid 解析缓存，首次使用时打开（默认为进程内共享实例）"""
+        if self._resolve_cache is None:
+            self._resolve_cache = shared_resolution_cache()
+        return self._resolve_cache
+
+    @property
+    def store(self):
+        """用户 / 作品数据库，首次使用时打开（默认为进程内共享实例）"""
+        if self._store is None:
+            self._store = shared_store()
+        return self._store
+    
+    async def scrape_by_keyword(self, keyword):
+        """
+        按关键词抓取用户主页
+        解析缓存命中时直接访问 /user/{sec_uid}，否则先搜索再访问，并把结果写入缓存
+        """
+        cached = self.resolve_cache.get(keyword)
+        if cached:
+            print(f"⚡ 解析缓存命中 (置信度 {cached['confidence']}): {cached['sec_uid']}")
+            data = await self.scrape_by_direct_url(None, sec_user_id=cached['sec_uid'])
+            if data and 'parsed_data' in data:
+                return data
+            # 缓存的 sec_uid 已失效，删除后退回搜索
+            self.resolve_cache.invalidate(keyword)
+        
+        search_result = await self.search_and_extract(keyword)
+        sec_uid = None
+        for link in (search_result or {}).get('found_links', []):
+            sec_uid = sec_uid_from_url(link['href'])
+            if sec_uid:
+                break
+        if not sec_uid:
+            print(f"❌ 未能解析用户: {keyword}")
+            return None
+        
+        data = await self.scrape_by_direct_url(None, sec_user_id=sec_uid)
+        if data and 'parsed_data' in data:
+            self.resolve_cache.put(keyword, sec_uid, 0.6, 'search_page')
+        return data
         
     async def scrape_by_direct_url(self, user_id, sec_user_id=None):
         """
@@ -22,6 +78,14 @@ class DouyinScraperV2:
         user_id: 数字ID
         sec_user_id: 加密的用户ID（可选）
         """
+        return await self._direct_flights.do(
+            (self.base_url, 'user', sec_user_id or str(user_id)), self._scrape_by_direct_url, user_id, sec_user_id
+        )
+    
+    async def _scrape_by_direct_url(self, user_id, sec_user_id):
+        """
+        通过直接URL访问用户主页（实际执行）
+        """
         async with async_playwright() as p:
             browser = await p.chromium.launch(
                 headless=self.headless,
@@ -34,6 +98,8 @@ class DouyinScraperV2:
                 user_agent='Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1',
                 viewport={'width': 390, 'height': 844}  # iPhone 尺寸
             )
+            if self.traffic is not None:  # 录制 / 回放（douyin_replay）
+                await self.traffic.attach(context)
             
             page = await context.new_page()
             
@@ -49,16 +115,23 @@ class DouyinScraperV2:
                 await page.goto(user_url, wait_until='networkidle', timeout=30000)
                 await asyncio.sleep(3)
                 
-                # 截图
-                screenshot_path = f"/tmp/douyin_direct_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                await page.screenshot(path=screenshot_path, full_page=True)
-                print(f"📸 截图已保存: {screenshot_path}")
-                
                 # 提取数据
                 data = await self._extract_all_data(page)
                 data['url'] = user_url
+                
+                # 截图（按产物策略，未解析出渲染数据时视为失败）
+                failed = 'error' in data or 'parsed_data' not in data
+                screenshot_path = await self.artifacts.screenshot(page, "douyin_direct", failed=failed)
+                if screenshot_path:
+                    print(f"📸 截图已保存: {screenshot_path}")
                 data['screenshot'] = screenshot_path
                 
+                if 'parsed_data' in data:
+                    n_users, n_videos = await asyncio.to_thread(
+                        self.store.ingest, data['parsed_data'], source='scraper_v2', owner_sec_uid=sec_user_id,
+                    )
+                    print(f"💾 已写入数据库: {n_users} 个用户, {n_videos} 个作品")
+                
                 return data
                 
             except Exception as e:
@@ -67,6 +140,7 @@ class DouyinScraperV2:
                 traceback.print_exc()
                 return None
             finally:
+                await self.artifacts.flush()
                 await browser.close()
     
     async def search_and_extract(self, keyword):
@@ -83,6 +157,8 @@ class DouyinScraperV2:
                 user_agent='Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1',
                 viewport={'width': 390, 'height': 844}
             )
+            if self.traffic is not None:  # 录制 / 回放（douyin_replay）
+                await self.traffic.attach(context)
             
             page = await context.new_page()
             
@@ -94,10 +170,6 @@ class DouyinScraperV2:
                 await page.goto(search_url, wait_until='domcontentloaded', timeout=30000)
                 await asyncio.sleep(5)
                 
-                # 截图
-                await page.screenshot(path="/tmp/douyin_search_v2.png", full_page=True)
-                print("📸 搜索结果已截图")
-                
                 # 尝试找到用户链接
                 user_links = await page.evaluate('''() => {
                     const links = [];
@@ -119,11 +191,18 @@ class DouyinScraperV2:
                 for i, link in enumerate(user_links[:10]):
                     print(f"  [{i+1}] {link['text']} -> {link['href']}")
                 
+                # 截图（按产物策略）
+                screenshot_path = await self.artifacts.screenshot(
+                    page, "douyin_search_v2", failed=not user_links
+                )
+                if screenshot_path:
+                    print(f"📸 搜索结果已截图: {screenshot_path}")
+                
                 # 保存结果
                 result = {
                     "search_keyword": keyword,
                     "found_links": user_links,
-                    "screenshot": "/tmp/douyin_search_v2.png",
+                    "screenshot": screenshot_path,
                     "timestamp": datetime.now().isoformat()
                 }
                 
@@ -135,6 +214,7 @@ class DouyinScraperV2:
                 traceback.print_exc()
                 return None
             finally:
+                await self.artifacts.flush()
                 await browser.close()
     
     async def _extract_all_data(self, page):
@@ -149,44 +229,16 @@ class DouyinScraperV2:
         }
         
         try:
-            # 1. 尝试从 script 标签提取渲染数据
+            # 1. 从页面源码提取渲染数据中的用户 / 作品子树（RENDER_DATA 脚本或 window 赋值）
             print("🔍 提取渲染数据...")
-            render_data = await page.evaluate('''() => {
-                // 查找包含数据的 script 标签
-                const scripts = Array.from(document.querySelectorAll('script'));
-                const dataScripts = scripts.filter(s => 
-                    s.textContent.includes('__RENDER_DATA__') ||
-                    s.textContent.includes('SSR_HYDRATED_DATA')
-                );
-                
-                if (dataScripts.length > 0) {
-                    return dataScripts[0].textContent.substring(0, 50000);
-                }
-                return null;
-            }''')
+            page_content = await page.content()
+            # 渲染数据子树 + 一次扫描提取粉丝/关注/获赞/作品（值已归一化为整数，只保留前5个匹配）
+            fields = extract_page_fields(page_content, stats_limit=5)
             
-            if render_data:
-                # 保存原始数据
-                data['raw_script'] = render_data
-                
-                # 尝试解析JSON
-                patterns = [
-                    r'__RENDER_DATA__\s*=\s*({.*?});\s*<\/script>',
-                    r'_SSR_HYDRATED_DATA\s*=\s*({.*?});',
-                    r'"data":\s*({.*?})\s*,"env"',
-                ]
-                
-                for pattern in patterns:
-                    match = re.search(pattern, render_data, re.DOTALL)
-                    if match:
-                        try:
-                            json_str = match.group(1)
-                            json_data = json.loads(json_str)
-                            data['parsed_data'] = json_data
-                            print("✅ 成功解析JSON数据!")
-                            break
-                        except:
-                            continue
+            json_data = fields.get('render_data') or fields.get('ssr_data')
+            if json_data:
+                data['parsed_data'] = json_data
+                print("✅ 成功解析JSON数据!")
             
             # 2. 从页面元素提取可见数据
             print("🔍 提取可见数据...")
@@ -210,7 +262,7 @@ class DouyinScraperV2:
                     'likes': '.like-count, [class*="like"]',
                 };
                 
-                for (key, selector) of Object.entries(selectors)) {
+                for (const [key, selector] of Object.entries(selectors)) {
                     const elements = document.querySelectorAll(selector);
                     if (elements.length > 0) {
                         result[key] = Array.from(elements).map(el => el.textContent.trim());
@@ -227,23 +279,8 @@ class DouyinScraperV2:
             
             # 3. 使用正则表达式从页面源码中提取数字
             print("🔍 使用正则提取数据...")
-            page_content = await page.content()
-            
-            # 查找可能的数据模式
-            patterns = {
-                'followers': r'粉丝[：:\s]*(\d+(?:\.\d+)?[万千万亿]?)',
-                'following': r'关注[：:\s]*(\d+(?:\.\d+)?[万千万亿]?)',
-                'likes': r'获赞[：:\s]*(\d+(?:\.\d+)?[万千万亿]?)',
-                'works': r'作品[：:\s]*(\d+(?:\.\d+)?[万千万亿]?)',
-            }
-            
-            extracted_stats = {}
-            for key, pattern in patterns.items():
-                matches = re.findall(pattern, page_content)
-                if matches:
-                    extracted_stats[key] = matches[:5]  # 只保留前5个匹配
             
-            data['regex_extracted'] = extracted_stats
+            data['regex_extracted'] = fields['stats']
             
             return data
             
@@ -290,7 +327,7 @@ async def main():
     print("✅ 抓取完成!")
     print("=" * 70)
     print("\n📁 生成的文件:")
-    print("  - /tmp/douyin_search_v2.png (搜索结果截图)")
+    print(f"  - {scraper.artifacts.policy.directory}/douyin_search_v2_*.png (搜索结果截图，按产物策略保存)")
     print("  - /tmp/douyin_search_result_*.json (搜索结果数据)")
     print("\n💡 建议:")
     print("  1. 查看截图找到正确的用户链接")
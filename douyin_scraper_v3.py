@@ -6,19 +6,61 @@
 
 import asyncio
 import json
-import re
 from playwright.async_api import async_playwright
 from datetime import datetime
+from douyin_artifacts import ArtifactWriter
+from douyin_config import DOUYIN_BASE_URL
+from douyin_resolve_cache import sec_uid_from_url, shared_resolution_cache
+from douyin_singleflight import SingleFlight, normalize_key
+from douyin_store import collect_entities, shared_store, stats_to_user
+from douyin_extract import PROFILE_STATS_JS, evaluate_sized, extract_page_fields, parse_profile_stats
 
 
 class DouyinUserScraper:
-    def __init__(self, headless=False):
+    # 进程内共享：并发搜索同一账号时只启动一次浏览器
+    _search_flights = SingleFlight()
+    
+    def __init__(self, headless=False, artifacts=None, race_search=False, resolve_cache=None, store=None,
+                 traffic=None, base_url=None):
         self.headless = headless
-        self.base_url = "https://www.douyin.com"
+        self.base_url = (base_url or DOUYIN_BASE_URL).rstrip('/')
+        self.artifacts = artifacts or ArtifactWriter()
+        self.max_scan_nodes = 5000  # 页内文本节点遍历上限
+        self.race_search = race_search  # 并行竞速所有候选搜索URL
+        self._resolve_cache = resolve_cache  # 关键词 -> sec_uid
+        self._store = store  # 用户 / 作品数据库
+        self.traffic = traffic  # 可选 douyin_replay.TrafficRecording
+
+    @property
+    def resolve_cache(self):
+        """sec_uid 解析缓存，首次使用时打开（默认为进程内共享实例）"""
+        if self._resolve_cache is None:
+            self._resolve_cache = shared_resolution_cache()
+        return self._resolve_cache
+
+    @property
+    def store(self):
+        """用户 / 作品数据库，首次使用时打开（默认为进程内共享实例）"""
+        if self._store is None:
+            self._store = shared_store()
+        return self._store
         
-    async def search_user_account(self, username):
+    async def search_user_account(self, username, race=None):
         """
         搜索用户账号
+        :param race: 是否并行竞速候选搜索URL，默认使用 self.race_search
+        """
+        if race is None:
+            race = self.race_search
+        
+        # 同一关键词的并发调用合并为一次搜索，共享结果
+        return await self._search_flights.do(
+            (self.base_url, normalize_key(username)), self._search_user_account, username, race
+        )
+    
+    async def _search_user_account(self, username, race):
+        """
+        搜索用户账号（实际执行）
         """
         async with async_playwright() as p:
             browser = await p.chromium.launch(
@@ -31,6 +73,8 @@ class DouyinUserScraper:
                 user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                 viewport={'width': 1920, 'height': 1080}
             )
+            if self.traffic is not None:  # 录制 / 回放（douyin_replay）
+                await self.traffic.attach(context)
             
             page = await context.new_page()
             
@@ -41,64 +85,54 @@ class DouyinUserScraper:
                 search_urls = [
                     f"{self.base_url}/search/{username}?type=user",
                     f"{self.base_url}/search/{username}",
-                    f"https://www.douyin.com/search/user?keyword={username}",
+                    f"{self.base_url}/search/user?keyword={username}",
                 ]
                 
-                user_page_url = None
-                
-                for search_url in search_urls:
+                # 命中解析缓存时直接访问用户主页，跳过搜索页
+                cached = self.resolve_cache.get(username)
+                if cached:
+                    user_page_url = f"{self.base_url}/user/{cached['sec_uid']}"
+                    print(f"⚡ 解析缓存命中 (置信度 {cached['confidence']}): {cached['sec_uid']}")
                     try:
-                        print(f"📋 尝试搜索URL: {search_url}")
-                        await page.goto(search_url, wait_until='domcontentloaded', timeout=20000)
-                        await asyncio.sleep(5)
-                        
-                        # 截图
-                        screenshot_num = search_urls.index(search_url) + 1
-                        await page.screenshot(path=f"/tmp/douyin_search_{screenshot_num}.png", full_page=True)
-                        
-                        # 尝试找到用户卡片
-                        user_found = await self._find_user_in_results(page, username)
-                        if user_found:
-                            user_page_url = user_found
-                            print(f"✅ 找到用户主页: {user_page_url}")
-                            break
-                    except Exception as e:
-                        print(f"⚠️  搜索失败: {e}")
-                        continue
+                        user_data, failed = await self._visit_user_page(page, user_page_url)
+                    except Exception as e:  # 如导航超时
+                        print(f"⚠️  访问缓存的用户主页失败: {e}")
+                        user_data, failed = {}, True
+                    self._update_resolve_cache(username, user_page_url, user_data, cached, failed)
+                    if not failed:
+                        await asyncio.to_thread(self._save_to_store, user_page_url, user_data)
+                        return user_data
+                    # 缓存的结果已失效（已从缓存删除），改走搜索
+                    print("⚠️  缓存的用户主页提取失败，改为搜索")
                 
-                if not user_page_url:
+                user_page_url = await self._find_user_page(context, page, search_urls, username, race)
+                
+                if user_page_url:
+                    print(f"✅ 找到用户主页: {user_page_url}")
+                else:
                     print("❌ 未找到用户主页，保存当前页面供分析")
-                    await page.screenshot(path="/tmp/douyin_final_page.png", full_page=True)
+                    final_screenshot = await self.artifacts.screenshot(page, "douyin_final_page", failed=True)
                     
                     # 保存页面HTML
-                    content = await page.content()
-                    html_file = f"/tmp/douyin_page_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-                    with open(html_file, 'w', encoding='utf-8') as f:
-                        f.write(content)
-                    print(f"💾 页面HTML已保存: {html_file}")
+                    html_file = await self.artifacts.html(page, "douyin_page", failed=True)
+                    if html_file:
+                        print(f"💾 页面HTML已保存: {html_file}")
                     
                     return {
                         "status": "not_found",
                         "searched_username": username,
-                        "screenshot": "/tmp/douyin_final_page.png",
+                        "screenshot": final_screenshot,
                         "html_file": html_file,
                         "note": "未找到用户账号，请手动检查截图或HTML文件"
                     }
                 
-                # 访问用户主页
-                print(f"🚶 访问用户主页: {user_page_url}")
-                await page.goto(user_page_url, wait_until='domcontentloaded', timeout=30000)
-                await asyncio.sleep(5)
+                user_data, failed = await self._visit_user_page(page, user_page_url)
                 
-                # 截图用户主页
-                user_screenshot = f"/tmp/douyin_user_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                await page.screenshot(path=user_screenshot, full_page=True)
-                print(f"📸 用户主页截图: {user_screenshot}")
+                # 更新解析缓存：搜索得到的结果按昵称核实后写入
+                self._update_resolve_cache(username, user_page_url, user_data, None, failed)
                 
-                # 提取数据
-                user_data = await self._extract_user_data(page)
-                user_data['user_page_url'] = user_page_url
-                user_data['screenshot'] = user_screenshot
+                if not failed:
+                    await asyncio.to_thread(self._save_to_store, user_page_url, user_data)
                 
                 return user_data
                 
@@ -108,15 +142,142 @@ class DouyinUserScraper:
                 traceback.print_exc()
                 return None
             finally:
+                await self.artifacts.flush()
                 await browser.close()
     
-    async def _find_user_in_results(self, page, username):
+    async def _find_user_page(self, context, page, search_urls, username, race):
+        """依次（或并行竞速）尝试候选搜索URL，返回用户主页URL，找不到时返回 None"""
+        if race:
+            return await self._race_search_urls(context, page, search_urls, username)
+        for index, search_url in enumerate(search_urls, start=1):
+            user_page_url = await self._try_search_url(page, search_url, username, index)
+            if user_page_url:
+                return user_page_url
+        return None
+    
+    async def _visit_user_page(self, page, user_page_url):
+        """
+        访问用户主页并提取数据
+        :return: (user_data, failed)，未找到渲染数据时 failed 为 True
+        """
+        print(f"🚶 访问用户主页: {user_page_url}")
+        await page.goto(user_page_url, wait_until='domcontentloaded', timeout=30000)
+        await asyncio.sleep(5)
+        
+        # 提取数据
+        user_data = await self._extract_user_data(page)
+        user_data['user_page_url'] = user_page_url
+        
+        # 截图用户主页（按产物策略，未找到渲染数据时视为失败）
+        failed = 'error' in user_data or not (user_data.get('render_data') or user_data.get('ssr_data'))
+        user_screenshot = await self.artifacts.screenshot(page, "douyin_user", failed=failed)
+        if user_screenshot:
+            print(f"📸 用户主页截图: {user_screenshot}")
+        user_data['screenshot'] = user_screenshot
+        return user_data, failed
+    
+    def _update_resolve_cache(self, username, user_page_url, user_data, cached, failed):
+        """根据主页抓取结果更新关键词 -> sec_uid 缓存"""
+        sec_uid = sec_uid_from_url(user_page_url)
+        if not sec_uid:
+            return
+        if failed:
+            if cached:
+                self.resolve_cache.invalidate(username)
+            return
+        
+        nickname = user_data.get('visible_stats', {}).get('nickname') or None
+        confidence = 0.9 if nickname and normalize_key(nickname) == normalize_key(username) else 0.6
+        if not cached or confidence > cached['confidence']:
+            self.resolve_cache.put(username, sec_uid, confidence, 'search_page', nickname=nickname)
+    
+    def _save_to_store(self, user_page_url, user_data):
+        """把渲染数据中的用户 / 作品和页面可见计数写入数据库（一个事务，在线程中调用）"""
+        sec_uid = sec_uid_from_url(user_page_url)
+        users, videos = collect_entities(
+            [user_data.get('render_data'), user_data.get('ssr_data')], owner_sec_uid=sec_uid
+        )
+        if sec_uid and user_data.get('stats'):
+            nickname = user_data.get('visible_stats', {}).get('nickname') or None
+            visible = stats_to_user(sec_uid, user_data['stats'], nickname)
+            for user in users:
+                if user['sec_uid'] == sec_uid:
+                    # 渲染数据中的精确计数优先，页面文本只补缺
+                    for field, value in visible.items():
+                        if user.get(field) is None:
+                            user[field] = value
+                    break
+            else:
+                users.append(visible)
+        n_users, n_videos = self.store.save(users, videos, source='scraper_v3')
+        print(f"💾 已写入数据库: {n_users} 个用户, {n_videos} 个作品")
+    
+    async def _try_search_url(self, page, search_url, username, index, wait_for_link=False):
+        """
+        打开一个候选搜索URL并查找用户链接
+        :param wait_for_link: 等到出现用户链接即返回，而不是固定等待
+        :return: 用户主页URL，失败时返回 None
+        """
+        try:
+            print(f"📋 尝试搜索URL: {search_url}")
+            await page.goto(search_url, wait_until='domcontentloaded', timeout=20000)
+            if wait_for_link:
+                try:
+                    await page.wait_for_selector('a[href*="/user/"]', timeout=5000)
+                except Exception:
+                    pass
+            else:
+                await asyncio.sleep(5)
+            
+            # 尝试找到用户卡片
+            user_found = await self._find_user_in_results(page, username, settle=not wait_for_link)
+            
+            # 截图（按产物策略）
+            await self.artifacts.screenshot(page, f"douyin_search_{index}", failed=not user_found)
+            
+            return user_found
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️  搜索失败: {e}")
+            return None
+    
+    async def _race_search_urls(self, context, page, search_urls, username):
+        """
+        在同一上下文的多个页面中并行打开候选搜索URL，
+        取第一个找到用户链接的结果，并取消其余请求
+        第一个URL复用传入的 page，未找到时可用于保存现场
+        """
+        pages = [page] + [await context.new_page() for _ in search_urls[1:]]
+        tasks = [
+            asyncio.create_task(self._try_search_url(pg, url, username, index, wait_for_link=True))
+            for index, (pg, url) in enumerate(zip(pages, search_urls), start=1)
+        ]
+        print(f"🏁 并行竞速 {len(tasks)} 个搜索URL")
+        
+        user_page_url = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                user_page_url = await next_done
+                if user_page_url:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for pg in pages[1:]:
+                await pg.close()
+        
+        return user_page_url
+    
+    async def _find_user_in_results(self, page, username, settle=True):
         """
         从搜索结果中找到用户链接
         """
         try:
             # 等待页面加载
-            await asyncio.sleep(2)
+            if settle:
+                await asyncio.sleep(2)
             
             # 查找所有包含 /user/ 的链接
             user_links = await page.evaluate('''(username) => {
@@ -183,7 +344,8 @@ class DouyinUserScraper:
             "timestamp": datetime.now().isoformat(),
             "user_info": {},
             "stats": {},
-            "videos": []
+            "videos": [],
+            "payload_bytes": {}
         }
         
         try:
@@ -191,104 +353,32 @@ class DouyinUserScraper:
             
             # 1. 获取页面源码
             page_content = await page.content()
+            data['payload_bytes']['page_content'] = len(page_content.encode('utf-8'))
             
-            # 2. 尝试从 script 标签提取渲染数据
-            script_data = await page.evaluate('''() => {
-                const result = {
-                    render_data: null,
-                    ssr_data: null
-                };
-                
-                // 查找 __RENDER_DATA__
-                const renderScript = Array.from(document.querySelectorAll('script')).find(s => 
-                    s.textContent.includes('__RENDER_DATA__')
-                );
-                
-                if (renderScript) {
-                    const match = renderScript.textContent.match(/__RENDER_DATA__\s*=\s*({.+?});/);
-                    if (match) {
-                        try {
-                            result.render_data = JSON.parse(match[1]);
-                        } catch (e) {
-                            result.render_data = 'parse_error';
-                        }
-                    }
-                }
-                
-                // 查找 _SSR_HYDRATED_DATA
-                const ssrScript = Array.from(document.querySelectorAll('script')).find(s => 
-                    s.textContent.includes('_SSR_HYDRATED_DATA')
-                );
-                
-                if (ssrScript) {
-                    const match = ssrScript.textContent.match(/_SSR_HYDRATED_DATA\s*=\s*({.+?});/);
-                    if (match) {
-                        try {
-                            result.ssr_data = JSON.parse(match[1]);
-                        } catch (e) {
-                            result.ssr_data = 'parse_error';
-                        }
-                    }
-                }
-                
-                return result;
-            }''')
+            # 2. 从页面源码提取渲染数据中的用户 / 作品子树（不保留整棵树）
+            script_data = extract_page_fields(page_content, stats_limit=3)
             
-            if script_data['render_data']:
-                print("✅ 找到 RENDER_DATA")
+            if script_data.get('render_data'):
+                print(f"✅ 找到 RENDER_DATA: {', '.join(script_data['render_data'])}")
                 data['render_data'] = script_data['render_data']
-                # 这里可以进一步解析具体的数据结构
                 
-            if script_data['ssr_data']:
+            if script_data.get('ssr_data'):
                 print("✅ 找到 SSR_HYDRATED_DATA")
                 data['ssr_data'] = script_data['ssr_data']
             
             # 3. 从可见元素提取数据
-            visible_stats = await page.evaluate('''() => {
-                const result = {};
-                
-                // 查找所有包含数字的元素（可能是粉丝数、作品数等）
-                const allElements = document.querySelectorAll('*');
-                const numbersWithText = [];
-                
-                allElements.forEach(el => {
-                    const text = el.textContent.trim();
-                    // 匹配模式：粉丝、关注、获赞、作品 + 数字
-                    if (/^(粉丝|关注|获赞|作品|点赞)/.test(text)) {
-                        const parent = el.parentElement;
-                        if (parent) {
-                            const value = parent.textContent.trim();
-                            numbersWithText.push(value);
-                        }
-                    }
-                });
-                
-                result.stats_text = numbersWithText;
-                
-                // 获取页面标题和基本信息
-                result.page_title = document.title;
-                result.url = window.location.href;
-                
-                return result;
-            }''')
+            # 定向选择器 + 有上限的文本节点遍历，只回传短文本字段
+            visible_stats, payload_size = await evaluate_sized(
+                page, PROFILE_STATS_JS, self.max_scan_nodes
+            )
+            data['payload_bytes']['visible_stats'] = payload_size
+            print(f"📦 页内提取负载: {payload_size} 字节 (遍历 {visible_stats['scanned_nodes']} 个文本节点)")
             
             data['visible_stats'] = visible_stats
+            data['stats'] = parse_profile_stats(visible_stats)
             
-            # 4. 使用正则表达式从HTML中提取数据
-            patterns = {
-                '粉丝': r'[粉丝]?数[：:\s]*(\d+(?:\.\d+)?[万千百万]?)',
-                '关注': r'[关注]?数[：:\s]*(\d+(?:\.\d+)?[万千百万]?)',
-                '获赞': r'[获赞]?数[：:\s]*(\d+(?:\.\d+)?[万千百万]?)',
-                '作品': r'[作品]?数[：:\s]*(\d+(?:\.\d+)?[万千百万]?)',
-            }
-            
-            extracted = {}
-            for key, pattern in patterns.items():
-                matches = re.findall(pattern, page_content)
-                if matches:
-                    extracted[key] = matches[:3]
-            
-            data['regex_stats'] = extracted
+            # 4. 一次扫描从HTML中提取粉丝/关注/获赞/作品（归一化为整数）
+            data['regex_stats'] = script_data['stats']
             
             return data
             
@@ -332,12 +422,8 @@ async def main():
         if 'visible_stats' in result:
             print(f"\n可见统计数据: {json.dumps(result['visible_stats'], indent=2, ensure_ascii=False)[:500]}")
         
-        # 保存完整结果
-        output_file = f"/tmp/douyin_result_{username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
-        
-        print(f"\n💾 完整结果已保存: {output_file}")
+        # 用户和作品数据已在抓取时写入数据库
+        print(f"\n💾 数据库: {scraper.store.path} (python3 douyin_store.py user {username})")
     
     print("\n" + "=" * 70)
     print("✅ 完成!")
@@ -7,14 +7,27 @@
 import asyncio
 import json
 import time
-import re
 from playwright.async_api import async_playwright
-from datetime import datetime
+from douyin_artifacts import ArtifactWriter
+from douyin_extract import iter_render_data
+from douyin_config import DOUYIN_SEARCH_BASE_URL
+from douyin_service import request_service
+from douyin_store import shared_store
 
 class DouyinSearcher:
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, artifacts=None, use_service=True, store=None):
         self.headless = headless
         self.user_data_dir = "./douyin_session"
+        self.artifacts = artifacts or ArtifactWriter()
+        self.use_service = use_service  # 优先交给常驻抓取服务（见 douyin_service.py）
+        self._store = store  # 用户 / 作品数据库
+
+    @property
+    def store(self):
+        """用户 / 作品数据库，首次使用时打开（默认为进程内共享实例）"""
+        if self._store is None:
+            self._store = shared_store()
+        return self._store
         
     async def search_user(self, keyword):
         """搜索用户"""
@@ -22,6 +35,24 @@ class DouyinSearcher:
         print(f"🔍 搜索抖音用户: {keyword}")
         print(f"{'='*60}\n")
         
+        # 常驻服务已持有 douyin_session 时直接提交任务，跳过冷启动且不争抢 profile 锁
+        if self.use_service:
+            try:
+                result = await request_service('search', keyword=keyword)
+            except (RuntimeError, ConnectionError, asyncio.TimeoutError) as e:
+                print(f"⚠️  抓取服务任务失败，改为自行启动浏览器: {e or type(e).__name__}")
+                result = None
+            if result is not None:
+                print("✅ 已通过常驻抓取服务完成搜索")
+                if result['verify_required']:
+                    print("⚠️ 触发了验证页面，请在服务的浏览器窗口中手动完成验证")
+                for idx, data in enumerate(result['render_data'][:3]):
+                    print(f"\n📊 数据块 #{idx+1}:")
+                    print(json.dumps(data, ensure_ascii=False, indent=2)[:1000])
+                    # 服务端已把搜索结果写入数据库，这里只展示
+                    await self._extract_user_info(data, ingest=False)
+                return result
+        
         async with async_playwright() as p:
             # 启动浏览器 - 持久化上下文
             browser = await p.chromium.launch_persistent_context(
@@ -43,7 +74,7 @@ class DouyinSearcher:
             
             try:
                 # 访问抖音搜索页面
-                search_url = f"https://so.douyin.com/search?keyword={keyword}&source=normal_search&type=user"
+                search_url = f"{DOUYIN_SEARCH_BASE_URL}/search?keyword={keyword}&source=normal_search&type=user"
                 print(f"📍 访问搜索页面: {search_url}")
                 
                 await page.goto(search_url, wait_until='networkidle', timeout=30000)
@@ -58,38 +89,34 @@ class DouyinSearcher:
                 # 尝试多种方式获取数据
                 print("\n🔍 尝试提取数据...")
                 
-                # 方法1: 查找 script 标签中的数据
-                script_pattern = r'<script[^>]*id="RENDER_DATA"[^>]*>(.*?)</script>'
-                matches = re.findall(script_pattern, content)
-                
-                if matches:
-                    print("✅ 找到 RENDER_DATA!")
-                    for idx, match in enumerate(matches[:3]):  # 只取前3个
-                        try:
-                            # 解码数据
-                            decoded_data = bytes(match, 'utf-8').decode('unicode_escape')
-                            # 提取 JSON 部分
-                            json_match = re.search(r'\{.*\}', decoded_data)
-                            if json_match:
-                                data = json.loads(json_match.group())
-                                print(f"\n📊 数据块 #{idx+1}:")
-                                print(json.dumps(data, ensure_ascii=False, indent=2)[:1000])
-                                
-                                # 尝试提取用户信息
-                                self._extract_user_info(data)
-                        except Exception as e:
-                            print(f"❌ 解析数据块 #{idx+1} 失败: {e}")
+                # 方法1: 查找 RENDER_DATA 脚本中的数据（URL 解码 + 括号配对定界）
+                found = False
+                for idx, data in enumerate(iter_render_data(content)):
+                    if idx >= 3:  # 只取前3个
+                        break
+                    if idx == 0:
+                        print("✅ 找到 RENDER_DATA!")
+                    try:
+                        print(f"\n📊 数据块 #{idx+1}:")
+                        print(json.dumps(data, ensure_ascii=False, indent=2)[:1000])
+                        
+                        # 尝试提取用户信息
+                        await self._extract_user_info(data)
+                        found = True
+                    except Exception as e:
+                        print(f"❌ 解析数据块 #{idx+1} 失败: {e}")
                 
-                # 方法2: 截图看看页面内容
-                screenshot_path = f"douyin_search_{keyword}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                await page.screenshot(path=screenshot_path, full_page=True)
-                print(f"\n📸 页面截图已保存: {screenshot_path}")
+                # 方法2: 截图看看页面内容（按产物策略）
+                screenshot_path = await self.artifacts.screenshot(
+                    page, f"douyin_search_{keyword}", failed=not found
+                )
+                if screenshot_path:
+                    print(f"\n📸 页面截图已保存: {screenshot_path}")
                 
-                # 方法3: 保存完整 HTML 供分析
-                html_path = f"douyin_search_{keyword}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-                with open(html_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                print(f"📄 页面 HTML 已保存: {html_path}")
+                # 方法3: 保存完整 HTML 供分析（按产物策略）
+                html_path = self.artifacts.text(content, f"douyin_search_{keyword}", failed=not found)
+                if html_path:
+                    print(f"📄 页面 HTML 已保存: {html_path}")
                 
                 # 方法4: 检查是否需要登录
                 if "验证" in content or "安全验证" in content:
@@ -111,11 +138,17 @@ class DouyinSearcher:
                 traceback.print_exc()
             
             finally:
+                await self.artifacts.flush()
                 await browser.close()
     
-    def _extract_user_info(self, data):
-        """从数据中提取用户信息"""
+    async def _extract_user_info(self, data, ingest=True):
+        """从数据中提取用户信息；ingest 为真时把其中的用户 / 作品写入数据库"""
         try:
+            if ingest:
+                n_users, n_videos = await asyncio.to_thread(self.store.ingest, data, source='search_page')
+                if n_users or n_videos:
+                    print(f"💾 已写入数据库: {n_users} 个用户, {n_videos} 个作品")
+            
             # 尝试不同的数据路径
             paths = [
                 'data.data',
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+抖音常驻抓取服务
+由一个长期运行的进程持有 ./douyin_session 持久化上下文，
+通过本地 socket 接收抓取任务，避免每次冷启动和多进程争抢 profile 锁
+
+协议：每行一个 JSON 请求 / 响应
+  请求: {"id": 1, "type": "search", "keyword": "贾乃亮"}
+  响应: {"id": 1, "ok": true, "result": {...}} 或 {"id": 1, "ok": false, "error": "..."}
+
+任务类型：
+  fetch    {"url": ..., "include_html": false}
+  search   {"keyword": ...}
+  profile  {"sec_uid": ...}
+
+用法：
+  python3 douyin_service.py serve [--port 8765] [--headless] [--max-pages 4]
+  python3 douyin_service.py search 贾乃亮
+  python3 douyin_service.py profile MS4wLjABAAAA...
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from urllib.parse import quote
+
+from douyin_extract import (
+    PROFILE_STATS_JS, extract_page_data, extract_page_subtrees, iter_render_data, parse_profile_stats,
+    scan_stats
+)
+from douyin_config import DOUYIN_BASE_URL, DOUYIN_SEARCH_BASE_URL
+from douyin_singleflight import SingleFlight, normalize_key
+from douyin_store import collect_entities, shared_store, stats_to_user
+from playwright_stealth import StealthBrowser
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = int(os.environ.get('DOUYIN_SERVICE_PORT', 8765))
+STREAM_LIMIT = 256 * 1024 * 1024  # 单行请求 / 响应上限（include_html 或完整 render_data 可能有几 MB）
+DEFAULT_REQUEST_TIMEOUT = 120  # request_service 等待单个任务的秒数
+
+
+class ScraperService:
+    """持有热浏览器上下文的抓取服务"""
+
+    def __init__(self, headless=True, user_data_dir="./douyin_session",
+                 host=DEFAULT_HOST, port=DEFAULT_PORT, max_pages=4, store=None, base_url=None,
+                 search_base_url=None):
+        self.browser = StealthBrowser(headless=headless, user_data_dir=user_data_dir)
+        self.host = host
+        self.port = port
+        self.base_url = (base_url or DOUYIN_BASE_URL).rstrip('/')
+        self.search_base_url = (search_base_url or DOUYIN_SEARCH_BASE_URL).rstrip('/')
+        self._slots = asyncio.Semaphore(max_pages)  # 同时打开的页面上限
+        self._server = None
+        self._flights = SingleFlight()  # 合并并发的相同 search / profile 任务
+        self._store = store  # 用户 / 作品数据库
+        self.handlers = {
+            'fetch': self._handle_fetch,
+            'search': self._handle_search,
+            'profile': self._handle_profile,
+        }
+
+    @property
+    def store(self):
+        """用户 / 作品数据库，首次使用时打开（默认为进程内共享实例）"""
+        if self._store is None:
+            self._store = shared_store()
+        return self._store
+
+    async def start(self):
+        """启动浏览器并开始监听"""
+        print(f"🚀 启动持久化上下文: {self.browser.user_data_dir}")
+        await self.browser.start()
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port,
+                                                  limit=STREAM_LIMIT)
+        print(f"✅ 抓取服务已启动: {self.host}:{self.port}")
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+        await self.browser.close()
+
+    async def _handle_client(self, reader, writer):
+        """处理一个连接，连接内的请求并发执行"""
+        pending = set()
+        lock = asyncio.Lock()
+
+        async def respond(request):
+            response = await self.run_job(request)
+            async with lock:
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    request = {'type': None, 'error': f"无效的 JSON: {e}"}
+                task = asyncio.create_task(respond(request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def run_job(self, job):
+        """在热上下文的新页面中执行一个任务"""
+        job_id = job.get('id')
+        if job.get('error'):
+            return {'id': job_id, 'ok': False, 'error': job['error']}
+
+        handler = self.handlers.get(job.get('type'))
+        if not handler:
+            return {'id': job_id, 'ok': False, 'error': f"未知的任务类型: {job.get('type')}"}
+
+        try:
+            key = self._flight_key(job)
+            if key:
+                result = await self._flights.do(key, self._execute, handler, job)
+            else:
+                result = await self._execute(handler, job)
+            return {'id': job_id, 'ok': True, 'result': result}
+        except Exception as e:
+            print(f"⚠️  任务失败 ({job.get('type')}): {e}")
+            return {'id': job_id, 'ok': False, 'error': str(e)}
+
+    def _flight_key(self, job):
+        """search 按规范化关键词、profile 按 sec_uid 合并；fetch 不合并"""
+        if job['type'] == 'search':
+            return ('search', normalize_key(job['keyword']))
+        if job['type'] == 'profile':
+            return ('profile', job['sec_uid'])
+        return None
+
+    async def _execute(self, handler, job):
+        async with self._slots:
+            page = await self.browser.context.new_page()
+            try:
+                return await handler(page, job)
+            finally:
+                await page.close()
+
+    async def _load(self, page, url, settle=2):
+        await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        await asyncio.sleep(settle)
+        return await page.content()
+
+    async def _handle_fetch(self, page, job):
+        content = await self._load(page, job['url'], job.get('settle', 2))
+        result = {
+            'url': page.url,
+            'title': await page.title(),
+            'page_data': extract_page_data(content),
+            'regex_stats': scan_stats(content),
+        }
+        if job.get('include_html'):
+            result['html'] = content
+        return result
+
+    async def _handle_search(self, page, job):
+        keyword = job['keyword']
+        url = f"{self.search_base_url}/search?keyword={quote(keyword)}&source=normal_search&type=user"
+        content = await self._load(page, url, job.get('settle', 3))
+        render_data = list(iter_render_data(content))
+        await asyncio.to_thread(self.store.ingest, render_data, source='service_search')
+        return {
+            'url': page.url,
+            'keyword': keyword,
+            'render_data': render_data,
+            'verify_required': '验证' in content,
+        }
+
+    async def _handle_profile(self, page, job):
+        url = f"{self.base_url}/user/{job['sec_uid']}"
+        content = await self._load(page, url, job.get('settle', 3))
+        visible_stats = await page.evaluate(PROFILE_STATS_JS, 5000)
+        page_data = extract_page_subtrees(content)  # 只回传用户 / 作品子树
+        stats = parse_profile_stats(visible_stats)
+        users, videos = collect_entities(page_data, owner_sec_uid=job['sec_uid'])
+        if stats and not any(u['sec_uid'] == job['sec_uid'] for u in users):
+            users.append(stats_to_user(job['sec_uid'], stats, visible_stats.get('nickname') or None))
+        await asyncio.to_thread(self.store.save, users, videos, source='service_profile')
+        return {
+            'url': page.url,
+            'page_data': page_data,
+            'visible_stats': visible_stats,
+            'stats': stats,
+        }
+
+
+class ServiceClient:
+    """抓取服务客户端，一个连接上可以并发提交多个任务"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+        self._next_id = 0
+        self._waiters = {}
+        self._reader_task = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port, limit=STREAM_LIMIT)
+        self._reader_task = asyncio.create_task(self._read_responses())
+        return self
+
+    async def _read_responses(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                waiter = self._waiters.pop(response.get('id'), None)
+                if waiter and not waiter.done():
+                    waiter.set_result(response)
+        finally:
+            for waiter in self._waiters.values():
+                if not waiter.done():
+                    waiter.set_exception(ConnectionError("抓取服务连接已断开"))
+            self._waiters.clear()
+
+    async def request(self, job_type, **params):
+        """
+        提交任务并等待结果
+        :raises RuntimeError: 服务端任务失败
+        """
+        self._next_id += 1
+        job_id = self._next_id
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[job_id] = waiter
+
+        request = dict(params, id=job_id, type=job_type)
+        self._writer.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        await self._writer.drain()
+
+        response = await waiter
+        if not response.get('ok'):
+            raise RuntimeError(response.get('error'))
+        return response['result']
+
+    async def close(self):
+        if self._writer:
+            self._writer.close()
+        if self._reader_task:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+async def request_service(job_type, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=DEFAULT_REQUEST_TIMEOUT,
+                          **params):
+    """
+    向本地抓取服务提交单个任务
+    :return: 任务结果；服务未启动时返回 None，调用方可退回到自行启动浏览器
+    :raises RuntimeError: 服务端任务失败
+    :raises ConnectionError: 等待结果时连接断开
+    :raises asyncio.TimeoutError: timeout 秒内没有返回结果
+    """
+    try:
+        client = await asyncio.wait_for(ServiceClient(host, port).connect(), timeout)
+    except OSError:
+        return None
+    try:
+        return await asyncio.wait_for(client.request(job_type, **params), timeout)
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='抖音常驻抓取服务')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    serve = sub.add_parser('serve', help='启动服务')
+    serve.add_argument('--headless', action='store_true')
+    serve.add_argument('--max-pages', type=int, default=4)
+    serve.add_argument('--user-data-dir', default='./douyin_session')
+
+    search = sub.add_parser('search', help='提交搜索任务')
+    search.add_argument('keyword')
+
+    profile = sub.add_parser('profile', help='提交用户主页任务')
+    profile.add_argument('sec_uid')
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        service = ScraperService(
+            headless=args.headless, user_data_dir=args.user_data_dir,
+            host=args.host, port=args.port, max_pages=args.max_pages,
+        )
+        try:
+            asyncio.run(service.serve_forever())
+        except KeyboardInterrupt:
+            print("\n👋 服务已停止")
+        return
+
+    params = {'keyword': args.keyword} if args.command == 'search' else {'sec_uid': args.sec_uid}
+    result = asyncio.run(request_service(args.command, host=args.host, port=args.port, **params))
+    if result is None:
+        print(f"❌ 抓取服务未启动: {args.host}:{args.port}")
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=2)[:2000])
+
+
+if __name__ == "__main__":
+    main()
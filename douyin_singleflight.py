@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+单飞（single-flight）请求合并
+同一个键（规范化后的关键词或 sec_uid）同时只执行一次，
+并发调用方等待同一个进行中的任务并共享结果
+"""
+
+import asyncio
+import threading
+import unicodedata
+
+
+def normalize_key(value):
+    """规范化关键词：全半角统一、去首尾空白和 @、合并空白、小写"""
+    value = unicodedata.normalize('NFKC', str(value)).strip().lstrip('@')
+    return ' '.join(value.split()).lower()
+
+
+class SingleFlight:
+    """asyncio 版本：领头调用在独立任务中执行，某个调用方被取消不影响其他调用方"""
+
+    def __init__(self):
+        self._tasks = {}
+
+    def in_flight(self, key):
+        return key in self._tasks
+
+    async def do(self, key, fn, *args, **kwargs):
+        """
+        执行 fn(*args, **kwargs)；相同 key 已在执行时直接等待它的结果
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _, key=key: self._tasks.pop(key, None))
+        else:
+            print(f"♻️  合并重复请求: {key}")
+        return await asyncio.shield(task)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SyncSingleFlight:
+    """线程版本：用于同步的 requests 调用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            print(f"♻️  合并重复请求: {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
@@ -8,13 +8,20 @@ import requests
 import json
 import re
 from datetime import datetime
+from douyin_archive import shared_archive
+from douyin_config import DOUYIN_BASE_URL
+from douyin_extract import extract_page_data
+from douyin_store import shared_store
+
+# 进程内共享的会话，复用 keep-alive 连接
+_session = requests.Session()
 
 def search_douyin_user(keyword):
     """
     搜索抖音用户
     """
     # 抖音网页版搜索链接（实际使用时需要处理 cookies 和 headers）
-    search_url = f"https://www.douyin.com/search/{keyword}"
+    search_url = f"{DOUYIN_BASE_URL}/search/{keyword}"
     
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -23,18 +30,23 @@ def search_douyin_user(keyword):
     }
     
     try:
-        response = requests.get(search_url, headers=headers, timeout=10)
+        response = _session.get(search_url, headers=headers, timeout=10)
         print(f"状态码: {response.status_code}")
         
         if response.status_code == 200:
             print(f"页面长度: {len(response.text)}")
-            # 保存页面内容用于分析
-            with open('/tmp/douyin_page.html', 'w', encoding='utf-8') as f:
-                f.write(response.text)
-            print("页面已保存到 /tmp/douyin_page.html")
+            # 归档页面内容用于分析（相同内容只存一份）
+            saved = shared_archive().put(response.text, 'html', keyword=keyword, url=response.url, source='stats_page')
+            print(f"页面已归档: {saved['sha256'][:12]} (python3 douyin_archive.py cat {saved['sha256'][:12]})")
             
             # 尝试提取数据（抖音的数据通常在 script 标签中的 JSON 里）
-            # 这里只是示例，实际需要分析页面结构
+            page_data = extract_page_data(response.text)
+            if page_data:
+                print(f"找到数据块: {', '.join(page_data)}")
+                n_users, n_videos = shared_store().ingest(page_data, source='stats_page')
+                print(f"已写入数据库: {n_users} 个用户, {n_videos} 个作品")
+                return page_data
+            print("未找到 RENDER_DATA / SSR 数据")
         else:
             print(f"请求失败，状态码: {response.status_code}")
             
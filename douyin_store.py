@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+抖音用户 / 作品数据存储（SQLite）
+替代散落在工作目录和 /tmp 下的时间戳 JSON 文件
+
+表结构：
+  users            每个 sec_uid 一行，保存最新资料和计数
+  videos           每个 aweme_id 一行，保存最新描述和计数
+  user_snapshots   每次抓取追加一行用户计数（粉丝 / 关注 / 作品 / 获赞）
+  video_snapshots  每次抓取追加一行作品计数（点赞 / 播放 / 评论 / 分享 / 收藏）
+  video_cursors    作品列表的分页游标（可断点续抓）
+
+各抓取脚本拿到的数据形状不同（API 响应、RENDER_DATA、控制台导出），
+统一通过 collect_entities 遍历 JSON 树收集用户和作品对象，再批量写入
+
+用法：
+  python3 douyin_store.py stats
+  python3 douyin_store.py user <sec_uid | 抖音号 | 昵称>
+  python3 douyin_store.py ingest data.json [--source console]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from douyin_extract import parse_count
+
+DEFAULT_DB_PATH = os.environ.get('DOUYIN_STORE_DB', 'douyin_store.sqlite3')
+
+USER_FIELDS = ('uid', 'unique_id', 'nickname', 'signature')
+USER_COUNTERS = ('follower_count', 'following_count', 'aweme_count', 'total_favorited')
+VIDEO_COUNTERS = ('digg_count', 'play_count', 'comment_count', 'share_count', 'collect_count')
+
+# parse_profile_stats / scan_stats 的字段 -> users 表字段
+STAT_FIELDS = {
+    'followers': 'follower_count',
+    'following': 'following_count',
+    'works': 'aweme_count',
+    'likes': 'total_favorited',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    sec_uid TEXT PRIMARY KEY,
+    uid TEXT,
+    unique_id TEXT,
+    nickname TEXT,
+    signature TEXT,
+    follower_count INTEGER,
+    following_count INTEGER,
+    aweme_count INTEGER,
+    total_favorited INTEGER,
+    source TEXT,
+    first_seen REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_unique_id ON users(unique_id);
+CREATE INDEX IF NOT EXISTS users_nickname ON users(nickname);
+
+CREATE TABLE IF NOT EXISTS videos (
+    aweme_id TEXT PRIMARY KEY,
+    sec_uid TEXT,
+    description TEXT,
+    create_time INTEGER,
+    duration INTEGER,
+    digg_count INTEGER,
+    play_count INTEGER,
+    comment_count INTEGER,
+    share_count INTEGER,
+    collect_count INTEGER,
+    source TEXT,
+    first_seen REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS videos_sec_uid ON videos(sec_uid, create_time);
+
+CREATE TABLE IF NOT EXISTS user_snapshots (
+    id INTEGER PRIMARY KEY,
+    sec_uid TEXT NOT NULL,
+    captured_at REAL NOT NULL,
+    follower_count INTEGER,
+    following_count INTEGER,
+    aweme_count INTEGER,
+    total_favorited INTEGER,
+    source TEXT
+);
+-- 同一次抓取只记录一次（重新提取归档时不会重复追加）
+CREATE UNIQUE INDEX IF NOT EXISTS user_snapshots_capture ON user_snapshots(sec_uid, captured_at);
+CREATE INDEX IF NOT EXISTS user_snapshots_captured_at ON user_snapshots(captured_at);
+
+CREATE TABLE IF NOT EXISTS video_snapshots (
+    id INTEGER PRIMARY KEY,
+    aweme_id TEXT NOT NULL,
+    captured_at REAL NOT NULL,
+    digg_count INTEGER,
+    play_count INTEGER,
+    comment_count INTEGER,
+    share_count INTEGER,
+    collect_count INTEGER,
+    source TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS video_snapshots_capture ON video_snapshots(aweme_id, captured_at);
+CREATE INDEX IF NOT EXISTS video_snapshots_captured_at ON video_snapshots(captured_at);
+
+-- 作品列表分页进度，中断后从这里继续
+CREATE TABLE IF NOT EXISTS video_cursors (
+    sec_uid TEXT PRIMARY KEY,
+    max_cursor INTEGER NOT NULL,
+    has_more INTEGER NOT NULL,
+    pages INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _to_int(value):
+    """计数可能是整数、数字字符串或 "1.2万" 这样的文本"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    return parse_count(str(value))
+
+
+def _to_timestamp(value):
+    """发布时间：秒级时间戳或 ISO 字符串（控制台导出）"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return None
+
+
+def _camel(name):
+    head, *rest = name.split('_')
+    return head + ''.join(part.title() for part in rest)
+
+
+# 网页端渲染数据（RENDER_DATA / SSR）使用驼峰键，API 响应使用下划线键
+_CAMEL = {name: _camel(name) for name in (
+    'sec_uid', 'aweme_id', 'create_time', 'favoriting_count', *USER_FIELDS, *USER_COUNTERS, *VIDEO_COUNTERS,
+)}
+_USER_KEYS = frozenset(USER_FIELDS + USER_COUNTERS) | {_CAMEL[k] for k in USER_FIELDS + USER_COUNTERS}
+
+
+def _field(obj, name):
+    """按下划线键取值，没有时取对应的驼峰键（如 follower_count / followerCount）"""
+    value = obj.get(name)
+    if value is None:
+        value = obj.get(_CAMEL.get(name, name))
+    return value
+
+
+def normalize_user(user):
+    """API / 页面数据中的用户对象 -> users 表字段，没有 sec_uid 时返回 None"""
+    user = user.get('user', user) if isinstance(user.get('user'), dict) else user
+    sec_uid = _field(user, 'sec_uid')
+    if not sec_uid:
+        return None
+    row = {'sec_uid': sec_uid}
+    for field in USER_FIELDS:
+        value = _field(user, field)
+        row[field] = str(value) if value not in (None, '') else None
+    for field in USER_COUNTERS:
+        row[field] = _to_int(_field(user, field))
+    if row['total_favorited'] is None:
+        row['total_favorited'] = _to_int(_field(user, 'favoriting_count'))
+    return row
+
+
+def normalize_video(video, sec_uid=None):
+    """作品对象 -> videos 表字段"""
+    video = video.get('aweme', video) if isinstance(video.get('aweme'), dict) else video
+    aweme_id = _field(video, 'aweme_id')
+    if not aweme_id:
+        return None
+    stats = video.get('statistics') or video.get('stats') or {}
+    author = video.get('author') or video.get('authorInfo')
+    author = author if isinstance(author, dict) else {}
+    row = {
+        'aweme_id': str(aweme_id),
+        'sec_uid': _field(author, 'sec_uid') or _field(video, 'sec_uid') or sec_uid,
+        'description': video.get('desc'),
+        'create_time': _to_timestamp(_field(video, 'create_time')),
+        'duration': _to_int(video.get('duration')),
+    }
+    for field in VIDEO_COUNTERS:
+        row[field] = _to_int(_field(stats, field))
+    return row
+
+
+def stats_to_user(sec_uid, stats, nickname=None):
+    """parse_profile_stats / scan_stats 的结果 -> users 表字段（scan_stats 的值是列表，取第一个）"""
+    user = {'sec_uid': sec_uid, 'nickname': nickname}
+    for key, field in STAT_FIELDS.items():
+        value = stats.get(key)
+        if isinstance(value, list):
+            value = value[0] if value else None
+        user[field] = value
+    return normalize_user(user)
+
+
+def _merge(rows, key, row):
+    """同一实体出现多次时，用后出现的非空字段补全"""
+    existing = rows.get(key)
+    if existing is None:
+        rows[key] = row
+        return
+    for field, value in row.items():
+        if value is not None:
+            existing[field] = value
+
+
+def collect_entities(tree, owner_sec_uid=None):
+    """
+    遍历 JSON 树，收集用户对象（含 sec_uid / secUid）和作品对象（含 aweme_id / awemeId）
+    :param owner_sec_uid: 作品对象中没有作者信息时使用的 sec_uid（如用户主页数据）
+    :return: (users, videos)，同一 sec_uid / aweme_id 的多个对象合并为一条
+    """
+    users, videos = {}, {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if ('aweme_id' in node or 'awemeId' in node) and (
+                    'statistics' in node or 'stats' in node or 'desc' in node):
+                row = normalize_video(node, owner_sec_uid)
+                if row:
+                    _merge(videos, row['aweme_id'], row)
+            elif (node.get('sec_uid') or node.get('secUid')) and not _USER_KEYS.isdisjoint(node):
+                row = normalize_user(node)
+                if row:
+                    _merge(users, row['sec_uid'], row)
+            stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+        elif isinstance(node, list):
+            stack.extend(v for v in node if isinstance(v, (dict, list)))
+    return list(users.values()), list(videos.values())
+
+
+class ProfileStore:
+    """用户 / 作品 / 快照存储"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        # 同一实例可被多个线程共享（如 SyncSingleFlight 下的 DouyinAPIClient、to_thread 写库）；
+        # 可重入：事务期间一直持有，同一线程内的嵌套 save / 读取不会死锁
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._dedupe_snapshots()
+        self.conn.executescript(SCHEMA)
+        # 差分编码的计数序列与快照在同一事务中写入（douyin_timeseries 依赖本模块的常量，这里延迟导入）
+        from douyin_timeseries import TimeSeriesStore
+        self.timeseries = TimeSeriesStore(self.conn)
+
+    def close(self):
+        self.conn.close()
+
+    def _dedupe_snapshots(self):
+        """旧数据库升级：去掉同一次抓取的重复快照（保留最早写入的一条），以便建立唯一索引"""
+        for table, key in (('user_snapshots', 'sec_uid'), ('video_snapshots', 'aweme_id')):
+            exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone()
+            indexed = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (f"{table}_capture",)
+            ).fetchone()
+            if not exists or indexed:
+                continue
+            with self.transaction():
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE id NOT IN "
+                    f"(SELECT MIN(id) FROM {table} GROUP BY {key}, captured_at)"
+                )
+                self.conn.execute(f"DROP INDEX IF EXISTS {table}_{key}")
+
+    @contextmanager
+    def transaction(self):
+        """写事务；已在事务中时并入外层（批量导入时多次 save 只提交一次）"""
+        with self._lock:
+            if self.conn.in_transaction:
+                yield
+                return
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def save(self, users=(), videos=(), source=None, captured_at=None, cursor=None):
+        """
+        批量写入用户和作品（一个事务），每个带计数的对象追加一条快照
+        users / videos 表只由更新的抓取覆盖：captured_at 早于已有记录时（如重新提取归档）
+        只追加快照和计数序列；同一实体同一 captured_at 的快照只保留一条
+        :param users: normalize_user 的结果
+        :param videos: normalize_video 的结果
+        :param cursor: 可选 (sec_uid, max_cursor, has_more)，与本批作品在同一事务中记录分页进度
+        :return: (用户数, 作品数)
+        """
+        users = [u for u in users if u]
+        videos = [v for v in videos if v]
+        if not users and not videos and cursor is None:
+            return 0, 0
+        now = captured_at or time.time()
+
+        with self.transaction():
+            if users:
+                self.conn.executemany(
+                    """INSERT INTO users
+                       (sec_uid, uid, unique_id, nickname, signature, follower_count, following_count,
+                        aweme_count, total_favorited, source, first_seen, updated_at)
+                       VALUES (:sec_uid, :uid, :unique_id, :nickname, :signature, :follower_count,
+                               :following_count, :aweme_count, :total_favorited, :source, :now, :now)
+                       ON CONFLICT(sec_uid) DO UPDATE SET
+                           uid = COALESCE(excluded.uid, uid),
+                           unique_id = COALESCE(excluded.unique_id, unique_id),
+                           nickname = COALESCE(excluded.nickname, nickname),
+                           signature = COALESCE(excluded.signature, signature),
+                           follower_count = COALESCE(excluded.follower_count, follower_count),
+                           following_count = COALESCE(excluded.following_count, following_count),
+                           aweme_count = COALESCE(excluded.aweme_count, aweme_count),
+                           total_favorited = COALESCE(excluded.total_favorited, total_favorited),
+                           source = excluded.source,
+                           updated_at = excluded.updated_at
+                       WHERE excluded.updated_at >= users.updated_at""",
+                    [dict(u, source=source, now=now) for u in users],
+                )
+                self.conn.executemany(
+                    """INSERT OR IGNORE INTO user_snapshots
+                       (sec_uid, captured_at, follower_count, following_count, aweme_count, total_favorited, source)
+                       VALUES (:sec_uid, :now, :follower_count, :following_count, :aweme_count,
+                               :total_favorited, :source)""",
+                    [dict(u, source=source, now=now) for u in users
+                     if any(u.get(f) is not None for f in USER_COUNTERS)],
+                )
+            if videos:
+                self.conn.executemany(
+                    """INSERT INTO videos
+                       (aweme_id, sec_uid, description, create_time, duration, digg_count, play_count,
+                        comment_count, share_count, collect_count, source, first_seen, updated_at)
+                       VALUES (:aweme_id, :sec_uid, :description, :create_time, :duration, :digg_count,
+                               :play_count, :comment_count, :share_count, :collect_count, :source, :now, :now)
+                       ON CONFLICT(aweme_id) DO UPDATE SET
+                           sec_uid = COALESCE(excluded.sec_uid, sec_uid),
+                           description = COALESCE(excluded.description, description),
+                           create_time = COALESCE(excluded.create_time, create_time),
+                           duration = COALESCE(excluded.duration, duration),
+                           digg_count = COALESCE(excluded.digg_count, digg_count),
+                           play_count = COALESCE(excluded.play_count, play_count),
+                           comment_count = COALESCE(excluded.comment_count, comment_count),
+                           share_count = COALESCE(excluded.share_count, share_count),
+                           collect_count = COALESCE(excluded.collect_count, collect_count),
+                           source = excluded.source,
+                           updated_at = excluded.updated_at
+                       WHERE excluded.updated_at >= videos.updated_at""",
+                    [dict(v, source=source, now=now) for v in videos],
+                )
+                self.conn.executemany(
+                    """INSERT OR IGNORE INTO video_snapshots
+                       (aweme_id, captured_at, digg_count, play_count, comment_count, share_count,
+                        collect_count, source)
+                       VALUES (:aweme_id, :now, :digg_count, :play_count, :comment_count, :share_count,
+                               :collect_count, :source)""",
+                    [dict(v, source=source, now=now) for v in videos
+                     if any(v.get(f) is not None for f in VIDEO_COUNTERS)],
+                )
+            self.timeseries.record_rows('user', users, now, 'sec_uid')
+            self.timeseries.record_rows('video', videos, now, 'aweme_id')
+            if cursor is not None:
+                self._save_cursor(*cursor, now)
+        return len(users), len(videos)
+
+    def _save_cursor(self, sec_uid, max_cursor, has_more, now):
+        self.conn.execute(
+            """INSERT INTO video_cursors (sec_uid, max_cursor, has_more, pages, updated_at)
+               VALUES (?, ?, ?, 1, ?)
+               ON CONFLICT(sec_uid) DO UPDATE SET
+                   max_cursor = excluded.max_cursor, has_more = excluded.has_more,
+                   pages = pages + 1, updated_at = excluded.updated_at""",
+            (sec_uid, int(max_cursor), int(bool(has_more)), now),
+        )
+
+    def save_cursor(self, sec_uid, max_cursor, has_more):
+        """单独记录分页进度（如控制台导出的首屏游标）"""
+        with self._lock:
+            self._save_cursor(sec_uid, max_cursor, has_more, time.time())
+
+    def get_cursor(self, sec_uid):
+        """:return: dict(max_cursor, has_more, pages, updated_at)，没有记录时返回 None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT max_cursor, has_more, pages, updated_at FROM video_cursors WHERE sec_uid = ?", (sec_uid,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def reset_cursor(self, sec_uid):
+        with self._lock:
+            self.conn.execute("DELETE FROM video_cursors WHERE sec_uid = ?", (sec_uid,))
+
+    def ingest(self, tree, source=None, owner_sec_uid=None, captured_at=None):
+        """从任意 JSON 树中收集用户和作品并写入"""
+        if tree is None:
+            return 0, 0
+        users, videos = collect_entities(tree, owner_sec_uid)
+        return self.save(users, videos, source=source, captured_at=captured_at)
+
+    def get_user(self, key):
+        """按 sec_uid、抖音号或昵称查找用户"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM users WHERE sec_uid = ? OR unique_id = ? OR nickname = ? "
+                "ORDER BY updated_at DESC LIMIT 1",
+                (key, key, key),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def user_videos(self, sec_uid, limit=50):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM videos WHERE sec_uid = ? ORDER BY create_time DESC LIMIT ?",
+                (sec_uid, limit),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def user_history(self, sec_uid, since=None):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM user_snapshots WHERE sec_uid = ? AND captured_at >= ? ORDER BY captured_at",
+                (sec_uid, since or 0),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def video_history(self, aweme_id, since=None):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM video_snapshots WHERE aweme_id = ? AND captured_at >= ? ORDER BY captured_at",
+                (aweme_id, since or 0),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def stats(self):
+        with self._lock:
+            return {
+                table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('users', 'videos', 'user_snapshots', 'video_snapshots')
+            }
+
+
+_shared_store = None
+
+
+def shared_store():
+    """进程内共享的默认存储实例（模块级脚本使用）"""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = ProfileStore()
+    return _shared_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description='抖音数据存储')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('stats', help='各表行数')
+
+    user = sub.add_parser('user', help='查询用户及最近作品')
+    user.add_argument('key', help='sec_uid、抖音号或昵称')
+
+    ingest = sub.add_parser('ingest', help='导入 JSON 文件')
+    ingest.add_argument('files', nargs='+')
+    ingest.add_argument('--source', default='file')
+
+    args = parser.parse_args()
+    store = ProfileStore(args.db)
+
+    if args.command == 'stats':
+        for table, count in store.stats().items():
+            print(f"  {table}: {count:,}")
+    elif args.command == 'user':
+        found = store.get_user(args.key)
+        if not found:
+            print(f"❌ 未找到用户: {args.key}")
+            return
+        print(json.dumps(found, ensure_ascii=False, indent=2))
+        videos = store.user_videos(found['sec_uid'], limit=10)
+        print(f"\n📺 最近 {len(videos)} 个作品:")
+        for video in videos:
+            print(f"  {video['aweme_id']}  👍 {video['digg_count'] or 0:,}  {(video['description'] or '')[:30]}")
+    else:
+        for path in args.files:
+            with open(path, 'r', encoding='utf-8') as f:
+                n_users, n_videos = store.ingest(json.load(f), source=args.source)
+            print(f"💾 {path}: {n_users} 个用户, {n_videos} 个作品")
+
+
+if __name__ == "__main__":
+    main()
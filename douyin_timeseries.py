@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+计数时间序列（粉丝 / 获赞 / 作品点赞播放等）
+建立在 douyin_store 快照之上：每个 (实体, 指标) 一行，时间和数值都做差分后按 varint 编码，
+数值不变时不追加点，只更新最后观测时间 —— 存储量随变化次数增长，而不是随抓取次数增长
+
+时间序列按阶梯函数解释：某时刻的值 = 该时刻之前最后一个点的值
+
+用法：
+  python3 douyin_timeseries.py rebuild
+  python3 douyin_timeseries.py growth <sec_uid> [--metric follower_count] [--since 2026-01-01] [--until ...]
+  python3 douyin_timeseries.py daily <sec_uid> [--metric follower_count] [--days 14]
+"""
+
+import argparse
+import sqlite3
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+from douyin_store import DEFAULT_DB_PATH, USER_COUNTERS, VIDEO_COUNTERS
+
+DAY = 86400
+
+# 实体类型 -> 记录的指标
+METRICS = {
+    'user': USER_COUNTERS,
+    'video': VIDEO_COUNTERS,
+}
+
+# 实体类型 -> (快照表, 实体 ID 字段)
+SNAPSHOT_TABLES = {
+    'user': ('user_snapshots', 'sec_uid'),
+    'video': ('video_snapshots', 'aweme_id'),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    kind TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    last_time INTEGER NOT NULL,
+    last_value INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    times BLOB NOT NULL,
+    deltas BLOB NOT NULL,
+    PRIMARY KEY (kind, entity_id, metric)
+);
+"""
+
+
+def _zigzag(n):
+    return n << 1 if n >= 0 else ((-n) << 1) - 1
+
+
+def _unzigzag(n):
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+def _put_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varints(buf):
+    values = []
+    n = shift = 0
+    for byte in buf:
+        n |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(n)
+            n = shift = 0
+    return values
+
+
+def encode_series(points):
+    """
+    [(时间, 值), ...]（按时间升序，已去掉未变化的点）-> (times, deltas) 两个 varint 字节串
+    时间存与前一点的间隔，值存与前一点差值的 zigzag 编码
+    """
+    times, deltas = bytearray(), bytearray()
+    prev_t = prev_v = 0
+    for t, v in points:
+        _put_varint(times, t - prev_t)
+        _put_varint(deltas, _zigzag(v - prev_v))
+        prev_t, prev_v = t, v
+    return bytes(times), bytes(deltas)
+
+
+def decode_series(times, deltas):
+    """encode_series 的逆过程 -> ([时间...], [值...])"""
+    ts, vs = [], []
+    t = v = 0
+    for dt, dv in zip(_read_varints(times), _read_varints(deltas)):
+        t += dt
+        v += _unzigzag(dv)
+        ts.append(t)
+        vs.append(v)
+    return ts, vs
+
+
+def _compact(points):
+    """
+    按时间排序并去掉与前一点数值相同的点
+    同一时间有多个值时保留最先出现的一个（与快照表 INSERT OR IGNORE 的结果一致）
+    """
+    first = {}
+    for t, v in points:
+        first.setdefault(t, v)
+    out = []
+    for t in sorted(first):
+        if out and out[-1][1] == first[t]:
+            continue
+        out.append((t, first[t]))
+    return out
+
+
+def _value_at(ts, vs, t):
+    i = bisect_right(ts, t)
+    return vs[i - 1] if i else None
+
+
+def _growth(ts, vs, start, end):
+    if not ts or end < ts[0]:
+        return None
+    begin = _value_at(ts, vs, start)
+    if begin is None:
+        begin = vs[0]
+    return _value_at(ts, vs, end) - begin
+
+
+_INSERT = ("INSERT INTO series (kind, entity_id, metric, points, last_time, last_value, last_seen, times, deltas) "
+           "VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)")
+_TOUCH = "UPDATE series SET last_seen = ? WHERE kind = ? AND entity_id = ? AND metric = ?"
+_APPEND = ("UPDATE series SET points = points + 1, last_time = ?, last_value = ?, last_seen = ?, "
+           "times = ?, deltas = ? WHERE kind = ? AND entity_id = ? AND metric = ?")
+_REWRITE = ("UPDATE series SET points = ?, last_time = ?, last_value = ?, last_seen = ?, times = ?, deltas = ? "
+            "WHERE kind = ? AND entity_id = ? AND metric = ?")
+
+
+class TimeSeriesStore:
+    """差分编码的计数时间序列"""
+
+    def __init__(self, conn=None, path=DEFAULT_DB_PATH):
+        """
+        :param conn: 已有的 SQLite 连接（如 ProfileStore.conn，可与快照写入共用一个事务）
+        """
+        if conn is None:
+            conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+        self.conn = conn
+        self.conn.executescript(SCHEMA)
+
+    def _row(self, kind, entity_id, metric):
+        return self.conn.execute(
+            "SELECT points, last_time, last_value, last_seen, times, deltas FROM series "
+            "WHERE kind = ? AND entity_id = ? AND metric = ?",
+            (kind, entity_id, metric),
+        ).fetchone()
+
+    def _change(self, kind, entity_id, metric, row, t, value):
+        """
+        根据已有序列（_row 的结果或 None）计算记录一次观测需要的写入
+        :return: (sql, 参数) 或 None（无需写入）
+        """
+        if row is None:
+            times, deltas = encode_series([(t, value)])
+            return _INSERT, (kind, entity_id, metric, t, value, t, times, deltas)
+
+        points, last_time, last_value, last_seen, times, deltas = row
+        if t >= last_time:
+            if value == last_value:
+                if t > last_seen:
+                    return _TOUCH, (t, kind, entity_id, metric)
+                return None
+            if t > last_time and t >= last_seen:
+                # 常见情况：直接在末尾追加一个差分点
+                tail_t, tail_v = bytearray(), bytearray()  # SQLite 的 || 会把 BLOB 转成 TEXT，在这里拼接
+                _put_varint(tail_t, t - last_time)
+                _put_varint(tail_v, _zigzag(value - last_value))
+                return _APPEND, (t, value, max(t, last_seen), times + tail_t, deltas + tail_v,
+                                 kind, entity_id, metric)
+
+        # 早于最后观测的点（批量导入、回填较早的归档）：压缩时丢掉的"未变化"观测无法从序列本身恢复，
+        # 按快照重建该实体的这条序列
+        points = self._snapshot_points(kind, entity_id, metric)
+        if not points:
+            ts, vs = decode_series(times, deltas)
+            points = list(zip(ts, vs))
+        merged = _compact(points + [(t, value)])
+        times, deltas = encode_series(merged)
+        return _REWRITE, (len(merged), merged[-1][0], merged[-1][1], max(t, last_seen), times, deltas,
+                          kind, entity_id, metric)
+
+    def _snapshot_points(self, kind, entity_id, metric):
+        """某实体某指标在快照表中的全部观测 [(时间, 值), ...]，按抓取时间排序"""
+        table, id_field = SNAPSHOT_TABLES[kind]
+        try:
+            rows = self.conn.execute(
+                f"SELECT captured_at, {metric} FROM {table} "
+                f"WHERE {id_field} = ? AND {metric} IS NOT NULL ORDER BY captured_at",
+                (entity_id,),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # 单独使用（没有快照表）时退回到按已有序列合并
+            return []
+        return [(int(captured_at), value) for captured_at, value in rows]
+
+    def append(self, kind, entity_id, metric, t, value):
+        """
+        记录一次观测（调用方负责事务）
+        值未变化时只更新 last_seen；早于最后观测的点会按快照重建整条序列
+        """
+        change = self._change(kind, entity_id, metric, self._row(kind, entity_id, metric), int(t), value)
+        if change:
+            self.conn.execute(*change)
+
+    def record_rows(self, kind, rows, captured_at, id_field):
+        """
+        把 ProfileStore 的一批行（normalize_user / normalize_video 结果）追加到各指标序列
+        已有序列按实体批量读取，写入按语句分组 executemany，不再逐点查询
+        """
+        t = int(captured_at)
+        points = [(row[id_field], metric, row[metric])
+                  for row in rows for metric in METRICS[kind] if row.get(metric) is not None]
+        if len({(entity_id, metric) for entity_id, metric, _ in points}) != len(points):
+            # 同一实体在一批中出现多次时逐点写入，保证先后顺序
+            for entity_id, metric, value in points:
+                self.append(kind, entity_id, metric, t, value)
+            return
+
+        existing = {}
+        entity_ids = list({entity_id for entity_id, _, _ in points})
+        for i in range(0, len(entity_ids), 500):
+            batch = entity_ids[i:i + 500]
+            for row in self.conn.execute(
+                "SELECT entity_id, metric, points, last_time, last_value, last_seen, times, deltas FROM series "
+                f"WHERE kind = ? AND entity_id IN ({','.join('?' * len(batch))})",
+                (kind, *batch),
+            ):
+                existing[(row[0], row[1])] = tuple(row)[2:]
+
+        writes = {}
+        for entity_id, metric, value in points:
+            change = self._change(kind, entity_id, metric, existing.get((entity_id, metric)), t, value)
+            if change:
+                writes.setdefault(change[0], []).append(change[1])
+        for sql, params in writes.items():
+            self.conn.executemany(sql, params)
+
+    def series(self, kind, entity_id, metric):
+        """:return: [(时间, 值), ...]"""
+        row = self._row(kind, entity_id, metric)
+        if row is None:
+            return []
+        return list(zip(*decode_series(row['times'], row['deltas'])))
+
+    def _decoded(self, kind, entity_id, metric):
+        row = self._row(kind, entity_id, metric)
+        if row is None:
+            return [], []
+        return decode_series(row['times'], row['deltas'])
+
+    def value_at(self, kind, entity_id, metric, t):
+        """t 时刻的值；早于第一次观测时返回 None"""
+        return _value_at(*self._decoded(kind, entity_id, metric), t)
+
+    def growth(self, kind, entity_id, metric, start, end):
+        """
+        [start, end] 之间的增量
+        start 早于第一次观测时从第一次观测算起；没有任何观测时返回 None
+        """
+        return _growth(*self._decoded(kind, entity_id, metric), start, end)
+
+    def rate_per_day(self, kind, entity_id, metric, start, end):
+        """[start, end] 内的平均日增量"""
+        ts, vs = self._decoded(kind, entity_id, metric)
+        change = _growth(ts, vs, start, end)
+        if change is None:
+            return None
+        span = end - max(start, ts[0])
+        return change / (span / DAY) if span > 0 else 0.0
+
+    def daily_rates(self, kind, entity_id, metric, start, end):
+        """
+        按自然日（本地时区）统计每天的增量
+        :return: [(日期字符串, 增量), ...]，第一次观测之前的日子不输出
+        """
+        ts, vs = self._decoded(kind, entity_id, metric)
+        if not ts or end < ts[0]:
+            return []
+        day = datetime.fromtimestamp(max(start, ts[0])).replace(hour=0, minute=0, second=0, microsecond=0)
+        last = datetime.fromtimestamp(end)
+        rates = []
+        while day <= last:
+            day_end = min((day + timedelta(days=1)).timestamp(), end)
+            rates.append((day.strftime('%Y-%m-%d'), _growth(ts, vs, day.timestamp(), day_end)))
+            day += timedelta(days=1)
+        return rates
+
+    def rebuild_from_snapshots(self):
+        """从 user_snapshots / video_snapshots 重建全部序列"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute("DELETE FROM series")
+            for kind, (table, id_field) in SNAPSHOT_TABLES.items():
+                for metric in METRICS[kind]:
+                    current, points, last_seen = None, [], 0
+                    rows = self.conn.execute(
+                        f"SELECT {id_field}, captured_at, {metric} FROM {table} "
+                        f"WHERE {metric} IS NOT NULL ORDER BY {id_field}, captured_at"
+                    )
+                    for entity_id, captured_at, value in rows:
+                        if entity_id != current:
+                            self._write_series(kind, current, metric, points, last_seen)
+                            current, points = entity_id, []
+                        points.append((int(captured_at), value))
+                        last_seen = int(captured_at)
+                    self._write_series(kind, current, metric, points, last_seen)
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return self.conn.execute("SELECT COUNT(*), COALESCE(SUM(points), 0) FROM series").fetchone()
+
+    def _write_series(self, kind, entity_id, metric, points, last_seen):
+        if entity_id is None or not points:
+            return
+        points = _compact(points)
+        times, deltas = encode_series(points)
+        self.conn.execute(
+            "INSERT INTO series (kind, entity_id, metric, points, last_time, last_value, last_seen, times, deltas) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (kind, entity_id, metric, len(points), points[-1][0], points[-1][1], last_seen, times, deltas),
+        )
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').timestamp() if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='抖音计数时间序列')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('rebuild', help='从快照表重建时间序列')
+
+    growth = sub.add_parser('growth', help='区间增量')
+    growth.add_argument('sec_uid')
+    growth.add_argument('--metric', default='follower_count')
+    growth.add_argument('--since', help='YYYY-MM-DD，默认 30 天前')
+    growth.add_argument('--until', help='YYYY-MM-DD，默认现在')
+
+    daily = sub.add_parser('daily', help='每日增量')
+    daily.add_argument('sec_uid')
+    daily.add_argument('--metric', default='follower_count')
+    daily.add_argument('--days', type=int, default=14)
+
+    args = parser.parse_args()
+    ts = TimeSeriesStore(path=args.db)
+
+    if args.command == 'rebuild':
+        count, points = ts.rebuild_from_snapshots()
+        print(f"✅ 已重建 {count} 条序列，共 {points} 个变化点")
+    elif args.command == 'growth':
+        end = _parse_date(args.until) or time.time()
+        start = _parse_date(args.since) or end - 30 * DAY
+        change = ts.growth('user', args.sec_uid, args.metric, start, end)
+        if change is None:
+            print(f"❌ 没有 {args.sec_uid} 的 {args.metric} 数据")
+            return
+        rate = ts.rate_per_day('user', args.sec_uid, args.metric, start, end)
+        print(f"📈 {args.metric}: {change:+,}（平均每天 {rate:+,.1f}）")
+    else:
+        end = time.time()
+        for day, change in ts.daily_rates('user', args.sec_uid, args.metric, end - args.days * DAY, end):
+            print(f"  {day}  {change:+,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+用户作品列表分页抓取 - /aweme/v1/web/aweme/post/
+按 max_cursor 逐页请求，异步生成器逐页产出；
+当前页写库的同时预取下一页（预取页数有上限，写库慢时自动停止请求，内存占用不随作品数增长），
+每页写库时在同一事务中记录游标，中断后从上次的位置继续
+
+用法：
+  python3 douyin_videos.py MS4wLjABAAAA... [--max-pages 50] [--prefetch 1] [--restart]
+"""
+
+import argparse
+import asyncio
+import time
+
+from douyin_config import DOUYIN_BASE_URL
+from douyin_http import AsyncHTTPClient
+from douyin_store import collect_entities, shared_store
+
+POST_API = f"{DOUYIN_BASE_URL}/aweme/v1/web/aweme/post/"
+PAGE_SIZE = 18
+
+_DONE = object()
+
+
+class VideoPage:
+    """一页作品"""
+
+    def __init__(self, sec_uid, cursor, next_cursor, has_more, aweme_list):
+        self.sec_uid = sec_uid
+        self.cursor = cursor              # 本页请求使用的游标
+        self.next_cursor = next_cursor    # 下一页的游标（响应中的 max_cursor）
+        self.has_more = has_more
+        self.aweme_list = aweme_list
+
+    def __repr__(self):
+        return f"VideoPage(cursor={self.cursor}, items={len(self.aweme_list)}, has_more={self.has_more})"
+
+
+def _post_params(sec_uid, max_cursor, count):
+    return {
+        'device_platform': 'webapp',
+        'aid': '6383',
+        'channel': 'channel_pc_web',
+        'sec_user_id': sec_uid,
+        'max_cursor': str(max_cursor),
+        'count': str(count),
+        'publish_video_strategy_type': '2',
+        'pc_client_type': '1',
+        'version_code': '170400',
+        'version_name': '17.4.0',
+        'cookie_enabled': 'true',
+        'platform': 'PC',
+        'browser_language': 'zh-CN',
+        'browser_platform': 'MacIntel',
+        'browser_name': 'Chrome',
+        'browser_version': '131.0.0.0',
+    }
+
+
+async def fetch_video_page(http, sec_uid, max_cursor=0, count=PAGE_SIZE, headers=None):
+    """
+    请求一页作品
+    :raises RuntimeError: 请求失败、返回非 JSON（通常是风控）或 status_code 非 0
+    """
+    response = await http.get(
+        POST_API, params=_post_params(sec_uid, max_cursor, count),
+        headers={'Referer': f"{DOUYIN_BASE_URL}/user/{sec_uid}", **(headers or {})},
+        timeout=15,
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"作品列表请求失败: HTTP {response.status_code}")
+    try:
+        data = response.json()
+    except ValueError:
+        raise RuntimeError(f"作品列表返回的不是 JSON（长度 {len(response.content)}），可能需要登录 cookie")
+    if data.get('status_code') != 0:
+        raise RuntimeError(f"作品列表返回错误: status_code={data.get('status_code')}")
+    return VideoPage(
+        sec_uid, max_cursor,
+        data.get('max_cursor', 0),
+        bool(data.get('has_more')),
+        data.get('aweme_list') or [],
+    )
+
+
+async def iter_video_pages(http, sec_uid, cursor=0, count=PAGE_SIZE, prefetch=1, max_pages=None, headers=None):
+    """
+    异步生成器，逐页产出 VideoPage
+    :param prefetch: 调用方处理当前页时最多提前请求的页数；
+                     调用方没有取走下一页之前不会发起更多请求（背压）
+    """
+    queue = asyncio.Queue()
+    slots = asyncio.Semaphore(prefetch + 1)  # 当前页 + 预取页
+
+    async def produce():
+        next_cursor, fetched = cursor, 0
+        try:
+            while max_pages is None or fetched < max_pages:
+                await slots.acquire()
+                page = await fetch_video_page(http, sec_uid, next_cursor, count, headers)
+                fetched += 1
+                queue.put_nowait(page)
+                # 没有更多或游标不再前进时结束
+                if not page.has_more or page.next_cursor == next_cursor:
+                    break
+                next_cursor = page.next_cursor
+        except Exception as e:
+            queue.put_nowait(e)
+        queue.put_nowait(_DONE)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            slots.release()
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+async def sync_user_videos(sec_uid, store=None, http=None, resume=True, max_pages=None,
+                           prefetch=1, headers=None):
+    """
+    抓取用户作品列表并逐页写入数据库
+    :param resume: 上次未抓完（has_more）时从记录的游标继续，否则从头开始
+    :return: dict(sec_uid, pages, videos, cursor, has_more, elapsed)
+    """
+    store = store or shared_store()
+    state = store.get_cursor(sec_uid)
+    cursor = state['max_cursor'] if resume and state and state['has_more'] else 0
+    if cursor:
+        print(f"↩️  从游标 {cursor} 继续（已抓 {state['pages']} 页）")
+    elif state:
+        store.reset_cursor(sec_uid)
+
+    own_client = http is None
+    http = http or AsyncHTTPClient()
+    started = time.perf_counter()
+    pages = total = 0
+    has_more = True
+    try:
+        async for page in iter_video_pages(http, sec_uid, cursor, prefetch=prefetch,
+                                           max_pages=max_pages, headers=headers):
+            # 列表中的作者信息往往不完整，这里只写作品
+            _, videos = collect_entities(page.aweme_list, owner_sec_uid=sec_uid)
+            # 在线程中写库，事件循环同时继续请求预取页
+            await asyncio.to_thread(store.save, videos=videos, source='post_api',
+                                    cursor=(sec_uid, page.next_cursor, page.has_more))
+            pages += 1
+            total += len(videos)
+            cursor, has_more = page.next_cursor, page.has_more
+            print(f"📄 第 {pages} 页: {len(videos)} 个作品 (cursor={page.cursor} -> {page.next_cursor})")
+    finally:
+        if own_client:
+            await http.aclose()
+
+    return {
+        'sec_uid': sec_uid,
+        'pages': pages,
+        'videos': total,
+        'cursor': cursor,
+        'has_more': has_more,
+        'elapsed': time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='抓取用户全部作品')
+    parser.add_argument('sec_uid')
+    parser.add_argument('--max-pages', type=int)
+    parser.add_argument('--prefetch', type=int, default=1)
+    parser.add_argument('--restart', action='store_true', help='忽略记录的游标，从头开始')
+    parser.add_argument('--cookie', help='登录后的 Cookie 请求头')
+    args = parser.parse_args()
+
+    headers = {'Cookie': args.cookie} if args.cookie else None
+    result = asyncio.run(sync_user_videos(
+        args.sec_uid, resume=not args.restart, max_pages=args.max_pages,
+        prefetch=args.prefetch, headers=headers,
+    ))
+    print(f"\n✅ {result['pages']} 页, {result['videos']} 个作品, 用时 {result['elapsed']:.1f}s"
+          f"{'（还有更多，下次继续）' if result['has_more'] else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,100 +5,71 @@
 """
 
 import requests
-import json
+import codecs
 import re
-from datetime import datetime
+import time
+from douyin_archive import shared_archive
+from douyin_config import DOUYIN_BASE_URL, DOUYIN_SEARCH_BASE_URL
+from douyin_extract import ScriptStreamScanner, iter_render_data
+from douyin_http_cache import shared_cache
+from douyin_store import shared_store
 
-def fetch_douyin_user(keyword):
-    """获取抖音用户搜索数据"""
-    print(f"\n{'='*60}")
-    print(f"🔍 搜索抖音用户: {keyword}")
-    print(f"{'='*60}\n")
-    
-    # 搜索页面 URL
-    url = "https://so.douyin.com/search/"
-    params = {
+# 搜索页面 URL
+SEARCH_URL = f"{DOUYIN_SEARCH_BASE_URL}/search/"
+
+# 真实浏览器 headers
+SEARCH_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Referer': f'{DOUYIN_BASE_URL}/',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# 进程内共享的会话，复用 keep-alive 连接
+_session = requests.Session()
+
+SEARCH_CACHE_TTL = 1800  # 搜索页缓存 30 分钟
+
+def _is_search_page(response):
+    """验证页不缓存"""
+    return '验证' not in response.text and 'security' not in response.url.lower()
+
+def _search_params(keyword):
+    return {
         'keyword': keyword,
         'source': 'normal_search',
         'type': 'user'
     }
+
+def fetch_douyin_user(keyword, stream=False):
+    """
+    获取抖音用户搜索数据
+    :param stream: 流式读取，RENDER_DATA 脚本闭合后立即停止下载（不经过缓存），返回 stream_render_data 的结果
+    """
+    print(f"\n{'='*60}")
+    print(f"🔍 搜索抖音用户: {keyword}")
+    print(f"{'='*60}\n")
     
-    # 真实浏览器 headers
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Referer': 'https://www.douyin.com/',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1'
-    }
+    if stream:
+        return fetch_douyin_user_stream(keyword)
+    
+    params = _search_params(keyword)
     
     try:
-        print(f"📍 请求 URL: {url}")
+        print(f"📍 请求 URL: {SEARCH_URL}")
         print(f"📋 参数: {params}")
         
-        # 发送请求
-        response = requests.get(url, params=params, headers=headers, timeout=15)
-        
-        print(f"\n✅ 响应状态码: {response.status_code}")
-        print(f"📄 响应长度: {len(response.text)} 字符")
-        print(f"🔗 实际 URL: {response.url}")
-        
-        # 保存完整 HTML
-        html_path = f"douyin_search_{keyword}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(response.text)
-        print(f"💾 HTML 已保存: {html_path}")
+        # 发送请求（命中磁盘缓存时不访问网络）
+        response = shared_cache().request(
+            _session, 'GET', SEARCH_URL, params=params, headers=SEARCH_HEADERS, timeout=15,
+            ttl=SEARCH_CACHE_TTL, should_cache=_is_search_page
+        )
         
-        # 检查是否被重定向到验证页面
-        if '验证' in response.text or 'security' in response.url.lower():
-            print("\n⚠️ 被重定向到安全验证页面")
-            return None
-        
-        # 提取 RENDER_DATA
-        print("\n🔍 提取数据...")
-        script_pattern = r'<script[^>]*id="RENDER_DATA"[^>]*>(.*?)</script>'
-        matches = re.findall(script_pattern, response.text)
-        
-        if matches:
-            print(f"✅ 找到 {len(matches)} 个数据块!")
-            
-            for idx, match in enumerate(matches):
-                try:
-                    # 解码
-                    decoded = bytes(match, 'utf-8').decode('unicode_escape')
-                    # 提取 JSON
-                    json_match = re.search(r'\{.*\}', decoded)
-                    
-                    if json_match:
-                        data = json.loads(json_match.group())
-                        
-                        # 保存数据
-                        json_path = f"douyin_data_{keyword}_{idx+1}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                        with open(json_path, 'w', encoding='utf-8') as f:
-                            json.dump(data, f, ensure_ascii=False, indent=2)
-                        print(f"💾 数据块 #{idx+1} 已保存: {json_path}")
-                        
-                        # 尝试提取用户信息
-                        extract_user_stats(data)
-                        
-                except Exception as e:
-                    print(f"❌ 解析数据块 #{idx+1} 失败: {e}")
-        else:
-            print("❌ 未找到 RENDER_DATA")
-            # 查找其他可能的数据
-            print("\n🔍 查找其他脚本标签...")
-            all_scripts = re.findall(r'<script[^>]*>(.*?)</script>', response.text, re.DOTALL)
-            print(f"找到 {len(all_scripts)} 个 script 标签")
-            
-            # 显示前几个非空的脚本
-            for i, script in enumerate(all_scripts[:5]):
-                if len(script) > 100 and 'window' not in script:
-                    print(f"\nScript #{i+1} ({len(script)} 字符):")
-                    print(script[:500])
-        
-        return response.text
+        return process_search_page(keyword, response.status_code, response.text, response.url,
+                                   from_cache=response.from_cache)
         
     except Exception as e:
         print(f"❌ 请求失败: {e}")
@@ -106,6 +77,157 @@ def fetch_douyin_user(keyword):
         traceback.print_exc()
         return None
 
+async def fetch_douyin_user_async(keyword, http, stream=False):
+    """
+    异步版本的 fetch_douyin_user，使用共享连接池
+    :param http: AsyncHTTPClient 实例
+    :param stream: 同 fetch_douyin_user
+    """
+    try:
+        if stream:
+            result = await stream_render_data_async(http, SEARCH_URL, params=_search_params(keyword), headers=SEARCH_HEADERS)
+            if result['data'] is not None:
+                extract_user_stats(result['data'])
+                shared_store().ingest(result['data'], source='search_page')
+            return result
+        response = await shared_cache().request_async(
+            http, 'GET', SEARCH_URL, params=_search_params(keyword), headers=SEARCH_HEADERS, timeout=15,
+            ttl=SEARCH_CACHE_TTL, should_cache=_is_search_page
+        )
+        return process_search_page(keyword, response.status_code, response.text, response.url,
+                                   from_cache=response.from_cache)
+    except Exception as e:
+        print(f"❌ 请求失败 ({keyword}): {e}")
+        return None
+
+def _stream_result(scanner, status_code, final_url, bytes_read, stopped, started):
+    """
+    :return: {'data', 'offset', 'bytes_read', 'elapsed', 'early_exit', 'status_code', 'url', 'text'}
+      offset 为 RENDER_DATA 脚本结束处的字节偏移，未找到时为 None；
+      early_exit 表示在正文结束前停止了读取；
+      text 为已读取的内容（未提前结束时即完整页面）
+    """
+    return {
+        'data': scanner.render_data(),
+        'offset': scanner.byte_offset(),
+        'bytes_read': bytes_read,
+        'elapsed': time.perf_counter() - started,
+        'early_exit': stopped,
+        'status_code': status_code,
+        'url': str(final_url),
+        'text': scanner.text,
+    }
+
+def stream_render_data(session, url, params=None, headers=None, chunk_size=65536, timeout=15):
+    """
+    流式下载页面，边读边增量扫描，RENDER_DATA 脚本完整后立即断开
+    :param session: requests.Session
+    """
+    started = time.perf_counter()
+    scanner = ScriptStreamScanner('RENDER_DATA')
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    bytes_read = 0
+    stopped = False
+    with session.get(url, params=params, headers=headers, timeout=timeout, stream=True) as response:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            bytes_read += len(chunk)
+            if scanner.feed(decoder.decode(chunk)):
+                stopped = True
+                break
+        else:
+            scanner.feed(decoder.decode(b'', final=True))
+        return _stream_result(scanner, response.status_code, response.url, bytes_read, stopped, started)
+
+async def stream_render_data_async(http, url, params=None, headers=None, timeout=15):
+    """
+    异步版本的 stream_render_data
+    :param http: AsyncHTTPClient 实例
+    """
+    started = time.perf_counter()
+    scanner = ScriptStreamScanner('RENDER_DATA')
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    bytes_read = 0
+    stopped = False
+    async with http.stream('GET', url, params=params, headers=headers, timeout=timeout) as response:
+        async for chunk in response.aiter_bytes():
+            bytes_read += len(chunk)
+            if scanner.feed(decoder.decode(chunk)):
+                stopped = True
+                break
+        else:
+            scanner.feed(decoder.decode(b'', final=True))
+        return _stream_result(scanner, response.status_code, response.url, bytes_read, stopped, started)
+
+def fetch_douyin_user_stream(keyword):
+    """流式获取搜索页 RENDER_DATA，读到数据即停止"""
+    try:
+        result = stream_render_data(_session, SEARCH_URL, params=_search_params(keyword), headers=SEARCH_HEADERS)
+    except Exception as e:
+        print(f"❌ 请求失败: {e}")
+        return None
+    
+    print(f"\n✅ 响应状态码: {result['status_code']}")
+    print(f"📥 已读取 {result['bytes_read']} 字节，用时 {result['elapsed']*1000:.0f} ms"
+          f"{'（提前结束）' if result['early_exit'] else ''}")
+    
+    if result['data'] is None:
+        # 读完整个页面仍未找到数据，按完整页面处理（保存 HTML、检查验证页）
+        process_search_page(keyword, result['status_code'], result['text'], result['url'])
+        return result
+    
+    print(f"✅ RENDER_DATA 结束于字节偏移 {result['offset']}")
+    extract_user_stats(result['data'])
+    shared_store().ingest(result['data'], source='search_page')
+    return result
+
+def process_search_page(keyword, status_code, text, final_url, from_cache=False):
+    """处理搜索页面：保存 HTML、检查验证页并提取 RENDER_DATA"""
+    print(f"\n✅ 响应状态码: {status_code}{' (缓存)' if from_cache else ''}")
+    print(f"📄 响应长度: {len(text)} 字符")
+    print(f"🔗 实际 URL: {final_url}")
+    
+    # 归档完整 HTML（缓存命中时与上次下载的内容相同，不重复归档）
+    if not from_cache:
+        saved = shared_archive().put(text, 'html', keyword=keyword, url=str(final_url), source='search_page')
+        print(f"💾 HTML 已归档: {saved['sha256'][:12]}{'' if saved['new'] else ' (内容未变)'}")
+    
+    # 检查是否被重定向到验证页面
+    if '验证' in text or 'security' in final_url.lower():
+        print("\n⚠️ 被重定向到安全验证页面")
+        return None
+    
+    # 提取 RENDER_DATA（URL 解码 + 括号配对定界）
+    print("\n🔍 提取数据...")
+    blocks = list(iter_render_data(text))
+    
+    if blocks:
+        print(f"✅ 找到 {len(blocks)} 个数据块!")
+        
+        # 数据块可随时从归档的 HTML 重新解析（douyin_archive.py cat），不再单独落盘
+        for idx, data in enumerate(blocks):
+            try:
+                # 尝试提取用户信息
+                extract_user_stats(data)
+                n_users, n_videos = shared_store().ingest(data, source='search_page')
+                print(f"💾 已写入数据库: {n_users} 个用户, {n_videos} 个作品")
+                
+            except Exception as e:
+                print(f"❌ 解析数据块 #{idx+1} 失败: {e}")
+    else:
+        print("❌ 未找到 RENDER_DATA")
+        # 查找其他可能的数据
+        print("\n🔍 查找其他脚本标签...")
+        all_scripts = re.findall(r'<script[^>]*>(.*?)</script>', text, re.DOTALL)
+        print(f"找到 {len(all_scripts)} 个 script 标签")
+        
+        # 显示前几个非空的脚本
+        for i, script in enumerate(all_scripts[:5]):
+            if len(script) > 100 and 'window' not in script:
+                print(f"\nScript #{i+1} ({len(script)} 字符):")
+                print(script[:500])
+    
+    return text
+
 def extract_user_stats(data):
     """提取用户统计信息"""
     print("\n" + "="*60)
@@ -150,11 +272,7 @@ def extract_user_stats(data):
                     found = True
     
     if not found:
-        print("❌ 未找到用户信息，保存完整 JSON 供分析")
-        # 保存完整数据
-        with open('full_data.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print("💾 完整数据已保存: full_data.json")
+        print("❌ 未找到用户信息，原始页面已归档，可用 python3 douyin_archive.py list 查看")
 
 def print_user_info(user):
     """打印用户信息"""
@@ -1,14 +1,31 @@
 #!/usr/bin/env python3
 """
 解析抖音控制台提取的数据
+
+批量导入（进程池并行解析，结果统一写入数据库）：
+  python3 parse_douyin_console_data.py --bulk dumps/ 'archive/2026-*/*.json' all.jsonl
+  cat dumps.jsonl | python3 parse_douyin_console_data.py --bulk - --export all.parquet
 """
 
+import argparse
+import glob
 import json
+import multiprocessing
+import os
 import sys
+import time
 from datetime import datetime
+from itertools import islice
+from douyin_store import collect_entities, shared_store
+
+JSONL_SUFFIXES = ('.jsonl', '.ndjson')
+DUMP_SUFFIXES = ('.json',) + JSONL_SUFFIXES
 
-def parse_douyin_data(json_str):
-    """解析抖音 JSON 数据"""
+def parse_douyin_data(json_str, export_path=None):
+    """
+    解析抖音 JSON 数据
+    :param export_path: 同时把作品统计导出为列式文件（.parquet / .npz，见 douyin_columnar）
+    """
     print("\n" + "="*60)
     print("📊 抖音数据分析报告")
     print("="*60)
@@ -91,12 +108,6 @@ def parse_douyin_data(json_str):
 
             print(f"{'─'*60}")
 
-            # 保存详细数据
-            filename = f"douyin_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            print(f"\n💾 详细数据已保存: {filename}")
-
         else:
             print("\n⚠️ 未找到视频数据")
             debug = data.get('data', {}).get('_debug', {})
@@ -104,6 +115,24 @@ def parse_douyin_data(json_str):
                 print("\n🔧 调试信息:")
                 print(json.dumps(debug, indent=2, ensure_ascii=False))
 
+        # 写入数据库（控制台导出的作品没有作者信息，归属到当前用户）
+        store = shared_store()
+        n_users, n_videos = store.ingest(data.get('data', {}), source='console', owner_sec_uid=user.get('sec_uid'))
+        print(f"\n💾 已写入数据库 {store.path}: {n_users} 个用户, {n_videos} 个作品")
+
+        # 首屏之后的作品由 douyin_videos.py 从导出的游标继续抓取
+        cursor = data.get('data', {}).get('video_cursor')
+        if cursor and user.get('sec_uid'):
+            store.save_cursor(user['sec_uid'], cursor['max_cursor'], cursor['has_more'])
+            if cursor['has_more']:
+                print(f"💡 还有更多作品: python3 douyin_videos.py {user['sec_uid']}")
+
+        if export_path:
+            from douyin_columnar import VideoColumns, export_columns
+            _, rows = collect_entities(data.get('data', {}), owner_sec_uid=user.get('sec_uid'))
+            path, count = export_columns([VideoColumns.from_rows(rows)], export_path)
+            print(f"💾 已导出 {count} 个作品统计: {path}")
+
         return data
 
     except json.JSONDecodeError as e:
@@ -116,7 +145,172 @@ def parse_douyin_data(json_str):
         traceback.print_exc()
         return None
 
+def analyze_accounts(path=None, sec_uids=None, tracked=False, top=10, limit=None, json_path=None):
+    """
+    多账号分析：从数据库（或 douyin_columnar 导出的文件）载入所有账号的作品统计，向量化计算
+    :param tracked: 只分析 douyin_scheduler 关注的账号
+    """
+    from douyin_analytics import account_info, analyze, load_columns, print_report, save_report, tracked_sec_uids
+
+    store = shared_store()
+    sec_uids = list(sec_uids or [])
+    if tracked:
+        sec_uids += tracked_sec_uids(store)
+        if not sec_uids:
+            print("⚠️ 没有关注的账号（python3 douyin_scheduler.py track ...）")
+            return None
+
+    started = time.perf_counter()
+    columns = load_columns(store, path, sec_uids or None)
+    loaded = time.perf_counter()
+    info = account_info(store, columns.sec_uid_dict)
+    report = analyze(columns, top=top, followers={k: v[1] for k, v in info.items()})
+    finished = time.perf_counter()
+
+    print_report(report, {k: v[0] for k, v in info.items()}, limit=limit)
+    print(f"\n⏱️  载入 {len(columns):,} 个作品 {loaded - started:.2f}s, 计算 {finished - loaded:.2f}s")
+    if json_path:
+        save_report(report, json_path)
+        print(f"💾 已保存: {json_path}")
+    return report
+
+def _dump_time(value):
+    """导出文档的 timestamp（ISO 字符串）-> 秒级时间戳"""
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp() if value else None
+    except ValueError:
+        return None
+
+def parse_dump(task):
+    """
+    进程池 worker：解析一个导出文档并收集用户 / 作品（CPU 密集部分），写库留给主进程
+    :param task: (来源, 文本)；文本为 None 时从来源路径读取
+    """
+    origin, text = task
+    size = 0
+    try:
+        if text is None:
+            with open(origin, 'rb') as f:
+                text = f.read()
+        size = len(text)
+        data = json.loads(text)
+        payload = data.get('data') or {}
+        owner = (payload.get('user') or {}).get('sec_uid')
+        users, videos = collect_entities(payload, owner_sec_uid=owner)
+        return {'origin': origin, 'bytes': size, 'captured_at': _dump_time(data.get('timestamp')),
+                'users': users, 'videos': videos}
+    except Exception as e:
+        return {'origin': origin, 'bytes': size, 'error': f"{type(e).__name__}: {e}"}
+
+def _jsonl_tasks(lines, name):
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            yield f"{name}:{number}", line
+
+def iter_dump_tasks(sources):
+    """
+    展开输入：目录（递归查找 .json / .jsonl）、glob、.jsonl 文件（每行一个文档）、'-'（stdin JSON-lines）
+    :return: (来源, 文本或 None) 的生成器，JSON-lines 逐行读取
+    """
+    for source in sources:
+        if source == '-':
+            yield from _jsonl_tasks(sys.stdin, '<stdin>')
+            continue
+        if os.path.isdir(source):
+            paths = sorted(p for p in glob.glob(os.path.join(source, '**', '*'), recursive=True)
+                           if p.endswith(DUMP_SUFFIXES))
+        elif any(c in source for c in '*?['):
+            paths = sorted(glob.glob(source, recursive=True))
+        else:
+            paths = [source]
+        for path in paths:
+            if path.endswith(JSONL_SUFFIXES):
+                with open(path, 'r', encoding='utf-8') as f:
+                    yield from _jsonl_tasks(f, path)
+            else:
+                yield path, None
+
+def bulk_ingest(sources, workers=None, batch_size=256, export_path=None, store=None):
+    """
+    批量导入控制台导出文档
+    解析在进程池中并行进行；主进程写入上一批的同时下一批已在解析
+    快照时间取文档的 timestamp，每批一个事务；文档之间不需要按时间排序，
+    ProfileStore.save 只让更新的抓取覆盖 users / videos（较早的文档只追加快照和计数序列）
+    :return: dict(docs, failed, users, videos, bytes, elapsed)
+    """
+    store = store or shared_store()
+    workers = workers or os.cpu_count() or 1
+    tasks = iter_dump_tasks(sources)
+    totals = {'docs': 0, 'failed': 0, 'users': 0, 'videos': 0, 'bytes': 0}
+    owners = set()
+    started = time.perf_counter()
+
+    def write(results):
+        with store.transaction():  # 一批一个事务
+            for result in results:
+                totals['bytes'] += result['bytes']
+                if 'error' in result:
+                    totals['failed'] += 1
+                    print(f"\n  ⚠️ {result['origin']}: {result['error']}")
+                    continue
+                # 历史导出的首屏游标早已过时，批量导入不记录
+                n_users, n_videos = store.save(result['users'], result['videos'], source='console',
+                                               captured_at=result['captured_at'])
+                totals['docs'] += 1
+                totals['users'] += n_users
+                totals['videos'] += n_videos
+                owners.update(video['sec_uid'] for video in result['videos'] if video['sec_uid'])
+        elapsed = time.perf_counter() - started
+        print(f"\r📥 {totals['docs']:,} 个文档 ({totals['failed']} 失败)  "
+              f"{totals['docs'] / elapsed:,.1f} docs/s  {totals['bytes'] / elapsed / 1e6:.1f} MB/s", end='', flush=True)
+
+    with multiprocessing.Pool(workers) as pool:
+        pending = None
+        while True:
+            batch = list(islice(tasks, batch_size))
+            submitted = pool.map_async(parse_dump, batch, chunksize=max(1, len(batch) // (workers * 4))) if batch else None
+            if pending is not None:
+                write(pending.get())
+            if submitted is None:
+                break
+            pending = submitted
+
+    totals['elapsed'] = time.perf_counter() - started
+    print()
+    if export_path and owners:
+        from douyin_columnar import export_store
+        path, count = export_store(store, export_path, sorted(owners))
+        print(f"💾 已导出 {count:,} 个作品统计: {path}")
+    return totals
+
 def main():
+    parser = argparse.ArgumentParser(description='解析抖音控制台提取的数据')
+    parser.add_argument('file', nargs='*', help='JSON 文件，不指定时从 stdin 读取；--bulk 时可为目录 / glob / .jsonl / -')
+    parser.add_argument('--export', help='导出作品统计为列式文件（.parquet / .npz）')
+    bulk = parser.add_argument_group('批量导入')
+    bulk.add_argument('--bulk', action='store_true', help='并行导入多个导出文档，统一写入数据库')
+    bulk.add_argument('--workers', type=int, help='解析进程数（默认 CPU 核数）')
+    analysis = parser.add_argument_group('多账号分析')
+    analysis.add_argument('--analyze', action='store_true', help='分析数据库中所有账号的作品统计')
+    analysis.add_argument('--columns', help='改为分析 douyin_columnar 导出的文件')
+    analysis.add_argument('--sec-uid', action='append', help='只分析指定账号（可多次指定）')
+    analysis.add_argument('--tracked', action='store_true', help='只分析调度器关注的账号')
+    analysis.add_argument('--top', type=int, default=10, help='每个账号的 Top-N 作品')
+    analysis.add_argument('--limit', type=int, help='最多打印的账号数')
+    analysis.add_argument('--json', help='完整结果保存为 JSON')
+    args = parser.parse_args()
+
+    if args.analyze:
+        analyze_accounts(args.columns, args.sec_uid, args.tracked, args.top, args.limit, args.json)
+        return
+    if args.bulk:
+        totals = bulk_ingest(args.file or ['-'], args.workers, export_path=args.export)
+        print(f"✅ {totals['docs']:,} 个文档, {totals['users']:,} 个用户, {totals['videos']:,} 个作品, "
+              f"用时 {totals['elapsed']:.1f}s ({totals['docs'] / max(totals['elapsed'], 1e-9):,.1f} docs/s)")
+        return
+    if len(args.file) > 1:
+        parser.error('多个输入请使用 --bulk')
+
     print("📋 抖音数据分析工具")
     print("="*60)
     print("\n请按以下步骤操作:")
@@ -129,12 +323,12 @@ def main():
     print("7. 将输出的 JSON 复制并粘贴到这里")
     print("\n" + "="*60)
 
-    if len(sys.argv) > 1:
+    if args.file:
         # 从文件读取
         try:
-            with open(sys.argv[1], 'r', encoding='utf-8') as f:
+            with open(args.file[0], 'r', encoding='utf-8') as f:
                 content = f.read()
-                parse_douyin_data(content)
+                parse_douyin_data(content, args.export)
         except Exception as e:
             print(f"❌ 读取文件失败: {e}")
     else:
@@ -143,7 +337,7 @@ def main():
         try:
             content = sys.stdin.read()
             if content.strip():
-                parse_douyin_data(content)
+                parse_douyin_data(content, args.export)
             else:
                 print("❌ 未输入任何数据")
         except KeyboardInterrupt:
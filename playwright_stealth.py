@@ -11,19 +11,21 @@ from playwright.async_api import async_playwright
 class StealthBrowser:
     """隐身浏览器 - 模拟真实用户行为"""
     
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, user_data_dir="./douyin_session"):
         self.headless = headless
+        self.user_data_dir = user_data_dir
+        self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
         
     async def start(self):
         """启动浏览器"""
-        playwright = await async_playwright().start()
+        self.playwright = await async_playwright().start()
         
         # 使用持久化上下文，可以保存登录状态
-        self.context = await playwright.chromium.launch_persistent_context(
-            user_data_dir="./douyin_session",
+        self.context = await self.playwright.chromium.launch_persistent_context(
+            user_data_dir=self.user_data_dir,
             headless=self.headless,
             args=[
                 # 禁用自动化检测
@@ -45,11 +47,11 @@ class StealthBrowser:
             timezone_id='Asia/Shanghai',
         )
         
-        self.page = await self.context.new_page()
-        
-        # 注入反检测脚本
+        # 注入反检测脚本（对上下文中的所有页面生效）
         await self._inject_stealth_scripts()
         
+        self.page = await self.context.new_page()
+        
         return self.page
     
     async def _inject_stealth_scripts(self):
@@ -89,7 +91,7 @@ class StealthBrowser:
         });
         """
         
-        await self.page.add_init_script(stealth_script)
+        await self.context.add_init_script(stealth_script)
     
     async def human_like_scroll(self, distance=300):
         """模拟人类滚动行为"""
@@ -147,6 +149,10 @@ class StealthBrowser:
         """关闭浏览器"""
         if self.context:
             await self.context.close()
+            self.context = None
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
 
 
 async def main():
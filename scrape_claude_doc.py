@@ -3,6 +3,7 @@ import sys
 import requests
 from bs4 import BeautifulSoup
 import json
+from douyin_http_cache import shared_cache
 
 # 通过代理抓取 Claude 文档
 def scrape_claude_docs():
@@ -21,12 +22,16 @@ def scrape_claude_docs():
     ]
     
     results = []
+    session = requests.Session()
+    cache = shared_cache()
     
     for url in urls:
         try:
             print(f"📥 Fetching: {url}")
-            resp = requests.get(url, proxies=proxies, headers=headers, timeout=30)
-            print(f"✅ Status: {resp.status_code}")
+            # 文档更新不频繁，缓存一天；过期后带 ETag / Last-Modified 重新验证
+            resp = cache.request(session, 'GET', url, headers=headers, ttl=24 * 3600,
+                                 proxies=proxies, timeout=30)
+            print(f"✅ Status: {resp.status_code}{' (cached)' if resp.from_cache else ''}")
             
             soup = BeautifulSoup(resp.text, 'html.parser')
             